@@ -0,0 +1,140 @@
+"""Cache for generated bot answers.
+
+Questions are keyed by a normalized form (lower-cased, punctuation and runs
+of whitespace folded to single spaces), so "What grants are there?" and
+"what grants are there" share one answer. Entries expire after ``ttl``
+seconds and the least recently used are evicted beyond ``max_entries``.
+
+Concurrent requests for the same key are coalesced: the first caller
+generates the answer and the others wait for it instead of calling the
+model again. Failed generations (``None``) are handed to the waiters but not
+cached.
+
+With ``path`` set, entries are appended to a JSON-lines file and reloaded on
+startup; the file is rewritten once it grows well past the live entries.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_FOLD_RE = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    return _FOLD_RE.sub(" ", str(text or "").lower()).strip()
+
+
+class AnswerCache:
+    def __init__(self, ttl=24 * 3600, max_entries=5000, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._file_lines = 0
+        self._counts = {"hits": 0, "misses": 0, "coalesced": 0, "failures": 0, "evictions": 0}
+        if path:
+            self._load()
+
+    def get_or_generate(self, question, generate):
+        """Return the cached answer for ``question``, calling ``generate()`` at most once per key"""
+        key = normalize(question)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > time.time():
+                self._entries.move_to_end(key)
+                self._counts["hits"] += 1
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counts["coalesced"] += 1
+                owner = False
+            else:
+                future = self._inflight[key] = Future()
+                self._counts["misses"] += 1
+                owner = True
+        if not owner:
+            return future.result()
+
+        answer = None
+        try:
+            answer = generate()
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if answer is None:
+                    self._counts["failures"] += 1
+                else:
+                    self._store(key, answer, time.time() + self.ttl)
+            future.set_result(answer)
+        return answer
+
+    def _store(self, key, answer, expires):
+        self._entries[key] = (expires, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
+        if self.path:
+            self._append(key, answer, expires)
+
+    # ----- Persistence -----
+
+    def _load(self):
+        now = time.time()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    self._file_lines += 1
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted write
+                    if item["expires"] > now:
+                        self._entries[item["key"]] = (item["expires"], item["answer"])
+                        self._entries.move_to_end(item["key"])
+        except FileNotFoundError:
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _append(self, key, answer, expires):
+        try:
+            if self._file_lines > 2 * self.max_entries:
+                self._rewrite()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "answer": answer, "expires": expires}) + "\n")
+            self._file_lines += 1
+        except OSError as e:
+            logger.warning("Could not persist answer cache to %s: %s", self.path, e)
+
+    def _rewrite(self):
+        # Drop superseded and evicted lines; the live entries go to a temp file that replaces the old one
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, (expires, answer) in self._entries.items():
+                f.write(json.dumps({"key": key, "answer": answer, "expires": expires}) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file_lines = len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"] + self._counts["coalesced"]
+            served = self._counts["hits"] + self._counts["coalesced"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "in_flight": len(self._inflight),
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+                **self._counts
+            }
@@ -1,63 +1,45 @@
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, Response, jsonify, request, make_response, g, stream_with_context
 # Remove Flask-CORS import completely
 import os
-import json
 from datetime import datetime, timedelta
 import uuid
-import hashlib
-import secrets
+import atexit
+import threading
+import time
+
+from repository import open_repository
+from pagination import paginated
+from export import ExportError, ndjson_response, parse_time
+from bulk import BulkError, applied, parse_items, rejected, require, validate_items
+from notifications import NotificationWorker
+from inbox import Inbox, SqliteInbox, recipient_id, sse_stream
+from ledger import Ledger, SqliteLedger, from_wei, to_wei
+from settlement import (SettlementError, award_wei, check_completion, milestone_bounds, payout_key, remaining_wei,
+                        tranche_amounts)
+from search import SearchIndex
+from scheduler import DeadlineScheduler
+from response_cache import ResponseCache
+from metrics import instrument_app, metrics_response
+from ratelimit import (ConcurrencyLimiter, RateLimiter, open_bucket_store, parse_budget, rule,
+                       service_unavailable)
+from passwords import hash_password, needs_rehash, verify_missing, verify_password
+import passwords
 
 app = Flask(__name__)
 
-# Debugging middleware to log incoming requests
-@app.before_request
-def log_request_info():
-    app.logger.debug('Headers: %s', request.headers)
-    app.logger.debug('Body: %s', request.get_data())
-    app.logger.debug('Method: %s', request.method)
-    app.logger.debug('Path: %s', request.path)
+# Per-route request counts, latency and size histograms, served at /metrics
+instrument_app(app, sample_rate=float(os.getenv("METRICS_SAMPLE_RATE", "1.0")))
 
-# ----- Mock Database (In-memory) -----
-# In a real application, you would use a proper database like PostgreSQL or MongoDB
+# ----- Database -----
 
 # Load initial data
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# Function to load data from JSON files
-def load_data(filename, default=None):
-    filepath = os.path.join(DATA_DIR, filename)
-    if os.path.exists(filepath):
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    # Create the file with default data if it doesn't exist
-    if default is not None:
-        with open(filepath, 'w') as f:
-            json.dump(default, f, indent=2)
-        return default
-    return []
-
-# Function to save data to JSON files
-def save_data(filename, data):
-    with open(os.path.join(DATA_DIR, filename), 'w') as f:
-        json.dump(data, f, indent=2)
-
-# Hash password with salt
-def hash_password(password):
-    salt = secrets.token_hex(8)
-    hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-    return f"{salt}:{hashed}"
-
-# Verify password
-def verify_password(stored_password, provided_password):
-    if not stored_password or ":" not in stored_password:
-        return False
-    salt, hashed = stored_password.split(":")
-    calculated_hash = hashlib.sha256((provided_password + salt).encode()).hexdigest()
-    return calculated_hash == hashed
+# Collections come from the backend selected by STORAGE_BACKEND (JSON files by default, or SQLite)
+db = open_repository()
+atexit.register(db.close)
+atexit.register(passwords.shutdown)
 
 # Initialize data stores
-scholarships = load_data("scholarships.json", [
+scholarships = db.collection("scholarships", [
     {
         "id": str(uuid.uuid4()),
         "title": "STEM Innovation Grant",
@@ -66,7 +48,8 @@ scholarships = load_data("scholarships.json", [
         "deadline": (datetime.now() + timedelta(days=30)).isoformat(),
         "status": "open",
         "description": "Supporting innovative projects in science, technology, engineering, and mathematics fields.",
-        "requirements": "Undergraduate students with GPA 3.5 or above. Must submit project proposal."
+        "requirements": "Undergraduate students with GPA 3.5 or above. Must submit project proposal.",
+        "created_at": (datetime.now() - timedelta(days=60)).isoformat()
     },
     {
         "id": str(uuid.uuid4()),
@@ -76,7 +59,8 @@ scholarships = load_data("scholarships.json", [
         "deadline": (datetime.now() + timedelta(days=60)).isoformat(),
         "status": "open",
         "description": "Supporting students pursuing degrees in arts, literature, history, and related fields.",
-        "requirements": "Open to all undergraduate and graduate students. Portfolio submission required."
+        "requirements": "Open to all undergraduate and graduate students. Portfolio submission required.",
+        "created_at": (datetime.now() - timedelta(days=45)).isoformat()
     },
     {
         "id": str(uuid.uuid4()),
@@ -86,7 +70,8 @@ scholarships = load_data("scholarships.json", [
         "deadline": (datetime.now() + timedelta(days=5)).isoformat(),
         "status": "open",
         "description": "Recognizing students who have demonstrated exceptional leadership in community service.",
-        "requirements": "Minimum 100 hours of community service. Two recommendation letters required."
+        "requirements": "Minimum 100 hours of community service. Two recommendation letters required.",
+        "created_at": (datetime.now() - timedelta(days=30)).isoformat()
     },
     {
         "id": str(uuid.uuid4()),
@@ -96,11 +81,12 @@ scholarships = load_data("scholarships.json", [
         "deadline": (datetime.now() - timedelta(days=15)).isoformat(),
         "status": "closed",
         "description": "Funding for research projects focused on environmental sustainability and conservation.",
-        "requirements": "Graduate students in environmental science or related fields. Research proposal required."
+        "requirements": "Graduate students in environmental science or related fields. Research proposal required.",
+        "created_at": (datetime.now() - timedelta(days=20)).isoformat()
     }
 ])
 
-users = load_data("users.json", [
+users = db.collection("users", [
     {
         "id": str(uuid.uuid4()),
         "address": "0x1234567890abcdef1234567890abcdef12345678",
@@ -123,16 +109,16 @@ users = load_data("users.json", [
     }
 ])
 
-messages = load_data("messages.json", [
+messages = db.collection("messages", [
     {
         "id": str(uuid.uuid4()),
         "sender": {
-            "id": users[1]["id"],
-            "name": users[1]["name"]
+            "id": users.find_one("type", "sponsor")["id"],
+            "name": users.find_one("type", "sponsor")["name"]
         },
         "recipient": {
-            "id": users[0]["id"],
-            "name": users[0]["name"]
+            "id": users.find_one("type", "student")["id"],
+            "name": users.find_one("type", "student")["name"]
         },
         "content": "Congratulations! Your application for the STEM Innovation Grant has been shortlisted. Please schedule an interview with our team in the next week.",
         "timestamp": (datetime.now() - timedelta(days=2)).isoformat(),
@@ -141,12 +127,12 @@ messages = load_data("messages.json", [
     {
         "id": str(uuid.uuid4()),
         "sender": {
-            "id": users[1]["id"],
-            "name": users[1]["name"]
+            "id": users.find_one("type", "sponsor")["id"],
+            "name": users.find_one("type", "sponsor")["name"]
         },
         "recipient": {
-            "id": users[0]["id"],
-            "name": users[0]["name"]
+            "id": users.find_one("type", "student")["id"],
+            "name": users.find_one("type", "student")["name"]
         },
         "content": "We're pleased to inform you that your project proposal has received positive feedback from our review committee. We'd like to discuss potential funding options for your initiative.",
         "timestamp": (datetime.now() - timedelta(days=7)).isoformat(),
@@ -154,12 +140,15 @@ messages = load_data("messages.json", [
     }
 ])
 
-applications = load_data("applications.json", [])
+applications = db.collection("applications", [])
 
-transactions = load_data("transactions.json", [])
+transactions = db.collection("transactions", [])
+
+# Milestone payouts from smart contracts, keyed by their idempotency key
+payouts = db.collection("payouts", [])
 
 # Smart contract records
-smart_contracts = load_data("smart_contracts.json", [
+smart_contracts = db.collection("smart_contracts", [
     {
         "id": str(uuid.uuid4()),
         "contract_address": "0xfedcba9876543210fedcba9876543210fedcba98",
@@ -182,6 +171,184 @@ smart_contracts = load_data("smart_contracts.json", [
     }
 ])
 
+# Running per-address transfer totals, kept exact in integer wei; in a database shared by several
+# server processes they are kept in the database too, so every process counts every transfer
+if db.shared:
+    ledger = SqliteLedger(db, transactions)
+else:
+    ledger = Ledger(transactions.scan_fields(("amount", "from_address", "to_address")))
+
+# Inverted index over scholarship text for /api/scholarships/search
+search_index = SearchIndex(scholarships.scan())
+# Records written by other server processes sharing the database reach this process's in-memory structures by
+# re-reading the collections now and then
+def shared_sync(interval, sync):
+    """Return a function running ``sync`` at most every ``interval`` seconds, only when the database is shared"""
+    state = {"at": time.monotonic(), "lock": threading.Lock()}
+    
+    def run():
+        if not db.shared or time.monotonic() - state["at"] < interval:
+            return
+        # One request re-reads; others meanwhile use the structure as it is
+        if state["lock"].acquire(blocking=False):
+            try:
+                sync()
+                state["at"] = time.monotonic()
+            finally:
+                state["lock"].release()
+    return run
+
+sync_search_index = shared_sync(float(os.getenv("SEARCH_SYNC_SECONDS", "5")),
+                                lambda: search_index.sync(scholarships.scan()))
+
+# Unread counts per recipient and the open message streams, fed by every message insert; in a database shared by
+# several server processes the counts are queried and the streams poll it, so they see every process's messages
+if db.shared:
+    inbox = SqliteInbox(
+        db,
+        max_streams=int(os.getenv("MESSAGE_STREAMS_MAX", "1000")),
+        poll_interval=float(os.getenv("MESSAGE_STREAM_POLL_SECONDS", "1"))
+    )
+else:
+    inbox = Inbox(
+        messages.scan_fields(("read", "recipient.id")),
+        max_streams=int(os.getenv("MESSAGE_STREAMS_MAX", "1000"))
+    )
+MESSAGE_STREAM_HEARTBEAT = float(os.getenv("MESSAGE_STREAM_HEARTBEAT", "15"))
+MESSAGE_STREAM_MAX_SECONDS = float(os.getenv("MESSAGE_STREAM_MAX_SECONDS", "300"))
+
+# Notification messages are built and stored on a background thread, off the request path
+notifier = NotificationWorker(
+    messages,
+    db.transaction,
+    maxsize=int(os.getenv("NOTIFICATION_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("NOTIFICATION_BATCH_SIZE", "100")),
+    on_delivered=inbox.added
+)
+atexit.register(notifier.stop)
+
+# Serialized bodies of the read-heavy GET endpoints, dropped by the writes that change them
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", "1000")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "60")),
+    shared_max_age=int(os.getenv("RESPONSE_CACHE_SHARED_MAX_AGE", "30"))
+)
+
+# Sponsor notified when a deadline closes something: the contract's sponsor_address, or the sponsor user named by a
+# scholarship (which only records the name); None when there's no such user, so nobody else is told
+def deadline_sponsor(record):
+    if record.get("sponsor_address"):
+        return users.find_one("address", record["sponsor_address"])
+    if not record.get("sponsor"):
+        return None
+    return next((user for user in users.find("type", "sponsor") if user.get("name") == record["sponsor"]), None)
+
+# Close a scholarship or contract whose deadline has passed and tell its sponsor
+def close_expired(kind, record_id):
+    if kind == "scholarship":
+        # Re-check inside the transaction so only one server process closes (and announces) it
+        with db.transaction():
+            record = scholarships.get(record_id)
+            if not record or record.get("status") != "open":
+                return
+            record = scholarships.update(record, {"status": "closed"})
+        search_index.add(record)
+        response_cache.invalidate("scholarships", f"scholarship:{record_id}")
+        content = f"{record['title']} has passed its deadline and is now closed to applications."
+    else:
+        with db.transaction():
+            record = smart_contracts.get(record_id)
+            if not record or record.get("status") == "expired":
+                return
+            record = smart_contracts.update(record, {"status": "expired"})
+        response_cache.invalidate("contracts", f"contract:{record_id}")
+        content = f"The contract {record['title']} has reached its deadline and has expired."
+    
+    def build_notification():
+        sponsor = deadline_sponsor(record)
+        if not sponsor:
+            return None
+        return {
+            "id": str(uuid.uuid4()),
+            "sender": {
+                "id": "system",
+                "name": "System"
+            },
+            "recipient": {
+                "id": sponsor["id"],
+                "name": sponsor["name"]
+            },
+            "content": content,
+            "timestamp": datetime.now().isoformat(),
+            "read": False
+        }
+    
+    notifier.submit(build_notification)
+
+# Open scholarships and live contracts, ordered by deadline; anything already past it closes right away
+deadlines = DeadlineScheduler(close_expired)
+atexit.register(deadlines.stop)
+
+def schedule_deadlines():
+    deadlines.sync("scholarship", ((scholarship["id"], scholarship.get("deadline"))
+                                   for scholarship in scholarships.scan() if scholarship.get("status") == "open"))
+    deadlines.sync("contract", ((contract["id"], (contract.get("terms") or {}).get("deadline"))
+                                for contract in smart_contracts.scan() if contract.get("status") != "expired"))
+
+schedule_deadlines()
+# Scholarships and contracts created on other server processes sharing the database join the heap within this
+sync_deadlines = shared_sync(float(os.getenv("DEADLINE_SYNC_SECONDS", "5")), schedule_deadlines)
+
+# The scheduler thread doesn't survive a fork into a server worker, so make sure it runs there too
+@app.before_request
+def start_deadline_worker():
+    deadlines.start()
+
+# ----- Rate limiting -----
+
+# Behind a reverse proxy, set TRUST_PROXY=true so the client address comes from X-Forwarded-For
+TRUST_PROXY = os.getenv("TRUST_PROXY", "false").lower() == "true"
+
+def client_ip():
+    return request.access_route[0] if TRUST_PROXY and request.access_route else request.remote_addr
+
+# The account being logged into, so guessing one user's password is throttled from any number of addresses
+def login_account():
+    email = (request.get_json(silent=True) or {}).get("email")
+    return str(email).lower() if email else None
+
+# Budgets are "<count>/<seconds>"; RATE_LIMIT_STORE=sqlite shares the buckets between server processes
+limiter = RateLimiter(open_bucket_store(), enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true")
+# The API has no authenticated identity yet, so every route is limited per client address only
+DEFAULT_LIMITS = [
+    rule("ip", client_ip, parse_budget(os.getenv("RATE_LIMIT_IP", "300/60")))
+]
+LOGIN_IP_LIMIT = rule("ip", client_ip, parse_budget(os.getenv("RATE_LIMIT_LOGIN_IP", "20/60")))
+LOGIN_ACCOUNT_LIMIT = rule("account", login_account, parse_budget(os.getenv("RATE_LIMIT_LOGIN_ACCOUNT", "5/60")))
+SIGNUP_IP_LIMIT = rule("ip", client_ip, parse_budget(os.getenv("RATE_LIMIT_SIGNUP_IP", "10/60")))
+
+# Requests handled at once; the rest wait briefly, then get 503 rather than queueing behind busy workers
+concurrency = ConcurrencyLimiter(
+    max_active=int(os.getenv("MAX_CONCURRENT_REQUESTS", "64")),
+    max_waiting=int(os.getenv("MAX_WAITING_REQUESTS", "128")),
+    wait_timeout=float(os.getenv("REQUEST_QUEUE_TIMEOUT", "2"))
+)
+
+@app.before_request
+def limit_requests():
+    if request.method == 'OPTIONS':
+        return None
+    if not concurrency.acquire():
+        return service_unavailable()
+    g.concurrency_slot = True
+    return limiter.check("api", DEFAULT_LIMITS)
+
+@app.teardown_request
+def release_concurrency_slot(exc):
+    if g.pop("concurrency_slot", False):
+        concurrency.release()
+
 # ----- API Routes -----
 
 @app.route('/')
@@ -194,6 +361,7 @@ def add_cors_headers(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    response.headers.add('Access-Control-Expose-Headers', 'X-Next-Cursor,Link,ETag')
     return response
 
 # Handle OPTIONS requests
@@ -204,6 +372,7 @@ def options_handler(path=''):
 
 # Authentication Endpoints
 @app.route('/api/auth/login', methods=['POST'])
+@limiter.limit(LOGIN_IP_LIMIT, LOGIN_ACCOUNT_LIMIT)
 def login():
     data = request.json
     if not data or not data.get("email") or not data.get("password"):
@@ -212,13 +381,24 @@ def login():
     email = data.get("email")
     password = data.get("password")
     
-    user = next((u for u in users if u["email"] == email), None)
+    user = users.find_one("email", email)
     if not user:
+        # Pay the same hashing cost as a wrong password, so response times don't reveal registered emails
+        verify_missing(password)
         return jsonify({"error": "Invalid email or password"}), 401
     
     if not verify_password(user.get("password", ""), password):
         return jsonify({"error": "Invalid email or password"}), 401
     
+    # Upgrade legacy SHA-256 (or outdated KDF) hashes now that we know the password; hash outside the
+    # transaction, then store it only if nobody changed the password meanwhile
+    if needs_rehash(user.get("password")):
+        new_hash = hash_password(password)
+        with db.transaction():
+            current = users.get(user["id"])
+            if current and current.get("password") == user.get("password"):
+                user = users.update(current, {"password": new_hash})
+    
     # For security, don't return the password
     user_without_password = {k: v for k, v in user.items() if k != "password"}
     
@@ -230,12 +410,62 @@ def login():
 
 # Scholarships Endpoints
 @app.route('/api/scholarships', methods=['GET'])
+@response_cache.cached("scholarships")
 def get_scholarships():
-    return jsonify(scholarships)
+    return paginated(scholarships)
+
+@app.route('/api/scholarships/search', methods=['GET'])
+def search_scholarships():
+    args = request.args
+    try:
+        min_amount = float(args["min_amount"]) if args.get("min_amount") else None
+        max_amount = float(args["max_amount"]) if args.get("max_amount") else None
+        limit = int(args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "min_amount, max_amount and limit must be numbers"}), 400
+    if not 1 <= limit <= 100:
+        return jsonify({"error": "limit must be between 1 and 100"}), 400
+    try:
+        deadline_after = parse_time(args.get("deadline_after"), "deadline_after")
+        deadline_before = parse_time(args.get("deadline_before"), "deadline_before")
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    sync_search_index()
+    results = search_index.search(
+        args.get("q", ""),
+        status=args.get("status") or None,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        deadline_after=deadline_after,
+        deadline_before=deadline_before,
+        limit=limit
+    )
+    return jsonify([{**scholarship, "score": round(score, 4)} for score, scholarship in results])
+
+@app.route('/api/scholarships/closing-soon', methods=['GET'])
+def closing_soon_scholarships():
+    try:
+        days = float(request.args.get("days", 7))
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "days and limit must be numbers"}), 400
+    if days < 0 or not 1 <= limit <= 100:
+        return jsonify({"error": "days must not be negative and limit must be between 1 and 100"}), 400
+    
+    # Read straight off the deadline heap, earliest first
+    sync_deadlines()
+    results = []
+    for _, scholarship_id in deadlines.upcoming("scholarship", days * 86400, limit):
+        scholarship = scholarships.get(scholarship_id)
+        if scholarship and scholarship.get("status") == "open":
+            results.append(scholarship)
+    return jsonify(results)
 
 @app.route('/api/scholarships/<scholarship_id>', methods=['GET'])
+@response_cache.cached("scholarship:{scholarship_id}")
 def get_scholarship(scholarship_id):
-    scholarship = next((s for s in scholarships if s["id"] == scholarship_id), None)
+    scholarship = scholarships.get(scholarship_id)
     if scholarship:
         return jsonify(scholarship)
     return jsonify({"error": "Scholarship not found"}), 404
@@ -254,18 +484,22 @@ def create_scholarship():
         "deadline": data.get("deadline"),
         "status": data.get("status", "open"),
         "description": data.get("description"),
-        "requirements": data.get("requirements")
+        "requirements": data.get("requirements"),
+        "created_at": datetime.now().isoformat()
     }
     
-    scholarships.append(new_scholarship)
-    save_data("scholarships.json", scholarships)
+    scholarships.insert(new_scholarship)
+    search_index.add(new_scholarship)
+    response_cache.invalidate("scholarships")
+    if new_scholarship["status"] == "open":
+        deadlines.schedule("scholarship", new_scholarship["id"], new_scholarship["deadline"])
     return jsonify(new_scholarship), 201
 
 # User Endpoints
 @app.route('/api/users/<address>', methods=['GET'])
 def get_user(address):
     # Can retrieve user by address or by email (for email/password login)
-    user = next((u for u in users if u["address"] == address or u["email"] == address), None)
+    user = users.find_one("address", address) or users.find_one("email", address)
     if user:
         # Don't return password
         user_without_password = {k: v for k, v in user.items() if k != "password"}
@@ -273,6 +507,7 @@ def get_user(address):
     return jsonify({"error": "User not found"}), 404
 
 @app.route('/api/users', methods=['POST'])
+@limiter.limit(SIGNUP_IP_LIMIT)
 def create_user():
     data = request.json
     if not data:
@@ -282,18 +517,16 @@ def create_user():
     if not data.get("address") and not data.get("email"):
         return jsonify({"error": "Either address or email is required"}), 400
     
-    # Check if user already exists
-    if data.get("address") and any(u["address"] == data.get("address") for u in users):
-        return jsonify({"error": "User with this address already exists"}), 409
-    
-    if data.get("email") and any(u["email"] == data.get("email") for u in users):
-        return jsonify({"error": "User with this email already exists"}), 409
-    
     # Hash password if provided
     password_hash = None
     if data.get("password"):
         password_hash = hash_password(data.get("password"))
     
+    try:
+        to_wei(data.get("balance", "0.0"))
+    except ValueError:
+        return jsonify({"error": "balance must be a number of ETH"}), 400
+    
     new_user = {
         "id": str(uuid.uuid4()),
         "address": data.get("address", ""),
@@ -307,8 +540,15 @@ def create_user():
     if password_hash:
         new_user["password"] = password_hash
     
-    users.append(new_user)
-    save_data("users.json", users)
+    # Check and insert in one step so concurrent sign-ups can't claim the same address or email
+    with db.transaction():
+        if data.get("address") and users.exists("address", data.get("address")):
+            return jsonify({"error": "User with this address already exists"}), 409
+        
+        if data.get("email") and users.exists("email", data.get("email")):
+            return jsonify({"error": "User with this email already exists"}), 409
+        
+        users.insert(new_user)
     
     # Don't return password in response
     user_without_password = {k: v for k, v in new_user.items() if k != "password"}
@@ -317,27 +557,32 @@ def create_user():
 @app.route('/api/users/<address>', methods=['PUT'])
 def update_user(address):
     data = request.json
-    user = next((u for u in users if u["address"] == address), None)
+    user = users.find_one("address", address)
     
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    # Update fields
-    for field in ["name", "email", "type", "balance"]:
-        if field in data:
-            user[field] = data[field]
+    if "balance" in data:
+        try:
+            to_wei(data["balance"])
+        except ValueError:
+            return jsonify({"error": "balance must be a number of ETH"}), 400
     
-    save_data("users.json", users)
+    # Update fields
+    user = users.update(user, {field: data[field] for field in ["name", "email", "type", "balance"] if field in data})
+
     return jsonify(user)
 
 # Smart Contract Endpoints
 @app.route('/api/contracts', methods=['GET'])
+@response_cache.cached("contracts")
 def get_contracts():
-    return jsonify(smart_contracts)
+    return paginated(smart_contracts)
 
 @app.route('/api/contracts/<contract_id>', methods=['GET'])
+@response_cache.cached("contract:{contract_id}")
 def get_contract(contract_id):
-    contract = next((c for c in smart_contracts if c["id"] == contract_id), None)
+    contract = smart_contracts.get(contract_id)
     if contract:
         return jsonify(contract)
     return jsonify({"error": "Contract not found"}), 404
@@ -357,36 +602,255 @@ def create_contract():
         "total_funds": data.get("total_funds", "0.0"),
         "remaining_funds": data.get("remaining_funds", "0.0"),
         "created_at": datetime.now().isoformat(),
+        "status": "active",
         "terms": data.get("terms", {})
     }
     
-    smart_contracts.append(new_contract)
-    save_data("smart_contracts.json", smart_contracts)
+    smart_contracts.insert(new_contract)
+    response_cache.invalidate("contracts")
+    deadlines.schedule("contract", new_contract["id"], (new_contract["terms"] or {}).get("deadline"))
     return jsonify(new_contract), 201
 
+# Milestone payouts
+def build_completion(data, now, contracts):
+    """Checked completion ready to settle, or the existing payout if this milestone was already paid"""
+    require(data, "contractId", "applicantId", "milestone", "gpa")
+    if not isinstance(data["contractId"], str) or not isinstance(data["applicantId"], str):
+        raise ValueError("contractId and applicantId must be strings")
+    key = payout_key(data["contractId"], data["applicantId"], data["milestone"])
+    existing = payouts.get(key)
+    if existing:
+        return {"key": key, "payout": existing}
+    
+    if data["contractId"] not in contracts:
+        contract = smart_contracts.get(data["contractId"])
+        if contract:
+            # An unreadable or negative award or balance fails the item now, before the batch writes anything
+            remaining_wei(contract)
+            contracts[data["contractId"]] = (contract, milestone_bounds(contract.get("terms")), award_wei(contract))
+        else:
+            contracts[data["contractId"]] = (None, None, None)
+    contract, bounds, _ = contracts[data["contractId"]]
+    if not contract:
+        raise ValueError("Contract not found")
+    applicant = users.get(data["applicantId"])
+    if not applicant or not applicant.get("address"):
+        raise ValueError("Applicant not found")
+    stored_balance(applicant)
+    
+    milestone, gpa, completed_at = check_completion(contract, data, now)
+    return {
+        "key": key,
+        "contract": contract,
+        "applicant": applicant,
+        "milestone": milestone,
+        "bounds": (bounds[milestone], bounds[milestone + 1]),
+        "gpa": gpa,
+        "completed_at": completed_at.isoformat()
+    }
+
+# Notify the awardee (delivered by the background worker)
+def notify_payout(contract, applicant, payout):
+    notifier.submit(lambda: {
+        "id": str(uuid.uuid4()),
+        "sender": {
+            "id": "system",
+            "name": "System"
+        },
+        "recipient": {
+            "id": applicant["id"],
+            "name": applicant["name"]
+        },
+        "content": f"You have received {payout['amount']} ETH from {contract['title']} for completing "
+                   f"\"{payout['description']}\".",
+        "timestamp": datetime.now().isoformat(),
+        "read": False
+    })
+
+# Settle a batch of milestone completions: every item is checked against its contract's terms first, then the
+# tranches are paid, the contracts debited and the payouts recorded in one transaction
+@app.route('/api/contracts/settlements', methods=['POST'])
+def settle_milestones():
+    try:
+        items = parse_items()
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    now = datetime.now()
+    contracts = {}
+    completions, errors = validate_items(items, lambda data: build_completion(data, now, contracts))
+    if errors:
+        return rejected(len(items), errors)
+    
+    # Tranche amounts for the whole batch in one vectorized pass
+    pending = [completion for completion in completions if "payout" not in completion]
+    awards = {}
+    for completion in pending:
+        awards.setdefault(completion["contract"]["id"], len(awards))
+    try:
+        amounts = tranche_amounts(
+            [contracts[contract_id][2] for contract_id in awards],
+            [awards[completion["contract"]["id"]] for completion in pending],
+            [completion["bounds"][0] for completion in pending],
+            [completion["bounds"][1] for completion in pending])
+    except SettlementError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    with db.transaction():
+        # Re-read under the write lock: a concurrent batch may have paid a milestone or spent the funds since
+        current = {}
+        due = {}
+        settling = []
+        seen = set()
+        for completion, amount in zip(pending, amounts):
+            if completion["key"] in seen or payouts.get(completion["key"]):
+                continue
+            seen.add(completion["key"])
+            contract_id = completion["contract"]["id"]
+            if contract_id not in current:
+                current[contract_id] = smart_contracts.get(contract_id)
+            due[contract_id] = due.get(contract_id, 0) + amount
+            settling.append((completion, amount))
+        
+        # Every debit and credit is worked out before the first write, so nothing can fail halfway through
+        conflicts = []
+        remaining = {}
+        for contract_id, total in due.items():
+            contract = current[contract_id]
+            try:
+                remaining[contract_id] = remaining_wei(contract)
+            except SettlementError as e:
+                conflicts.append({"contractId": contract_id, "error": str(e)})
+                continue
+            if contract.get("status") == "expired":
+                conflicts.append({"contractId": contract_id, "error": "Contract has expired"})
+            elif total > remaining[contract_id]:
+                conflicts.append({"contractId": contract_id, "error": "Insufficient funds",
+                                  "remaining": from_wei(remaining[contract_id]), "required": from_wei(total)})
+        
+        transfers = []
+        for completion, amount in settling:
+            contract = current[completion["contract"]["id"]]
+            new_transaction, _ = build_transaction({
+                "fromAddress": contract.get("contract_address"),
+                "toAddress": completion["applicant"]["address"],
+                "amount": from_wei(amount)
+            })
+            new_transaction["contract_id"] = contract["id"]
+            new_transaction["idempotency_key"] = completion["key"]
+            try:
+                transfer_parties(new_transaction)
+            except ValueError as e:
+                conflicts.append({"contractId": contract["id"], "applicantId": completion["applicant"]["id"],
+                                  "error": str(e)})
+            transfers.append(new_transaction)
+        if conflicts:
+            return jsonify({"error": "Nothing was applied", "applied": 0, "contracts": conflicts}), 409
+        
+        for contract_id, total in due.items():
+            smart_contracts.update(current[contract_id], {"remaining_funds": from_wei(remaining[contract_id] - total)})
+        
+        settled = []
+        for (completion, amount), new_transaction in zip(settling, transfers):
+            contract = current[completion["contract"]["id"]]
+            milestone = contract["terms"]["milestones"][completion["milestone"]]
+            apply_transaction(new_transaction, amount)
+            payout = payouts.insert({
+                "id": completion["key"],
+                "contract_id": contract["id"],
+                "applicant_id": completion["applicant"]["id"],
+                "milestone": completion["milestone"],
+                "description": milestone.get("description"),
+                "percentage": milestone.get("percentage"),
+                "amount": from_wei(amount),
+                "gpa": completion["gpa"],
+                "completed_at": completion["completed_at"],
+                "settled_at": now.isoformat(),
+                "transaction_id": new_transaction["id"]
+            })
+            settled.append((contract, completion["applicant"], payout))
+        
+        # Only the first item for each newly paid milestone is new; repeats and earlier payouts are duplicates
+        fresh = {completion["key"] for completion, _ in settling}
+        results = []
+        for index, completion in enumerate(completions):
+            key = completion["key"]
+            results.append({"index": index, "ok": True, "idempotency_key": key, "duplicate": key not in fresh,
+                            "record": payouts.get(key)})
+            fresh.discard(key)
+    
+    if due:
+        response_cache.invalidate("contracts", *(f"contract:{contract_id}" for contract_id in due))
+    for contract, applicant, payout in settled:
+        notify_payout(contract, applicant, payout)
+    
+    return jsonify({
+        "applied": len(settled),
+        "duplicates": len(completions) - len(settled),
+        "results": results
+    }), 201 if settled else 200
+
+@app.route('/api/contracts/<contract_id>/payouts', methods=['GET'])
+def get_contract_payouts(contract_id):
+    return paginated(payouts, [("contract_id", contract_id)])
+
 # Messages Endpoints
 @app.route('/api/messages/<user_id>', methods=['GET'])
 def get_user_messages(user_id):
-    user_messages = [m for m in messages if m["recipient"]["id"] == user_id]
-    return jsonify(user_messages)
+    return paginated(messages, [("recipient.id", user_id)])
+
+@app.route('/api/messages/<user_id>/unread', methods=['GET'])
+def get_unread_count(user_id):
+    # Kept by the inbox as messages are stored and read; no pass over the messages
+    return jsonify({"user_id": user_id, "unread": inbox.unread(user_id)})
+
+# New messages pushed as server-sent events, instead of polling the whole inbox
+@app.route('/api/messages/<user_id>/stream', methods=['GET'])
+def stream_user_messages(user_id):
+    subscription = inbox.subscribe(user_id)
+    if subscription is None:
+        return service_unavailable(retry_after=30)
+    
+    # A stream stays open for minutes; don't let it hold one of the request concurrency slots
+    if g.pop("concurrency_slot", False):
+        concurrency.release()
+    
+    response = Response(
+        stream_with_context(sse_stream(inbox, subscription, MESSAGE_STREAM_HEARTBEAT, MESSAGE_STREAM_MAX_SECONDS)),
+        mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # The generator cleans up after itself, but only once it has started; this covers a client that leaves first
+    response.call_on_close(lambda: inbox.unsubscribe(subscription))
+    return response
 
 @app.route('/api/messages/<message_id>/read', methods=['PUT'])
 def mark_message_read(message_id):
-    message = next((m for m in messages if m["id"] == message_id), None)
-    if not message:
-        return jsonify({"error": "Message not found"}), 404
-    
-    message["read"] = True
-    save_data("messages.json", messages)
+    # Check and flip the flag in one step so a message read twice at once is only counted once
+    with db.transaction():
+        message = messages.get(message_id)
+        if not message:
+            return jsonify({"error": "Message not found"}), 404
+        
+        if not message.get("read"):
+            message = messages.update(message, {"read": True})
+            inbox.marked_read(recipient_id(message))
     return jsonify(message)
 
-@app.route('/api/messages', methods=['POST'])
-def send_message():
-    data = request.json
-    if not data:
-        return jsonify({"error": "Invalid data"}), 400
-    
-    new_message = {
+@app.route('/api/messages/<user_id>/read-all', methods=['PUT'])
+def mark_all_messages_read(user_id):
+    with db.transaction():
+        unread = [m for m in messages.find("recipient.id", user_id) if not m.get("read")]
+        for message in unread:
+            messages.update(message, {"read": True})
+        # Counted under the same lock as the flags, so a notification stored meanwhile keeps its count
+        inbox.marked_read(user_id, len(unread))
+        remaining = inbox.unread(user_id)
+    return jsonify({"user_id": user_id, "marked_read": len(unread), "unread": remaining})
+
+def build_message(data):
+    return {
         "id": str(uuid.uuid4()),
         "sender": data.get("sender"),
         "recipient": data.get("recipient"),
@@ -394,19 +858,39 @@ def send_message():
         "timestamp": datetime.now().isoformat(),
         "read": False
     }
-    
-    messages.append(new_message)
-    save_data("messages.json", messages)
-    return jsonify(new_message), 201
 
-# Applications Endpoints
-@app.route('/api/applications', methods=['POST'])
-def submit_application():
+@app.route('/api/messages', methods=['POST'])
+def send_message():
     data = request.json
     if not data:
         return jsonify({"error": "Invalid data"}), 400
     
-    new_application = {
+    new_message = build_message(data)
+    with db.transaction():
+        messages.insert(new_message)
+        inbox.added([new_message])
+    return jsonify(new_message), 201
+
+@app.route('/api/messages/bulk', methods=['POST'])
+def send_messages_bulk():
+    try:
+        items = parse_items()
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    new_messages, errors = validate_items(items, lambda data: build_message(require(data, "recipient", "content")))
+    if errors:
+        return rejected(len(items), errors)
+    
+    with db.transaction():
+        for new_message in new_messages:
+            messages.insert(new_message)
+        inbox.added(new_messages)
+    return applied(new_messages)
+
+# Applications Endpoints
+def build_application(data):
+    return {
         "id": str(uuid.uuid4()),
         "scholarship_id": data.get("scholarshipId"),
         "scholarship_title": data.get("scholarshipTitle"),
@@ -418,55 +902,83 @@ def submit_application():
         "submitted_at": datetime.now().isoformat(),
         "documents": data.get("documents", [])  # In a real app, would handle file uploads separately
     }
+
+# Notify scholarship sponsor (in a real app, would send actual notification)
+# The notification message is created by the background worker after the response
+def notify_application(application):
+    def build_notification():
+        scholarship = scholarships.get(application["scholarship_id"])
+        if not scholarship:
+            return None
+        sponsor = users.find_one("type", "sponsor")
+        applicant = users.get(application["applicant_id"])
+        if not sponsor or not applicant:
+            return None
+        return {
+            "id": str(uuid.uuid4()),
+            "sender": {
+                "id": "system",
+                "name": "System"
+            },
+            "recipient": {
+                "id": sponsor["id"],
+                "name": sponsor["name"]
+            },
+            "content": f"New application received for {scholarship['title']} from {applicant['name']}.",
+            "timestamp": datetime.now().isoformat(),
+            "read": False
+        }
     
-    applications.append(new_application)
-    save_data("applications.json", applications)
+    notifier.submit(build_notification)
+
+@app.route('/api/applications', methods=['POST'])
+def submit_application():
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid data"}), 400
     
-    # Notify scholarship sponsor (in a real app, would send actual notification)
-    # Create a notification message
-    scholarship = next((s for s in scholarships if s["id"] == data.get("scholarshipId")), None)
-    if scholarship:
-        sponsor = next((u for u in users if u["type"] == "sponsor"), None)
-        applicant = next((u for u in users if u["id"] == data.get("applicantId")), None)
-        
-        if sponsor and applicant:
-            notification = {
-                "id": str(uuid.uuid4()),
-                "sender": {
-                    "id": "system",
-                    "name": "System"
-                },
-                "recipient": {
-                    "id": sponsor["id"],
-                    "name": sponsor["name"]
-                },
-                "content": f"New application received for {scholarship['title']} from {applicant['name']}.",
-                "timestamp": datetime.now().isoformat(),
-                "read": False
-            }
-            messages.append(notification)
-            save_data("messages.json", messages)
+    new_application = build_application(data)
+    applications.insert(new_application)
+    notify_application(new_application)
     
     return jsonify(new_application), 201
 
+@app.route('/api/applications/bulk', methods=['POST'])
+def submit_applications_bulk():
+    try:
+        items = parse_items()
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    new_applications, errors = validate_items(
+        items, lambda data: build_application(require(data, "scholarshipId", "applicantId")))
+    if errors:
+        return rejected(len(items), errors)
+    
+    with db.transaction():
+        for new_application in new_applications:
+            applications.insert(new_application)
+    for new_application in new_applications:
+        notify_application(new_application)
+    
+    return applied(new_applications)
+
 @app.route('/api/applications/<scholarship_id>', methods=['GET'])
 def get_scholarship_applications(scholarship_id):
-    scholarship_applications = [a for a in applications if a["scholarship_id"] == scholarship_id]
-    return jsonify(scholarship_applications)
+    return paginated(applications, [("scholarship_id", scholarship_id)])
 
 @app.route('/api/applications/user/<user_id>', methods=['GET'])
 def get_user_applications(user_id):
-    user_applications = [a for a in applications if a["applicant_id"] == user_id]
-    return jsonify(user_applications)
+    return paginated(applications, [("applicant_id", user_id)])
 
 # Transactions Endpoints
-@app.route('/api/transactions', methods=['POST'])
-def record_transaction():
-    data = request.json
-    if not data:
-        return jsonify({"error": "Invalid data"}), 400
+def build_transaction(data):
+    """Return the new transaction and its amount in wei; raises ValueError for a bad amount"""
+    amount_wei = to_wei(data.get("amount", 0))
+    if amount_wei < 0:
+        raise ValueError("Amount must not be negative")
     
-    new_transaction = {
+    return {
         "id": str(uuid.uuid4()),
         "from_address": data.get("fromAddress"),
         "to_address": data.get("toAddress"),
@@ -475,55 +987,190 @@ def record_transaction():
         "timestamp": datetime.now().isoformat(),
         "status": "completed",
         "tx_hash": data.get("txHash", None)
-    }
-    
-    transactions.append(new_transaction)
-    save_data("transactions.json", transactions)
-    
-    # Update user balances (simplified for demo)
-    sender = next((u for u in users if u["address"] == data.get("fromAddress")), None)
-    recipient = next((u for u in users if u["address"] == data.get("toAddress")), None)
+    }, amount_wei
+
+def stored_balance(user):
+    """A user's balance in wei; raises ValueError if the stored balance isn't a number"""
+    try:
+        return to_wei(user["balance"], exact=False)
+    except ValueError:
+        raise ValueError(f"Balance of user {user['id']} is not a valid amount")
+
+def transfer_parties(new_transaction):
+    """The transfer's sender and recipient users (either may be None); raises ValueError if a balance is unreadable"""
+    sender = users.find_one("address", new_transaction["from_address"])
+    recipient = users.find_one("address", new_transaction["to_address"])
+    for user in (sender, recipient):
+        if user:
+            stored_balance(user)
+    return sender, recipient
+
+# Record the transfer and move the balances; call inside db.transaction() so concurrent workers can't lose an update
+def apply_transaction(new_transaction, amount_wei):
+    # Both balances are read before anything is written, so a bad one can't leave the transfer half-applied
+    sender, recipient = transfer_parties(new_transaction)
+    transactions.insert(new_transaction)
+    ledger.apply(new_transaction)
     
+    # Update user balances (simplified for demo), in integer wei so no precision is lost
     if sender:
-        sender_balance = float(sender["balance"])
-        sender_balance -= float(data.get("amount", 0))
-        sender["balance"] = str(max(0, sender_balance))
+        sender = users.update(sender, {"balance": from_wei(max(0, stored_balance(sender) - amount_wei))})
     
     if recipient:
-        recipient_balance = float(recipient["balance"])
-        recipient_balance += float(data.get("amount", 0))
-        recipient["balance"] = str(recipient_balance)
+        recipient = users.update(recipient, {"balance": from_wei(stored_balance(recipient) + amount_wei)})
     
-    save_data("users.json", users)
+    return sender, recipient
+
+# Notify recipient (delivered by the background worker)
+def notify_transfer(sender, recipient, amount):
+    if not sender or not recipient:
+        return
+    notifier.submit(lambda: {
+        "id": str(uuid.uuid4()),
+        "sender": {
+            "id": sender["id"],
+            "name": sender["name"]
+        },
+        "recipient": {
+            "id": recipient["id"],
+            "name": recipient["name"]
+        },
+        "content": f"You have received {amount} ETH from {sender['name']}.",
+        "timestamp": datetime.now().isoformat(),
+        "read": False
+    })
+
+@app.route('/api/transactions', methods=['POST'])
+def record_transaction():
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid data"}), 400
     
-    # Notify recipient
-    if sender and recipient:
-        notification = {
-            "id": str(uuid.uuid4()),
-            "sender": {
-                "id": sender["id"],
-                "name": sender["name"]
-            },
-            "recipient": {
-                "id": recipient["id"],
-                "name": recipient["name"]
-            },
-            "content": f"You have received {data.get('amount')} ETH from {sender['name']}.",
-            "timestamp": datetime.now().isoformat(),
-            "read": False
-        }
-        messages.append(notification)
-        save_data("messages.json", messages)
+    try:
+        new_transaction, amount_wei = build_transaction(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with db.transaction():
+            sender, recipient = apply_transaction(new_transaction, amount_wei)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    notify_transfer(sender, recipient, new_transaction["amount"])
     
     return jsonify(new_transaction), 201
 
+# A whole payout run in one request: every transfer is validated first, then all are applied and persisted together
+@app.route('/api/transactions/bulk', methods=['POST'])
+def record_transactions_bulk():
+    try:
+        items = parse_items()
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    built, errors = validate_items(
+        items, lambda data: build_transaction(require(data, "fromAddress", "toAddress", "amount")))
+    if errors:
+        return rejected(len(items), errors)
+    
+    with db.transaction():
+        # Every party's balance is read before the first transfer is written, so the batch applies whole or not at all
+        _, errors = validate_items([new_transaction for new_transaction, _ in built], transfer_parties)
+        if errors:
+            return rejected(len(items), errors)
+        parties = [apply_transaction(new_transaction, amount_wei) for new_transaction, amount_wei in built]
+    for (new_transaction, _), (sender, recipient) in zip(built, parties):
+        notify_transfer(sender, recipient, new_transaction["amount"])
+    
+    return applied([new_transaction for new_transaction, _ in built])
+
 @app.route('/api/transactions/<user_address>', methods=['GET'])
 def get_user_transactions(user_address):
-    user_transactions = [
-        t for t in transactions 
-        if t["from_address"] == user_address or t["to_address"] == user_address
-    ]
-    return jsonify(user_transactions)
+    return paginated(transactions, [("from_address", user_address), ("to_address", user_address)])
+
+# Balance Endpoints
+@app.route('/api/balances/summary', methods=['GET'])
+def balances_summary():
+    # Served from the ledger's running totals; no pass over the transactions
+    address = request.args.get("address")
+    if address:
+        account = ledger.account(address)
+        if account:
+            return jsonify(account)
+        return jsonify({"error": "No transactions for this address"}), 404
+    return jsonify(ledger.summary())
+
+@app.route('/api/balances/verify', methods=['GET'])
+def verify_balances():
+    # Hold off writes so the rebuild and the running totals describe the same transactions
+    with db.transaction():
+        mismatches = ledger.verify(transactions.scan())
+    return jsonify({"ok": not mismatches, "mismatches": mismatches})
+
+@app.route('/api/balances/rebuild', methods=['POST'])
+def rebuild_balances():
+    with db.transaction():
+        ledger.rebuild(transactions.scan())
+    return jsonify(ledger.summary())
+
+# Metrics Endpoints
+@app.route('/api/metrics/notifications', methods=['GET'])
+def notification_metrics():
+    return jsonify(notifier.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return metrics_response()
+
+@app.route('/api/metrics/limits', methods=['GET'])
+def limit_metrics():
+    return jsonify({"rate_limits": limiter.stats(), "concurrency": concurrency.stats()})
+
+@app.route('/api/metrics/inbox', methods=['GET'])
+def inbox_metrics():
+    return jsonify(inbox.stats())
+
+@app.route('/api/metrics/response-cache', methods=['GET'])
+def response_cache_metrics():
+    return jsonify(response_cache.stats())
+
+# Export Endpoints (newline-delimited JSON, streamed)
+@app.route('/api/export/transactions', methods=['GET'])
+def export_transactions():
+    try:
+        since = parse_time(request.args.get("since"), "since")
+        until = parse_time(request.args.get("until"), "until")
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    address = request.args.get("address")
+    where = [("from_address", address), ("to_address", address)] if address else []
+    return ndjson_response(
+        transactions.scan(where, start=since, end=until),
+        {"scholarship_id": request.args.get("scholarship_id"), "status": request.args.get("status")}
+    )
+
+@app.route('/api/export/applications', methods=['GET'])
+def export_applications():
+    try:
+        since = parse_time(request.args.get("since"), "since")
+        until = parse_time(request.args.get("until"), "until")
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    where = []
+    if request.args.get("scholarship_id"):
+        where = [("scholarship_id", request.args.get("scholarship_id"))]
+    elif request.args.get("applicant_id"):
+        where = [("applicant_id", request.args.get("applicant_id"))]
+    return ndjson_response(
+        applications.scan(where, start=since, end=until),
+        {
+            "scholarship_id": request.args.get("scholarship_id"),
+            "applicant_id": request.args.get("applicant_id"),
+            "status": request.args.get("status")
+        }
+    )
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000, host='0.0.0.0')
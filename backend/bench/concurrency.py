@@ -0,0 +1,103 @@
+"""Stress test for lost updates under concurrent writes.
+
+Many threads post transfers between the same pair of users through
+record_transaction while reader threads poll their balances. With
+serializable transactions every transfer lands exactly once, so the final
+balances and record counts must match the number of requests, and no
+reader ever sees a balance move backwards.
+
+Usage:
+    python bench/concurrency.py --threads 64 --transfers 200 [--backend sqlite]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--transfers", type=int, default=100, help="transfers per writer thread")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    # Point the app at an empty data directory before importing it
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="metamind-bench-")
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["STORAGE_BACKEND"] = args.backend
+    import app
+
+    client = app.app.test_client()
+    start_balance = 10 ** 6
+    sender = client.post("/api/users", json={
+        "address": "0xbench-sender", "name": "Sender", "type": "sponsor", "balance": str(start_balance)}).json
+    recipient = client.post("/api/users", json={
+        "address": "0xbench-recipient", "name": "Recipient", "balance": str(start_balance)}).json
+
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        c = app.app.test_client()
+        for _ in range(args.transfers):
+            r = c.post("/api/transactions", json={
+                "fromAddress": sender["address"], "toAddress": recipient["address"], "amount": "1"})
+            if r.status_code != 201:
+                errors.append(r.status_code)
+
+    reads = [0]
+
+    def reader():
+        c = app.app.test_client()
+        last_sender, last_recipient = start_balance, start_balance
+        while not done.is_set():
+            s = float(c.get(f"/api/users/{sender['address']}").json["balance"])
+            r = float(c.get(f"/api/users/{recipient['address']}").json["balance"])
+            # Balances only move one way, so going backwards means a read saw a lost or stale write
+            if s > last_sender or r < last_recipient:
+                errors.append(("balance went backwards", s, r))
+            last_sender, last_recipient = s, r
+            reads[0] += 1
+
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    writers = [threading.Thread(target=writer) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    for t in readers:
+        t.join()
+
+    expected = args.threads * args.transfers
+    app.notifier.flush()
+    final_sender = float(client.get(f"/api/users/{sender['address']}").json["balance"])
+    final_recipient = float(client.get(f"/api/users/{recipient['address']}").json["balance"])
+    recorded = len(app.transactions.find("from_address", sender["address"]))
+    notified = len(app.messages.find("recipient.id", recipient["id"]))
+    lost = (final_sender - (start_balance - expected), final_recipient - (start_balance + expected))
+
+    print(f"backend:            {args.backend}")
+    print(f"writer threads:     {args.threads} x {args.transfers} transfers")
+    print(f"throughput:         {expected / elapsed:,.0f} transfers/s ({elapsed:.2f}s)")
+    print(f"balance reads:      {reads[0]:,}")
+    print(f"transactions:       {recorded:,} / {expected:,}")
+    print(f"notifications:      {notified:,} / {expected:,}")
+    print(f"balance drift:      sender {lost[0]:+}, recipient {lost[1]:+}")
+    print(f"errors:             {len(errors)}")
+    app.db.close()
+    ok = not errors and recorded == notified == expected and lost == (0, 0)
+    print("OK: no lost updates" if ok else "FAIL: lost or torn updates")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
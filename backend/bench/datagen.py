@@ -0,0 +1,300 @@
+"""Seeded synthetic dataset in the API's schema, from 10^3 to 10^7 records.
+
+Writes scholarships, users, messages, applications, transactions and smart
+contracts shaped like the seed data in ``app.py`` into a data directory,
+streaming each collection to disk so memory stays flat at any scale. The
+same --seed and --records always produce the same files.
+
+Ids, emails and wallet addresses are pure functions of a record's index
+(``user_id(i)``, ``user_email(i)``...), so the load driver can pick real
+users and scholarships without reading the dataset back. Every user's
+password is ``PASSWORD``. A ``manifest.json`` records the seed and counts.
+
+Usage:
+    python bench/datagen.py --records 100000 --data-dir /tmp/metamind-data [--format binary] [--backend sqlite]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+PASSWORD = "password123"
+
+# Share of --records per collection; scholarships and contracts are a small catalogue
+SHARES = {
+    "users": 0.15,
+    "scholarships": 0.01,
+    "applications": 0.20,
+    "messages": 0.40,
+    "transactions": 0.24,
+}
+CONTRACTS = 10
+SPONSOR_EVERY = 50
+
+KIND_CODES = {"user": 1, "scholarship": 2, "application": 3, "message": 4, "transaction": 5, "contract": 6}
+
+# Records are dated in the year before this fixed moment, so runs on different days generate the same files.
+# Open deadlines sit years after it, so the API's deadline scheduler doesn't close the catalogue at startup.
+EPOCH = datetime(2025, 1, 1)
+OPEN_DEADLINE_DAYS = (5 * 365, 8 * 365)
+
+FIRST_NAMES = ["Amina", "Brian", "Chen", "Daniela", "Emeka", "Fatima", "George", "Hana", "Ivan", "Joy",
+               "Kwame", "Lucia", "Mohammed", "Naomi", "Omar", "Priya", "Quinn", "Rosa", "Samuel", "Wanjiru"]
+LAST_NAMES = ["Achieng", "Baker", "Castillo", "Dlamini", "Evans", "Fernandes", "Gupta", "Hassan", "Ito",
+              "Johnson", "Kamau", "Lopez", "Mensah", "Nguyen", "Okafor", "Patel", "Rossi", "Smith"]
+FIELDS = ["STEM", "Engineering", "Nursing", "Computer Science", "Arts and Humanities", "Environmental Science",
+          "Education", "Business", "Public Health", "Agriculture"]
+SPONSORS = ["TechFuture Foundation", "Cultural Heritage Fund", "Civic Engagement Initiative",
+            "Green Earth Foundation", "Open Learning Trust", "Horizon Health Alliance"]
+MESSAGE_TEMPLATES = [
+    "Congratulations! Your application for the {title} has been shortlisted. Please schedule an interview "
+    "with our team in the next week.",
+    "New application received for {title} from {name}.",
+    "You have received {amount} ETH from {sponsor}.",
+    "Reminder: the {title} closes soon. Make sure your documents are uploaded.",
+    "We're pleased to inform you that your project proposal has received positive feedback from our review "
+    "committee.",
+]
+STORY_SENTENCES = [
+    "I am the first in my family to attend university.",
+    "My project uses low-cost sensors to monitor water quality in rural communities.",
+    "I volunteer every weekend teaching coding to secondary school students.",
+    "This scholarship would cover my tuition and lab fees for the coming year.",
+    "I plan to return home after graduation and start a community clinic.",
+    "My research looks at drought-resistant crops for smallholder farmers.",
+]
+
+
+def counts_for(records):
+    counts = {name: max(1, int(records * share)) for name, share in SHARES.items()}
+    counts["scholarships"] = max(5, counts["scholarships"])
+    counts["users"] = max(SPONSOR_EVERY, counts["users"])
+    counts["smart_contracts"] = CONTRACTS
+    return counts
+
+
+def _id(kind, i):
+    return str(uuid.UUID(int=(KIND_CODES[kind] << 120) | i, version=4))
+
+
+def user_id(i):
+    return _id("user", i)
+
+
+def scholarship_id(i):
+    return _id("scholarship", i)
+
+
+def user_email(i):
+    return f"user{i}@example.edu"
+
+
+def user_address(i):
+    return "0x" + hashlib.sha1(f"user:{i}".encode()).hexdigest()
+
+
+def is_sponsor(i):
+    return i % SPONSOR_EVERY == 0
+
+
+def user_name(i):
+    if is_sponsor(i):
+        return SPONSORS[i // SPONSOR_EVERY % len(SPONSORS)]
+    return f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]}"
+
+
+def student_index(rng, users):
+    i = rng.randrange(users)
+    return i + 1 if is_sponsor(i) and i + 1 < users else i
+
+
+def sponsor_index(rng, users):
+    return rng.randrange(0, users, SPONSOR_EVERY)
+
+
+def _time(i, count):
+    # Spread over the year before EPOCH, in index order so pages come out in a realistic order
+    return (EPOCH - timedelta(days=365) + timedelta(seconds=i * 365 * 86400 / count)).isoformat()
+
+
+def scholarships(rng, counts):
+    for i in range(counts["scholarships"]):
+        field = FIELDS[i % len(FIELDS)]
+        is_open = rng.random() < 0.8
+        deadline = EPOCH + timedelta(days=rng.randint(*OPEN_DEADLINE_DAYS) if is_open else -rng.randint(1, 365))
+        yield {
+            "id": scholarship_id(i),
+            "title": f"{field} {rng.choice(['Innovation Grant', 'Fellowship', 'Scholarship', 'Award'])} {i}",
+            "sponsor": SPONSORS[i % len(SPONSORS)],
+            "amount": rng.randrange(1000, 10000, 250),
+            "deadline": deadline.isoformat(),
+            "status": "open" if is_open else "closed",
+            "description": f"Supporting students pursuing degrees in {field.lower()} and related fields.",
+            "requirements": f"Undergraduate or graduate students in {field.lower()} with GPA "
+                            f"{rng.choice(['3.0', '3.3', '3.5'])} or above.",
+            "created_at": _time(i, counts["scholarships"])
+        }
+
+
+def users(rng, counts, password_hash):
+    for i in range(counts["users"]):
+        yield {
+            "id": user_id(i),
+            "address": user_address(i),
+            "name": user_name(i),
+            "email": user_email(i),
+            "password": password_hash,
+            "type": "sponsor" if is_sponsor(i) else "student",
+            "balance": f"{rng.randrange(0, 50000 if is_sponsor(i) else 3000) / 1000:.3f}",
+            "created_at": _time(i, counts["users"])
+        }
+
+
+def messages(rng, counts):
+    for i in range(counts["messages"]):
+        sender = sponsor_index(rng, counts["users"])
+        recipient = student_index(rng, counts["users"])
+        content = rng.choice(MESSAGE_TEMPLATES).format(
+            title=f"{FIELDS[rng.randrange(len(FIELDS))]} Scholarship", name=user_name(recipient),
+            amount=f"0.{rng.randrange(1, 999):03d}", sponsor=user_name(sender))
+        yield {
+            "id": _id("message", i),
+            "sender": {"id": user_id(sender), "name": user_name(sender)},
+            "recipient": {"id": user_id(recipient), "name": user_name(recipient)},
+            "content": content,
+            "timestamp": _time(i, counts["messages"]),
+            "read": rng.random() < 0.6
+        }
+
+
+def applications(rng, counts):
+    for i in range(counts["applications"]):
+        scholarship = rng.randrange(counts["scholarships"])
+        applicant = student_index(rng, counts["users"])
+        yield {
+            "id": _id("application", i),
+            "scholarship_id": scholarship_id(scholarship),
+            "scholarship_title": f"{FIELDS[scholarship % len(FIELDS)]} Scholarship {scholarship}",
+            "applicant_id": user_id(applicant),
+            "story": " ".join(rng.sample(STORY_SENTENCES, rng.randint(2, 4))),
+            "contact_email": user_email(applicant),
+            "contact_phone": f"+2547{rng.randrange(10 ** 8):08d}",
+            "status": rng.choice(["pending", "pending", "pending", "approved", "rejected"]),
+            "submitted_at": _time(i, counts["applications"]),
+            "documents": []
+        }
+
+
+def transactions(rng, counts):
+    for i in range(counts["transactions"]):
+        yield {
+            "id": _id("transaction", i),
+            "from_address": user_address(sponsor_index(rng, counts["users"])),
+            "to_address": user_address(student_index(rng, counts["users"])),
+            "amount": f"0.{rng.randrange(1, 999):03d}",
+            "scholarship_id": scholarship_id(rng.randrange(counts["scholarships"])),
+            "timestamp": _time(i, counts["transactions"]),
+            "status": "completed",
+            "tx_hash": f"0x{rng.getrandbits(256):064x}"
+        }
+
+
+def smart_contracts(rng, counts):
+    for i in range(counts["smart_contracts"]):
+        sponsor = sponsor_index(rng, counts["users"])
+        total = rng.randrange(1, 20)
+        yield {
+            "id": _id("contract", i),
+            "contract_address": f"0x{rng.getrandbits(160):040x}",
+            "title": f"{FIELDS[i % len(FIELDS)]} Scholarship Fund",
+            "description": "Smart contract for distributing scholarships based on achievement milestones",
+            "sponsor_address": user_address(sponsor),
+            "total_funds": f"{total}.0",
+            "remaining_funds": f"{total}.0",
+            "created_at": _time(i, counts["smart_contracts"]),
+            "status": "active",
+            "terms": {
+                "milestones": [
+                    {"description": "Complete application", "percentage": 10},
+                    {"description": "Submit project proposal", "percentage": 20},
+                    {"description": "Mid-term progress report", "percentage": 30},
+                    {"description": "Final project submission", "percentage": 40}
+                ],
+                "minimum_gpa": 3.0,
+                "deadline": (EPOCH + timedelta(days=rng.randint(*OPEN_DEADLINE_DAYS))).isoformat()
+            }
+        }
+
+
+def write_collection(path, records):
+    # One record per line inside a JSON array, so a collection of any size streams straight to disk
+    count = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for record in records:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(record, separators=(",", ":")))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def generate(data_dir, records, seed=42):
+    """Write every collection for a dataset of about ``records`` records; returns the manifest"""
+    from passwords import hash_password
+
+    os.makedirs(data_dir, exist_ok=True)
+    counts = counts_for(records)
+    password_hash = hash_password(PASSWORD, salt=hashlib.sha256(f"{seed}:salt".encode()).digest()[:16])
+    generators = {
+        "scholarships": scholarships(random.Random(f"{seed}:scholarships"), counts),
+        "users": users(random.Random(f"{seed}:users"), counts, password_hash),
+        "messages": messages(random.Random(f"{seed}:messages"), counts),
+        "applications": applications(random.Random(f"{seed}:applications"), counts),
+        "transactions": transactions(random.Random(f"{seed}:transactions"), counts),
+        "smart_contracts": smart_contracts(random.Random(f"{seed}:smart_contracts"), counts),
+    }
+    for name, records_iter in generators.items():
+        write_collection(os.path.join(data_dir, f"{name}.json"), records_iter)
+    manifest = {"seed": seed, "records": records, "counts": counts, "password": PASSWORD}
+    with open(os.path.join(data_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(data_dir):
+    with open(os.path.join(data_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000, help="approximate total records (10^3 to 10^7)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--format", choices=["json", "binary"], default="json",
+                        help="also convert to binary snapshots")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json",
+                        help="also import into SQLite (data-dir/metamind.db)")
+    args = parser.parse_args()
+
+    from repository import convert_snapshots, import_json
+
+    started = time.perf_counter()
+    manifest = generate(args.data_dir, args.records, args.seed)
+    if args.format == "binary":
+        convert_snapshots(args.data_dir, "binary")
+    if args.backend == "sqlite":
+        import_json(args.data_dir, os.path.join(args.data_dir, "metamind.db"))
+    print(json.dumps({**manifest, "seconds": round(time.perf_counter() - started, 1)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
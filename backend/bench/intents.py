@@ -0,0 +1,98 @@
+"""Per-message cost of intent matching as the number of intents grows.
+
+Pads the WhatsApp bot's intent table with synthetic intents (5 keywords
+each) and times matching a corpus of sample messages with the compiled
+IntentMatcher and with the old approach: an if/elif chain of substring
+``any(word in message ...)`` checks, one intent after another.
+
+Usage:
+    python bench/intents.py [--rounds 20] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from intents import IntentMatcher
+
+INTENT_COUNTS = [10, 100, 1000, 10000]
+
+SAMPLE_MESSAGES = [
+    "hi there",
+    "Hello! Can you help me?",
+    "what undergraduate scholarships are there",
+    "Any graduate fellowships for this year?",
+    "I'm an international student from Kenya looking for funding",
+    "scholarships for minority students in engineering",
+    "how do I apply for the Pell grant",
+    "when is the deadline for the fall application",
+    "is there financial aid for nursing school",
+    "Can I get a student loan without a cosigner?",
+    "my university tuition went up, any grants?",
+    "what is the weather today",
+    "thanks, that was useful",
+    "Tell me about scholarships for women in STEM at community college",
+    "I need money for books and rent this semester, what are my options?",
+]
+
+
+def synthetic_intents(count):
+    rng = random.Random(count)
+    return [(f"topic{i}", [f"kw{i}x{j}{rng.randint(0, 999)}" for j in range(5)]) for i in range(count)]
+
+
+def legacy_match(intents, message):
+    message = message.lower()
+    for name, keywords in intents:
+        if any(word in message for word in keywords):
+            return name
+    return None
+
+
+def time_per_message(match, messages, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            match(message)
+    return (time.perf_counter() - started) / (rounds * len(messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20, help="passes over the sample corpus")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    import whatsapp
+    bot_intents = [(name, keywords) for name, keywords, _ in whatsapp.INTENTS]
+
+    results = []
+    for count in INTENT_COUNTS:
+        # The bot's own intents keep their precedence; padding goes after the Gemini fallback
+        intents = bot_intents + synthetic_intents(count - len(bot_intents))
+        started = time.perf_counter()
+        matcher = IntentMatcher(intents)
+        compile_ms = (time.perf_counter() - started) * 1000
+        result = {
+            "intents": count,
+            "compile_ms": round(compile_ms, 2),
+            "compiled_us": round(time_per_message(matcher.match, SAMPLE_MESSAGES, args.rounds) * 1e6, 2),
+            "substring_chain_us": round(time_per_message(
+                lambda m: legacy_match(intents, m), SAMPLE_MESSAGES, args.rounds) * 1e6, 2),
+        }
+        results.append(result)
+        if not args.json:
+            print(f"{count:>6} intents   compiled {result['compiled_us']:>8.2f} us/msg"
+                  f"   substring chain {result['substring_chain_us']:>10.2f} us/msg"
+                  f"   (compile {result['compile_ms']:.1f} ms)")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
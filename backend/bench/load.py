@@ -0,0 +1,361 @@
+"""Replay a weighted mix of real API requests and report latency, throughput and memory.
+
+Uses a dataset from ``bench/datagen.py`` (--data-dir, or --records to
+generate one), copied to a scratch directory for each run so the writes of
+one run never leak into the next. The request sequence is drawn from --seed,
+so two runs against the same dataset send exactly the same requests.
+
+Modes (--mode, default both):
+
+- ``client``: the Flask test client in a fresh process, no network. Besides
+  latency it measures memory per endpoint: a second pass runs
+  --memory-samples requests of each endpoint under ``tracemalloc`` and
+  reports the peak Python allocation per request.
+- ``server``: the API served by a real threaded WSGI server (werkzeug) in a
+  child process, driven over HTTP. Reports the server's resident memory
+  before and after the run.
+
+Per endpoint, each mode reports requests, errors and status codes,
+throughput, and p50/p95/p99/max latency. Rate limits are disabled for the
+run. --json prints everything as JSON and --output writes it to a file, so
+runs can be compared.
+
+Usage:
+    python bench/load.py --records 100000 [--requests 5000] [--concurrency 8] [--mode client|server|both] [--json]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+# Endpoint -> share of the request mix
+MIX = {
+    "login": 5,
+    "list_scholarships": 25,
+    "get_scholarship": 10,
+    "submit_application": 10,
+    "record_transaction": 10,
+    "inbox": 30,
+    "unread_count": 10,
+}
+
+
+def build_request(name, rng, counts):
+    """Return ``(method, path, json body or None)`` for one request to endpoint ``name``"""
+    users = counts["users"]
+    if name == "login":
+        i = rng.randrange(users)
+        return "POST", "/api/auth/login", {"email": datagen.user_email(i), "password": datagen.PASSWORD}
+    if name == "list_scholarships":
+        return "GET", "/api/scholarships", None
+    if name == "get_scholarship":
+        return "GET", f"/api/scholarships/{datagen.scholarship_id(rng.randrange(counts['scholarships']))}", None
+    if name == "submit_application":
+        scholarship = rng.randrange(counts["scholarships"])
+        applicant = datagen.student_index(rng, users)
+        return "POST", "/api/applications", {
+            "scholarshipId": datagen.scholarship_id(scholarship),
+            "scholarshipTitle": f"Scholarship {scholarship}",
+            "applicantId": datagen.user_id(applicant),
+            "story": "I am the first in my family to attend university.",
+            "contactEmail": datagen.user_email(applicant),
+            "contactPhone": "+254700000000"
+        }
+    if name == "record_transaction":
+        return "POST", "/api/transactions", {
+            "fromAddress": datagen.user_address(datagen.sponsor_index(rng, users)),
+            "toAddress": datagen.user_address(datagen.student_index(rng, users)),
+            "amount": f"0.{rng.randrange(1, 999):03d}",
+            "scholarshipId": datagen.scholarship_id(rng.randrange(counts["scholarships"]))
+        }
+    if name == "inbox":
+        return "GET", f"/api/messages/{datagen.user_id(datagen.student_index(rng, users))}?limit=50", None
+    if name == "unread_count":
+        return "GET", f"/api/messages/{datagen.user_id(datagen.student_index(rng, users))}/unread", None
+    raise ValueError(f"Unknown endpoint {name}")
+
+
+def schedule(requests, counts, seed):
+    rng = random.Random(seed)
+    names = rng.choices(list(MIX), weights=list(MIX.values()), k=requests)
+    return [(name, *build_request(name, rng, counts)) for name in names]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(samples, wall):
+    """Per-endpoint stats from ``(endpoint, seconds, status)`` samples over ``wall`` seconds"""
+    by_endpoint = {}
+    for name, seconds, status in samples:
+        by_endpoint.setdefault(name, []).append((seconds, status))
+    by_endpoint["all"] = [(seconds, status) for _, seconds, status in samples]
+    summary = {}
+    for name, results in by_endpoint.items():
+        latencies = [seconds for seconds, _ in results]
+        statuses = {}
+        for _, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[name] = {
+            "requests": len(results),
+            "errors": sum(1 for _, status in results if not 200 <= status < 400),
+            "statuses": statuses,
+            "throughput_rps": round(len(results) / wall, 1),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+        }
+    return summary
+
+
+def drive(requests, concurrency, send):
+    """Send ``requests`` from ``concurrency`` threads; ``send(method, path, body)`` returns a status code"""
+    samples = []
+    lock = threading.Lock()
+    position = iter(range(len(requests)))
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                break
+            name, method, path, body = requests[index]
+            started = time.perf_counter()
+            status = send(method, path, body)
+            local.append((name, time.perf_counter() - started, status))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def run_environment(data_dir, args):
+    return dict(os.environ, DATA_DIR=data_dir, STORAGE_BACKEND=args.backend, STORAGE_SNAPSHOT_FORMAT=args.format,
+                SQLITE_PATH=os.path.join(data_dir, "metamind.db"), RATE_LIMIT_ENABLED="false",
+                MAX_CONCURRENT_REQUESTS=str(max(64, args.concurrency * 2)), WERKZEUG_RUN_MAIN="true")
+
+
+# ----- Test client (runs in its own process) -----
+
+def client_run(args):
+    manifest = datagen.read_manifest(args.data_dir)
+    requests = schedule(args.requests, manifest["counts"], args.seed)
+    started = time.perf_counter()
+    import app
+    startup_s = time.perf_counter() - started
+    rss_before = rss_mb()
+    clients = threading.local()
+
+    def send(method, path, body):
+        client = getattr(clients, "client", None)
+        if client is None:
+            client = clients.client = app.app.test_client()
+        return client.open(path, method=method, json=body).status_code
+
+    samples, wall = drive(requests, args.concurrency, send)
+    summary = summarize(samples, wall)
+    result = {"startup_s": round(startup_s, 2), "wall_s": round(wall, 2), "rss_mb_before": rss_before,
+              "rss_mb_after": rss_mb(), "endpoints": summary}
+
+    # Memory per endpoint, in a separate pass so tracing doesn't slow the latency numbers above
+    rng = random.Random(args.seed + 1)
+    client = app.app.test_client()
+    tracemalloc.start()
+    for name in MIX:
+        peaks = []
+        for _ in range(args.memory_samples):
+            method, path, body = build_request(name, rng, manifest["counts"])
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            client.open(path, method=method, json=body)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        summary[name]["alloc_kb_mean"] = round(sum(peaks) / len(peaks) / 1024, 1)
+        summary[name]["alloc_kb_max"] = round(max(peaks) / 1024, 1)
+    tracemalloc.stop()
+    app.notifier.flush(10)
+    print(json.dumps(result))
+
+
+def client_mode(data_dir, args):
+    command = [sys.executable, os.path.abspath(__file__), "--run-client", "--data-dir", data_dir,
+               "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--seed", str(args.seed),
+               "--memory-samples", str(args.memory_samples), "--backend", args.backend, "--format", args.format]
+    output = subprocess.run(command, env=run_environment(data_dir, args), cwd=BACKEND_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# ----- Real WSGI server -----
+
+def serve(args):
+    import logging
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    import app
+    make_server("127.0.0.1", args.port, app.app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The API server exited during startup")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"The API server didn't start within {timeout}s")
+
+
+def server_mode(data_dir, args):
+    manifest = datagen.read_manifest(data_dir)
+    requests = schedule(args.requests, manifest["counts"], args.seed)
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)],
+                               env=run_environment(data_dir, args), cwd=BACKEND_DIR)
+    try:
+        wait_for(port, process, timeout=600)
+        startup_s = time.perf_counter() - started
+        rss_before = rss_mb(process.pid)
+
+        def send(method, path, body):
+            # The development server closes each connection after its response, so open one per request
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            try:
+                payload = json.dumps(body) if body is not None else None
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                return response.status
+            finally:
+                connection.close()
+
+        samples, wall = drive(requests, args.concurrency, send)
+        return {"startup_s": round(startup_s, 2), "wall_s": round(wall, 2), "server_rss_mb_before": rss_before,
+                "server_rss_mb_after": rss_mb(process.pid), "endpoints": summarize(samples, wall)}
+    finally:
+        process.terminate()
+        process.wait(30)
+
+
+def print_table(mode, result):
+    print(f"\n{mode}: {result['wall_s']}s for {result['endpoints']['all']['requests']} requests "
+          f"(startup {result['startup_s']}s)")
+    print(f"{'endpoint':<20} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          f" {'alloc KB':>9}")
+    for name, stats in result["endpoints"].items():
+        alloc = stats.get("alloc_kb_mean", "")
+        print(f"{name:<20} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {alloc:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", help="dataset from bench/datagen.py (left unchanged)")
+    parser.add_argument("--records", type=int, default=10000, help="generate a dataset of this size instead")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=["client", "server", "both"], default="both")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--format", choices=["json", "binary"], default="json", help="JSON backend snapshot format")
+    parser.add_argument("--memory-samples", type=int, default=20, help="requests per endpoint in the memory pass")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--run-client", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_client:
+        return client_run(args)
+    if args.serve:
+        return serve(args)
+
+    from repository import convert_snapshots, import_json
+
+    root = tempfile.mkdtemp(prefix="metamind-load-")
+    try:
+        source = args.data_dir
+        if source is None:
+            source = os.path.join(root, "dataset")
+            datagen.generate(source, args.records, args.seed)
+        manifest = datagen.read_manifest(source)
+        results = {
+            "config": {"records": manifest["records"], "counts": manifest["counts"], "dataset_seed": manifest["seed"],
+                       "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+                       "backend": args.backend, "format": args.format, "mix": MIX}
+        }
+        for mode in (["client", "server"] if args.mode == "both" else [args.mode]):
+            data_dir = os.path.join(root, mode)
+            shutil.copytree(source, data_dir)
+            if args.backend == "sqlite" and not os.path.exists(os.path.join(data_dir, "metamind.db")):
+                import_json(data_dir, os.path.join(data_dir, "metamind.db"))
+            elif args.backend == "json" and args.format == "binary":
+                convert_snapshots(data_dir, "binary")
+            results[mode] = client_mode(data_dir, args) if mode == "client" else server_mode(data_dir, args)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode in ("client", "server"):
+        if mode in results:
+            print_table(mode, results[mode])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Login latency and throughput at different password work factors.
+
+For each work factor, creates a set of users hashed with it and runs
+concurrent POST /api/auth/login requests through the Flask test client,
+reporting p50/p99 latency and logins per second. The verified-credential
+cache is off unless --cache is given, so the numbers show the KDF cost.
+
+Usage:
+    python bench/login.py --threads 8 --logins 20 [--workers 2] [--cache] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+WORK_FACTORS = [
+    {"scheme": "scrypt", "scrypt_n": 2 ** 12},
+    {"scheme": "scrypt", "scrypt_n": 2 ** 14},
+    {"scheme": "scrypt", "scrypt_n": 2 ** 15},
+    {"scheme": "pbkdf2", "pbkdf2_iterations": 100000},
+    {"scheme": "pbkdf2", "pbkdf2_iterations": 600000},
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(app, threads, logins, tag):
+    latencies = []
+    lock = threading.Lock()
+    emails = [f"bench-{tag}-{i}@example.com" for i in range(threads)]
+    for email in emails:
+        app.users.insert({
+            "id": str(uuid.uuid4()), "address": "", "name": email, "email": email,
+            "password": app.hash_password("correct horse"), "type": "student", "balance": "0.0",
+            "created_at": "2025-01-01T00:00:00"
+        })
+
+    def worker(email):
+        c = app.app.test_client()
+        for _ in range(logins):
+            started = time.perf_counter()
+            r = c.post("/api/auth/login", json={"email": email, "password": "correct horse"})
+            elapsed = time.perf_counter() - started
+            assert r.status_code == 200, r.status_code
+            with lock:
+                latencies.append(elapsed)
+
+    pool = [threading.Thread(target=worker, args=(email,)) for email in emails]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - started
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "logins_per_s": round(len(latencies) / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=20, help="logins per thread")
+    parser.add_argument("--workers", type=int, default=2, help="KDF worker pool size (0 = inline)")
+    parser.add_argument("--cache", action="store_true", help="enable the verified-credential cache")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="metamind-bench-")
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    import app
+    import passwords
+
+    results = []
+    for tag, factor in enumerate(WORK_FACTORS):
+        passwords.configure(workers=args.workers, cache_ttl=300 if args.cache else 0, **factor)
+        result = run(app, args.threads, args.logins, tag)
+        label = ", ".join(f"{k}={v}" for k, v in factor.items())
+        results.append({"work_factor": factor, **result})
+        if not args.json:
+            print(f"{label:<40} p50 {result['p50_ms']:>8.2f} ms   p99 {result['p99_ms']:>8.2f} ms"
+                  f"   {result['logins_per_s']:>8.1f} logins/s")
+    passwords.shutdown()
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
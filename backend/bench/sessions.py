@@ -0,0 +1,92 @@
+"""Memory footprint and speed of the WhatsApp conversation store.
+
+Fills a session store with --senders active senders, each with --turns
+turns (alternating question and answer of realistic length, each a
+distinct string as real messages would be), then reports the memory
+actually allocated (tracemalloc), the store's own size estimate that
+drives its memory cap, and append/history throughput. With --backend
+sqlite the database file size is reported instead.
+
+Usage:
+    python bench/sessions.py [--senders 100000] [--turns 6] [--backend memory|sqlite] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sessions import MemorySessionStore, SqliteSessionStore
+
+QUESTIONS = [
+    "what scholarships are there for nursing students in texas",
+    "what about deadlines for that one?",
+    "do I need a 3.5 gpa for it",
+    "are there grants for international students studying engineering",
+]
+ANSWER = ("There are several options worth a look, including state grants and foundation scholarships. "
+          "Check eligibility and deadlines on each sponsor's site, and apply early.")
+
+
+def fill(store, senders, turns, rng):
+    started = time.perf_counter()
+    for i in range(senders):
+        sender = f"whatsapp:+2547{i:08d}"
+        for turn in range(turns):
+            if turn % 2 == 0:
+                store.append(sender, "user", f"{rng.choice(QUESTIONS)} ({i})")
+            else:
+                store.append(sender, "bot", f"{ANSWER} ({i})")
+    return senders * turns / (time.perf_counter() - started)
+
+
+def read(store, senders, rng, lookups=20000):
+    started = time.perf_counter()
+    for _ in range(lookups):
+        store.history(f"whatsapp:+2547{rng.randrange(senders):08d}")
+    return lookups / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--senders", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=6, help="turns per sender (also the ring buffer size)")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    result = {"backend": args.backend, "senders": args.senders, "turns": args.turns}
+    if args.backend == "memory":
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        store = MemorySessionStore(max_turns=args.turns, max_bytes=2 ** 40)
+        result["appends_per_s"] = round(fill(store, args.senders, args.turns, rng))
+        allocated = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        result["allocated_mb"] = round(allocated / 2 ** 20, 1)
+        result["bytes_per_sender"] = round(allocated / args.senders)
+        result["estimated_mb"] = round(store.stats()["estimated_bytes"] / 2 ** 20, 1)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="metamind-bench-"), "sessions.db")
+        store = SqliteSessionStore(path, max_turns=args.turns)
+        result["appends_per_s"] = round(fill(store, args.senders, args.turns, rng))
+        store.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        result["file_mb"] = round(os.path.getsize(path) / 2 ** 20, 1)
+        result["bytes_per_sender"] = round(os.path.getsize(path) / args.senders)
+    result["history_reads_per_s"] = round(read(store, args.senders, rng))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:<22} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Cold-start time and memory with JSON vs. binary snapshots.
+
+Generates a dataset (--users, --messages, --transactions, --applications)
+as pretty-printed JSON files, converts a copy to binary snapshots with
+``repository.convert_snapshots``, then starts the API once per format in a
+fresh process and reports:
+
+- ``import_s``: time to import ``app`` (load every collection, build indexes
+  and the startup aggregates)
+- ``first_request_s``: import plus one inbox page request, i.e. time to first
+  response
+- ``rss_mb``: resident memory after that request, and ``private_mb``, the
+  anonymous part of it; mapped snapshot pages are file-backed and shared
+  between forked workers, so ``private_mb`` is what each worker adds
+
+Usage:
+    python bench/startup.py [--messages 200000] [--transactions 100000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+
+def generate(data_dir, counts, rng):
+    users = [{
+        "id": f"user-{i}",
+        "name": f"Student {i}",
+        "email": f"student{i}@example.com",
+        "address": f"0x{i:040x}",
+        "type": "sponsor" if i == 0 else "student",
+        "balance": "1.5",
+        "created_at": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}"
+    } for i in range(counts["users"])]
+    messages = [{
+        "id": f"message-{i}",
+        "sender": {"id": "system", "name": "System"},
+        "recipient": {"id": f"user-{rng.randrange(counts['users'])}", "name": "Student"},
+        "content": "New application received for STEM Innovation Grant from a student. " * rng.randint(1, 3),
+        "timestamp": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:{i % 60:02d}.{i:06d}",
+        "read": rng.random() < 0.7
+    } for i in range(counts["messages"])]
+    transactions = [{
+        "id": f"transaction-{i}",
+        "from_address": f"0x{0:040x}",
+        "to_address": f"0x{rng.randrange(counts['users']):040x}",
+        "amount": f"0.{rng.randrange(1, 999):03d}",
+        "scholarship_id": None,
+        "timestamp": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:{i % 60:02d}.{i:06d}",
+        "status": "completed",
+        "tx_hash": f"0x{rng.getrandbits(256):064x}"
+    } for i in range(counts["transactions"])]
+    applications = [{
+        "id": f"application-{i}",
+        "scholarship_id": f"scholarship-{i % 50}",
+        "scholarship_title": "STEM Innovation Grant",
+        "applicant_id": f"user-{rng.randrange(counts['users'])}",
+        "story": "I am studying engineering and would use the grant for tuition. " * rng.randint(2, 6),
+        "contact_email": f"student{i}@example.com",
+        "contact_phone": "+254700000000",
+        "status": "pending",
+        "submitted_at": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:{i % 60:02d}.{i:06d}",
+        "documents": []
+    } for i in range(counts["applications"])]
+    for name, records in (("users", users), ("messages", messages),
+                          ("transactions", transactions), ("applications", applications)):
+        with open(os.path.join(data_dir, f"{name}.json"), "w") as f:
+            json.dump(records, f, indent=2)
+
+
+def memory():
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon"):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+
+def child():
+    # Runs in a fresh interpreter: DATA_DIR and STORAGE_SNAPSHOT_FORMAT come from the parent
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter() - started
+    response = app.app.test_client().get("/api/messages/user-1?limit=50")
+    assert response.status_code == 200
+    first_request = time.perf_counter() - started
+    usage = memory()
+    print(json.dumps({
+        "import_s": round(imported, 3),
+        "first_request_s": round(first_request, 3),
+        "rss_mb": round(usage.get("VmRSS", 0), 1),
+        "private_mb": round(usage.get("RssAnon", 0), 1)
+    }))
+    os._exit(0)
+
+
+def start(data_dir, snapshot_format):
+    env = dict(os.environ, DATA_DIR=data_dir, STORAGE_SNAPSHOT_FORMAT=snapshot_format,
+               STORAGE_BACKEND="json", RATE_LIMIT_ENABLED="false")
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], env=env, cwd=BACKEND_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def size_mb(data_dir, suffix):
+    return round(sum(os.path.getsize(os.path.join(data_dir, f))
+                     for f in os.listdir(data_dir) if f.endswith(suffix)) / 2 ** 20, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--applications", type=int, default=50000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    if args.child:
+        child()
+
+    from repository import convert_snapshots
+
+    counts = {"users": args.users, "messages": args.messages,
+              "transactions": args.transactions, "applications": args.applications}
+    root = tempfile.mkdtemp(prefix="metamind-bench-")
+    try:
+        json_dir = os.path.join(root, "json")
+        binary_dir = os.path.join(root, "binary")
+        os.makedirs(json_dir)
+        generate(json_dir, counts, random.Random(42))
+        shutil.copytree(json_dir, binary_dir)
+        started = time.perf_counter()
+        convert_snapshots(binary_dir, "binary")
+        convert_s = round(time.perf_counter() - started, 2)
+
+        results = {"records": counts, "convert_s": convert_s}
+        results["json"] = dict(start(json_dir, "json"), files_mb=size_mb(json_dir, ".json"))
+        results["binary"] = dict(start(binary_dir, "binary"), files_mb=size_mb(binary_dir, ".snap"))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"records: {counts}  (conversion took {convert_s}s)")
+    print(f"{'format':<8} {'import s':>9} {'first req s':>12} {'rss MB':>8} {'private MB':>11} {'files MB':>9}")
+    for name in ("json", "binary"):
+        r = results[name]
+        print(f"{name:<8} {r['import_s']:>9} {r['first_request_s']:>12} {r['rss_mb']:>8} "
+              f"{r['private_mb']:>11} {r['files_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Batch bodies for the bulk write endpoints.
+
+A bulk endpoint takes its items as a JSON array, or as newline-delimited JSON
+(``Content-Type: application/x-ndjson``, one object per line). Every item is
+validated before anything is written; if any item is invalid the whole batch
+is rejected and nothing is applied. A valid batch is applied in one
+transaction, so it is persisted with one write per collection however many
+items it holds.
+
+Responses carry one result per item, in request order.
+"""
+import json
+
+from flask import jsonify, request
+
+MAX_ITEMS = 5000
+
+
+class BulkError(ValueError):
+    pass
+
+
+def parse_items(max_items=MAX_ITEMS):
+    """Read the request body as a list of JSON objects"""
+    if request.mimetype == "application/x-ndjson":
+        items = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise BulkError(f"Line {number} is not valid JSON")
+    else:
+        items = request.get_json(silent=True)
+        if isinstance(items, dict) and isinstance(items.get("items"), list):
+            items = items["items"]
+        if not isinstance(items, list):
+            raise BulkError("Expected a JSON array of items or newline-delimited JSON")
+    if not items:
+        raise BulkError("No items to apply")
+    if len(items) > max_items:
+        raise BulkError(f"At most {max_items} items per request")
+    return items
+
+
+def require(item, *fields):
+    """Return ``item`` if every field is present and not empty; raises ValueError naming the missing ones"""
+    missing = [field for field in fields if item.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    return item
+
+
+def validate_items(items, build):
+    """Run ``build`` over every item; returns ``(built, errors)`` with errors as ``(index, message)``"""
+    built = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item:
+            errors.append((index, "Item must be a non-empty JSON object"))
+            continue
+        try:
+            built.append(build(item))
+        except ValueError as e:
+            errors.append((index, str(e)))
+    return built, errors
+
+
+def rejected(count, errors):
+    """400 response listing every item, with the reason for each invalid one"""
+    reasons = dict(errors)
+    results = [{"index": i, "ok": i not in reasons} for i in range(count)]
+    for result in results:
+        if not result["ok"]:
+            result["error"] = reasons[result["index"]]
+    return jsonify({
+        "error": f"{len(errors)} of {count} items are invalid; nothing was applied",
+        "applied": 0,
+        "results": results
+    }), 400
+
+
+def applied(records):
+    return jsonify({
+        "applied": len(records),
+        "results": [{"index": i, "ok": True, "record": record} for i, record in enumerate(records)]
+    }), 201
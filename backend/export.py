@@ -0,0 +1,36 @@
+"""Streaming newline-delimited JSON exports.
+
+Records are serialized one at a time from a generator, so an export of any
+size uses constant memory and the first row reaches the client as soon as it
+is read.
+"""
+import json
+from datetime import datetime
+
+from flask import Response, stream_with_context
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_time(value, name):
+    """Normalize an ISO date/time query argument so it compares with stored timestamps"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ExportError(f"{name} must be an ISO 8601 date or datetime")
+
+
+def ndjson_response(records, filters=None):
+    """Stream ``records`` as NDJSON, skipping any that don't match ``filters`` exactly"""
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+
+    def generate():
+        for record in records:
+            if all(record.get(k) == v for k, v in filters.items()):
+                yield json.dumps(record, separators=(",", ":")) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
@@ -0,0 +1,250 @@
+"""Unread counts and live delivery of new messages.
+
+``Inbox`` keeps a running unread count per recipient, built once from the
+messages collection and then moved by every insert and read, so the count
+endpoint never scans the inbox. It also holds the open event streams: each
+``Subscription`` is a small bounded queue that new messages for its user are
+pushed onto, and ``sse_stream`` turns one into a ``text/event-stream`` body.
+
+Counts and subscribers live in this process. When several server processes
+share a SQLite database, ``SqliteInbox`` counts unread messages in SQL instead
+and its streams poll the messages table, so they see every process's writes.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+from indexes import index_value
+
+
+def recipient_id(message):
+    recipient = message.get("recipient")
+    return index_value(recipient.get("id")) if isinstance(recipient, dict) else None
+
+
+class Subscription:
+    def __init__(self, user_id, max_pending=100):
+        self.user_id = user_id
+        self._cond = threading.Condition()
+        self._pending = deque(maxlen=max_pending)
+
+    def push(self, message):
+        # A client too slow to take max_pending messages loses the oldest; it can refetch the inbox
+        with self._cond:
+            self._pending.append(message)
+            self._cond.notify_all()
+
+    def get(self, timeout):
+        """Wait up to ``timeout`` seconds for new messages; returns them all, oldest first"""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            messages = list(self._pending)
+            self._pending.clear()
+            return messages
+
+
+class PolledSubscription(Subscription):
+    """Subscription fed from the messages table, whichever process stored the messages"""
+
+    def __init__(self, inbox, user_id, max_pending=100):
+        super().__init__(user_id, max_pending)
+        self.inbox = inbox
+        self.max_pending = max_pending
+        self._after = inbox.last_rowid()
+        self._woken = False
+
+    def push(self, message):
+        # The message is read back from the table; a local insert only cuts the wait short
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self.inbox.since(self.user_id, self._after, self.max_pending)
+            if rows:
+                self._after = rows[-1][0]
+                self.inbox.pushed(len(rows))
+                return [message for _, message in rows]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            with self._cond:
+                if not self._woken:
+                    self._cond.wait(min(remaining, self.inbox.poll_interval))
+                self._woken = False
+
+
+class Inbox:
+    # Streams re-check the unread count this often (seconds); None when every change is pushed
+    poll_interval = None
+
+    def __init__(self, messages=(), max_streams=1000, max_pending=100):
+        self.max_streams = max_streams
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._unread = {}
+        self._subscribers = {}
+        self._streams = 0
+        self._counts = {"published": 0, "pushed": 0, "rejected_streams": 0}
+        for message in messages:
+            if not message.get("read"):
+                user_id = recipient_id(message)
+                self._unread[user_id] = self._unread.get(user_id, 0) + 1
+
+    def unread(self, user_id):
+        with self._lock:
+            return self._unread.get(user_id, 0)
+
+    def added(self, messages):
+        """Count newly stored ``messages`` and push them to their recipients' streams"""
+        targets = []
+        with self._lock:
+            for message in messages:
+                user_id = recipient_id(message)
+                if not message.get("read"):
+                    self._unread[user_id] = self._unread.get(user_id, 0) + 1
+                self._counts["published"] += 1
+                for subscription in self._subscribers.get(user_id, ()):
+                    targets.append((subscription, message))
+            self._counts["pushed"] += len(targets)
+        for subscription, message in targets:
+            subscription.push(message)
+
+    def pushed(self, count):
+        with self._lock:
+            self._counts["pushed"] += count
+
+    def marked_read(self, user_id, count=1):
+        """Lower ``user_id``'s unread count by ``count``"""
+        with self._lock:
+            remaining = self._unread.get(user_id, 0) - count
+            if remaining > 0:
+                self._unread[user_id] = remaining
+            else:
+                self._unread.pop(user_id, None)
+
+    def subscribe(self, user_id):
+        """Open a stream for ``user_id``; returns None once ``max_streams`` are open"""
+        with self._lock:
+            if self._streams >= self.max_streams:
+                self._counts["rejected_streams"] += 1
+                return None
+            subscription = self._subscription(user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._streams += 1
+            return subscription
+
+    def _subscription(self, user_id):
+        return Subscription(user_id, self.max_pending)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+                self._streams -= 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, streams=self._streams, max_streams=self.max_streams,
+                        users_with_unread=len(self._unread))
+
+
+class SqliteInbox(Inbox):
+    """Unread counts and streams read from the repository's SQLite database, which every process writes to"""
+
+    def __init__(self, repository, max_streams=1000, max_pending=100, poll_interval=1.0):
+        super().__init__((), max_streams, max_pending)
+        self.repository = repository
+        self.poll_interval = poll_interval
+        repository.connection().execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages (recipient_id, read)")
+
+    def unread(self, user_id):
+        # read holds 1/0 for booleans (TEXT affinity), or NULL when missing
+        return self.repository.connection().execute(
+            "SELECT COUNT(*) FROM messages WHERE recipient_id = ? AND (read IS NULL OR read IN ('0', '0.0'))",
+            (user_id,)).fetchone()[0]
+
+    def added(self, messages):
+        # Nothing to count; the recipients' local streams are woken to read the messages back from the table
+        targets = []
+        with self._lock:
+            self._counts["published"] += len(messages)
+            for message in messages:
+                for subscription in self._subscribers.get(recipient_id(message), ()):
+                    targets.append((subscription, message))
+        for subscription, message in targets:
+            subscription.push(message)
+
+    def marked_read(self, user_id, count=1):
+        # Counted from the table, which the caller's transaction has already updated
+        pass
+
+    def last_rowid(self):
+        return self.repository.connection().execute("SELECT COALESCE(MAX(rowid), 0) FROM messages").fetchone()[0]
+
+    def since(self, user_id, after, limit):
+        """Up to ``limit`` ``(rowid, message)`` pairs for ``user_id`` stored after rowid ``after``, oldest first"""
+        rows = self.repository.connection().execute(
+            "SELECT rowid, data FROM messages WHERE recipient_id = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+            (user_id, after, limit))
+        return [(rowid, json.loads(data)) for rowid, data in rows]
+
+    def _subscription(self, user_id):
+        return PolledSubscription(self, user_id, self.max_pending)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, streams=self._streams, max_streams=self.max_streams)
+
+
+def _event(name, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_stream(inbox, subscription, heartbeat=15.0, max_duration=300.0):
+    """Yield server-sent events for ``subscription`` until ``max_duration`` passes or the client leaves.
+
+    The stream opens with the current unread count, then sends a ``message``
+    event per new message followed by the updated count. An inbox that polls
+    also sends the count when it changes otherwise (messages read elsewhere).
+    Comment lines keep idle connections open through proxies; after
+    ``max_duration`` the stream ends and the browser's ``EventSource``
+    reconnects.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        unread = inbox.unread(subscription.user_id)
+        yield _event("unread", {"unread": unread})
+        now = time.monotonic()
+        deadline = now + max_duration
+        quiet_since = now
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            wait = min(deadline - now, heartbeat - (now - quiet_since), inbox.poll_interval or heartbeat)
+            messages = subscription.get(max(wait, 0.0))
+            for message in messages:
+                yield _event("message", message, message.get("id"))
+            count = inbox.unread(subscription.user_id) if messages or inbox.poll_interval else unread
+            if messages or count != unread:
+                unread = count
+                yield _event("unread", {"unread": unread})
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= heartbeat:
+                yield ": keepalive\n\n"
+                quiet_since = time.monotonic()
+    finally:
+        # Runs when the stream ends or the server closes the generator after the client disconnects
+        inbox.unsubscribe(subscription)
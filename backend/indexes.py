@@ -0,0 +1,240 @@
+"""In-memory collections with hash indexes on lookup fields.
+
+Each index maps a field value to the ``(order_by, id)`` sort keys of the
+records holding it, kept sorted, so lookups cost the size of the result rather
+than the size of the collection, and a filtered page (one user's inbox or
+transactions) resumes from its cursor with a binary search in that list
+rather than sorting everything the user has. Nested fields use dotted
+paths, e.g. ``"recipient.id"`` for messages. Only string and number values
+are indexed; a record whose field holds a list or object (client input is
+not type-checked) is stored but can't be found by that field.
+
+Collections also keep all their sort keys in one sorted list, so unfiltered
+pages resume from a cursor the same way.
+
+Records may also start out as lazy placeholders (``snapshot.LazyRecord``):
+anything other than a dict that provides ``key(path)`` for the indexed and
+``order_by`` fields and ``load()`` for the full record. Placeholders are
+indexed from their keys and replaced by the decoded record the first time it
+is read.
+"""
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+
+def field_value(record, path):
+    value = record
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def index_value(value):
+    """The value an index files a field under: a string or number, or None for anything else (not indexed)"""
+    return value if isinstance(value, (str, int, float)) and value != "" else None
+
+
+def _key(record, path):
+    return field_value(record, path) if record.__class__ is dict else record.key(path)
+
+
+def _partial(record, fields):
+    # A dict holding just ``fields`` (dotted paths nested back into dicts), read from a placeholder's keys
+    partial = {}
+    for path in fields:
+        *parents, name = path.split(".")
+        target = partial
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[name] = record.key(path)
+    return partial
+
+
+class IndexedCollection:
+    def __init__(self, records, indexes=(), order_by="id"):
+        self._records = {}
+        self._indexes = {field: {} for field in indexes}
+        self.order_by = order_by
+        # Sorted once after loading rather than one insort per record
+        self._sorted = None
+        self._initial_keys = {}
+        for record in records:
+            self._add(record)
+        self._sorted = sorted(self._initial_keys.values())
+        del self._initial_keys
+        for index in self._indexes.values():
+            for keys in index.values():
+                keys.sort()
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def __len__(self):
+        return len(self._records)
+
+    def _load(self, record_id, record):
+        # Decode a placeholder and keep the result; a concurrent reader decoding it too is harmless
+        if record.__class__ is dict:
+            return record
+        loaded = record.load()
+        if self._records.get(record_id) is record:
+            self._records[record_id] = loaded
+        return loaded
+
+    def all(self):
+        return [r if r.__class__ is dict else self._load(i, r) for i, r in list(self._records.items())]
+
+    def get(self, record_id):
+        return self._get(record_id)
+
+    def scan_fields(self, fields):
+        """Every record, in no particular order; placeholders give a partial record with only ``fields``.
+
+        For startup aggregates that need a few fields of every record without decoding them all.
+        """
+        return [r if r.__class__ is dict else _partial(r, fields) for r in list(self._records.values())]
+
+    def _get(self, record_id):
+        record = self._records.get(record_id)
+        return self._load(record_id, record) if record is not None else None
+
+    def find(self, field, value):
+        """Return every record whose ``field`` equals ``value``"""
+        if field == "id":
+            record = self._get(value)
+            return [record] if record else []
+        return [self._get(record_id) for _, record_id in list(self._indexes[field].get(index_value(value), ()))]
+
+    def find_one(self, field, value):
+        if field == "id":
+            return self._get(value)
+        matches = self._indexes[field].get(index_value(value))
+        if not matches:
+            return None
+        return self._get(matches[0][1])
+
+    def exists(self, field, value):
+        return bool(self._indexes[field].get(index_value(value)))
+
+    def sort_key(self, record):
+        order = _key(record, self.order_by)
+        # Compared as strings, so a client-supplied number or object can't break the ordering
+        return (order if order.__class__ is str else "" if order is None else str(order), _key(record, "id"))
+
+    def page(self, where=(), after=None, limit=None):
+        """Return up to ``limit`` records in ``(order_by, id)`` order after the ``after`` key.
+
+        ``where`` is a list of ``(field, value)`` pairs; a record matches if any pair does.
+        """
+        runs = [self._sorted] if not where else [self._where_keys(field, value) for field, value in where]
+        slices = []
+        for keys in runs:
+            start = bisect_right(keys, tuple(after)) if after is not None else 0
+            slices.append(keys[start:start + limit] if limit is not None else keys[start:])
+        if len(slices) == 1:
+            keys = slices[0]
+        else:
+            # Merge the sorted runs; a record matching several pairs (a transfer to oneself) appears once
+            keys = []
+            for key in heapq.merge(*slices):
+                if not keys or keys[-1] != key:
+                    keys.append(key)
+            if limit is not None:
+                keys = keys[:limit]
+        return [self._get(record_id) for _, record_id in keys]
+
+    def _where_keys(self, field, value):
+        if field == "id":
+            record = self._records.get(value)
+            return [self.sort_key(record)] if record is not None else []
+        return self._indexes[field].get(index_value(value), [])
+
+    def scan(self, where=(), start=None, end=None, batch_size=1000):
+        """Yield matching records in order whose ``order_by`` value is in ``[start, end)``"""
+        # Resume each batch from the last key seen so concurrent inserts can't shift positions under us
+        after = (start, "") if start is not None else None
+        while True:
+            batch = self.page(where, after=after, limit=batch_size)
+            for record in batch:
+                if end is not None and self.sort_key(record)[0] >= end:
+                    return
+                yield record
+            if len(batch) < batch_size:
+                return
+            after = self.sort_key(batch[-1])
+
+    def insert(self, record):
+        return self._add(record)
+
+    def _add(self, record):
+        record_id = _key(record, "id")
+        previous = self._records.get(record_id)
+        if previous is not None:
+            self._unindex(previous)
+        self._index(record)
+        self._records[record_id] = record
+        return record
+
+    def update(self, record, changes):
+        """Store a copy of ``record`` with ``changes`` applied and return it.
+
+        Records are never mutated in place, so a reader holding one always sees a
+        consistent version of it.
+        """
+        current = self._records.get(record["id"])
+        current = self._load(record["id"], current) if current is not None else record
+        self._unindex(current)
+        updated = {**current, **changes}
+        self._index(updated)
+        self._records[updated["id"]] = updated
+        return updated
+
+    def remove(self, record_id):
+        record = self._records.pop(record_id, None)
+        if record is not None:
+            self._unindex(record)
+            if record.__class__ is not dict:
+                record = record.load()
+        return record
+
+    def _index(self, record):
+        # Indexes hold sort keys, which end in the record id; records live only in _records
+        key = self.sort_key(record)
+        for field, index in self._indexes.items():
+            value = index_value(_key(record, field))
+            if value is None:
+                continue
+            keys = index.get(value)
+            if keys is None:
+                index[value] = [key]
+            elif self._sorted is None:
+                keys.append(key)  # sorted once after loading
+            else:
+                insort(keys, key)
+        if self._sorted is not None:
+            insort(self._sorted, key)
+        else:
+            self._initial_keys[key[1]] = key
+
+    def _unindex(self, record):
+        key = self.sort_key(record)
+        for field, index in self._indexes.items():
+            value = index_value(_key(record, field))
+            keys = index.get(value) if value is not None else None
+            if keys is None:
+                continue
+            if self._sorted is None:
+                keys.remove(key)  # still loading, so not sorted yet
+            else:
+                position = bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    del keys[position]
+            if not keys:
+                del index[value]
+        if self._sorted is None:
+            return
+        position = bisect_right(self._sorted, key) - 1
+        if position >= 0 and self._sorted[position] == key:
+            del self._sorted[position]
@@ -0,0 +1,52 @@
+"""Keyword intent matching for the WhatsApp bot.
+
+Intents are declared as ``(name, keywords)`` pairs in precedence order and
+compiled once into a table keyed by each keyword's first word. A message is
+split into words and every word is looked up in that table, so matching
+costs a dictionary lookup per word no matter how many intents or keywords
+exist, and keywords only match whole words ("hi" no longer fires on "this",
+nor "graduate" on "undergraduate"). Keywords may span several words
+("financial aid"). When keywords of several intents occur, the intent
+declared first wins.
+"""
+import re
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text):
+    return WORD_RE.findall(str(text or "").lower())
+
+
+class IntentMatcher:
+    def __init__(self, intents):
+        self.names = []
+        # first word -> [(remaining words, precedence)], best precedence first
+        self._table = {}
+        for rank, (name, keywords) in enumerate(intents):
+            self.names.append(name)
+            for keyword in keywords:
+                phrase = words(keyword)
+                if not phrase:
+                    raise ValueError(f"Empty keyword for intent {name!r}")
+                self._table.setdefault(phrase[0], []).append((tuple(phrase[1:]), rank))
+        for entries in self._table.values():
+            entries.sort(key=lambda entry: entry[1])
+
+    def match(self, text):
+        """Return the name of the highest-precedence intent whose keyword occurs in ``text``, or None"""
+        tokens = words(text)
+        best = len(self.names)
+        for i, token in enumerate(tokens):
+            entries = self._table.get(token)
+            if entries is None:
+                continue
+            for rest, rank in entries:
+                if rank >= best:
+                    break
+                if not rest or tuple(tokens[i + 1:i + 1 + len(rest)]) == rest:
+                    best = rank
+                    break
+            if best == 0:
+                break
+        return self.names[best] if best < len(self.names) else None
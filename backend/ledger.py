@@ -0,0 +1,226 @@
+"""Exact balance arithmetic and running per-address aggregates.
+
+Amounts are handled as integers of wei (10^-18 ETH) so that sums never pick
+up float rounding. The API keeps using decimal strings such as ``"0.25"``;
+``to_wei`` and ``from_wei`` convert at the edges.
+
+``Ledger`` keeps, for every address, the wei it has sent and received and its
+transaction count, updated incrementally as transactions are recorded. Those
+aggregates can be rebuilt from, or checked against, the transactions log.
+
+``Ledger`` holds them in process memory, so it only sees the transfers its own
+process records. ``SqliteLedger`` keeps the same aggregates in tables of a
+SQLite database shared by several server processes, updated in the
+transaction that records each transfer, so every process reports all of them.
+"""
+import threading
+from decimal import Decimal, InvalidOperation
+
+from indexes import index_value
+
+WEI_PER_ETH = 10 ** 18
+
+
+def to_wei(amount, exact=True):
+    """Parse a decimal ETH amount (string or number) into integer wei.
+
+    With ``exact=False``, digits beyond 18 decimal places are rounded instead of rejected,
+    which is how stored balances written by older float arithmetic are read.
+    """
+    try:
+        value = Decimal(str(amount).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {amount!r}")
+    wei = value * WEI_PER_ETH
+    if wei != wei.to_integral_value():
+        if exact:
+            raise ValueError(f"Amount has more than 18 decimal places: {amount!r}")
+        wei = wei.to_integral_value()
+    return int(wei)
+
+
+def from_wei(wei):
+    """Format integer wei as a decimal ETH string, e.g. 250000000000000000 -> "0.25" """
+    sign = "-" if wei < 0 else ""
+    whole, fraction = divmod(abs(wei), WEI_PER_ETH)
+    fraction = str(fraction).rjust(18, "0").rstrip("0") or "0"
+    return f"{sign}{whole}.{fraction}"
+
+
+def transaction_amount(transaction):
+    # Stored amounts were only checked with float(), so tolerate anything that can't be read exactly
+    try:
+        return to_wei(transaction.get("amount") or 0, exact=False)
+    except ValueError:
+        return 0
+
+
+class Ledger:
+    def __init__(self, transactions=()):
+        self._lock = threading.Lock()
+        self.rebuild(transactions)
+
+    def rebuild(self, transactions):
+        """Recompute every aggregate from scratch"""
+        accounts, count, volume = self._aggregate(transactions)
+        with self._lock:
+            self._accounts = accounts
+            self._count = count
+            self._volume = volume
+
+    @staticmethod
+    def _aggregate(transactions):
+        accounts = {}
+        count = volume = 0
+        for transaction in transactions:
+            amount = transaction_amount(transaction)
+            Ledger._apply(accounts, transaction, amount)
+            count += 1
+            volume += amount
+        return accounts, count, volume
+
+    @staticmethod
+    def _apply(accounts, transaction, amount):
+        for address, side in ((transaction.get("from_address"), "sent"),
+                              (transaction.get("to_address"), "received")):
+            if index_value(address) is None:
+                continue
+            account = accounts.get(address)
+            if account is None:
+                account = accounts[address] = {"sent": 0, "received": 0, "transactions": 0}
+            account[side] += amount
+            # A transfer to oneself still counts as one transaction for that address
+            if side == "sent" or address != transaction.get("from_address"):
+                account["transactions"] += 1
+
+    def apply(self, transaction):
+        """Fold one newly recorded transaction into the aggregates"""
+        amount = transaction_amount(transaction)
+        with self._lock:
+            self._apply(self._accounts, transaction, amount)
+            self._count += 1
+            self._volume += amount
+
+    def account(self, address):
+        with self._lock:
+            account = self._accounts.get(address)
+            return self._format(address, account) if account else None
+
+    @staticmethod
+    def _format(address, account):
+        return {
+            "address": address,
+            "sent": from_wei(account["sent"]),
+            "received": from_wei(account["received"]),
+            "net": from_wei(account["received"] - account["sent"]),
+            "transactions": account["transactions"]
+        }
+
+    def summary(self):
+        with self._lock:
+            return {
+                "transaction_count": self._count,
+                "total_volume": from_wei(self._volume),
+                "address_count": len(self._accounts),
+                "accounts": [self._format(a, acc) for a, acc in self._accounts.items()]
+            }
+
+    def verify(self, transactions):
+        """Compare the running aggregates with a fresh pass over ``transactions``.
+
+        Returns a list of mismatches; an empty list means the ledger is consistent.
+        """
+        expected = self._aggregate(transactions)
+        with self._lock:
+            return self._compare(expected, (self._accounts, self._count, self._volume))
+
+    def _compare(self, expected, actual):
+        (accounts, count, volume), (actual_accounts, actual_count, actual_volume) = expected, actual
+        mismatches = []
+        if count != actual_count:
+            mismatches.append({"field": "transaction_count", "expected": count, "actual": actual_count})
+        if volume != actual_volume:
+            mismatches.append({"field": "total_volume", "expected": from_wei(volume),
+                               "actual": from_wei(actual_volume)})
+        for address in accounts.keys() | actual_accounts.keys():
+            expected_account, actual_account = accounts.get(address), actual_accounts.get(address)
+            if expected_account != actual_account:
+                mismatches.append({
+                    "address": address,
+                    "expected": self._format(address, expected_account) if expected_account else None,
+                    "actual": self._format(address, actual_account) if actual_account else None
+                })
+        return mismatches
+
+
+class SqliteLedger(Ledger):
+    """Aggregates stored in the repository's SQLite database; wei totals are TEXT since they outgrow 64 bits"""
+
+    def __init__(self, repository, transactions):
+        self.repository = repository
+        conn = repository.connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS ledger_accounts (address TEXT PRIMARY KEY, "
+                     "sent TEXT NOT NULL, received TEXT NOT NULL, transactions INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS ledger_totals (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                     "count INTEGER NOT NULL, volume TEXT NOT NULL)")
+        # The first process to start on a database builds the totals; the rest find them there
+        with repository.transaction():
+            if conn.execute("SELECT 1 FROM ledger_totals").fetchone() is None:
+                self.rebuild(transactions.scan())
+
+    def _state(self):
+        conn = self.repository.connection()
+        accounts = {address: {"sent": int(sent), "received": int(received), "transactions": count}
+                    for address, sent, received, count in conn.execute("SELECT * FROM ledger_accounts")}
+        row = conn.execute("SELECT count, volume FROM ledger_totals").fetchone()
+        return accounts, (row[0] if row else 0), (int(row[1]) if row else 0)
+
+    def rebuild(self, transactions):
+        accounts, count, volume = self._aggregate(transactions)
+        with self.repository.transaction():
+            conn = self.repository.connection()
+            conn.execute("DELETE FROM ledger_accounts")
+            conn.executemany("INSERT INTO ledger_accounts VALUES (?, ?, ?, ?)", [
+                (address, str(a["sent"]), str(a["received"]), a["transactions"]) for address, a in accounts.items()])
+            conn.execute("INSERT OR REPLACE INTO ledger_totals VALUES (1, ?, ?)", (count, str(volume)))
+
+    def apply(self, transaction):
+        amount = transaction_amount(transaction)
+        changes = {}
+        self._apply(changes, transaction, amount)
+        with self.repository.transaction():
+            conn = self.repository.connection()
+            for address, change in changes.items():
+                row = conn.execute("SELECT sent, received, transactions FROM ledger_accounts WHERE address = ?",
+                                   (address,)).fetchone()
+                sent, received, count = (int(row[0]), int(row[1]), row[2]) if row else (0, 0, 0)
+                conn.execute("INSERT OR REPLACE INTO ledger_accounts VALUES (?, ?, ?, ?)", (
+                    address, str(sent + change["sent"]), str(received + change["received"]),
+                    count + change["transactions"]))
+            count, volume = conn.execute("SELECT count, volume FROM ledger_totals").fetchone()
+            conn.execute("UPDATE ledger_totals SET count = ?, volume = ?", (count + 1, str(int(volume) + amount)))
+
+    def account(self, address):
+        row = self.repository.connection().execute(
+            "SELECT sent, received, transactions FROM ledger_accounts WHERE address = ?", (address,)).fetchone()
+        if row is None:
+            return None
+        return self._format(address, {"sent": int(row[0]), "received": int(row[1]), "transactions": row[2]})
+
+    def summary(self):
+        with self.repository.transaction():
+            accounts, count, volume = self._state()
+        return {
+            "transaction_count": count,
+            "total_volume": from_wei(volume),
+            "address_count": len(accounts),
+            "accounts": [self._format(a, acc) for a, acc in accounts.items()]
+        }
+
+    def verify(self, transactions):
+        expected = self._aggregate(transactions)
+        with self.repository.transaction():
+            actual = self._state()
+        return self._compare(expected, actual)
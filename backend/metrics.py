@@ -0,0 +1,142 @@
+"""Request and storage metrics in Prometheus text format.
+
+``registry`` holds counters and fixed-bucket histograms keyed by metric name
+and labels. Recording is a dict update under one lock, cheap enough to run on
+every request; ``render`` produces the text served at ``/metrics``.
+
+``instrument_app`` adds Flask hooks that count every request by route,
+method and status, and record latency and request/response size histograms.
+With ``sample_rate`` below 1 only that fraction of requests is timed and
+measured (the request counter stays exact), bounding the overhead under
+heavy traffic.
+"""
+import bisect
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def counter(self, name, help_text):
+        self._meta[name] = ("counter", help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help_text, tuple(buckets))
+
+    def inc(self, name, value=1, **labels):
+        self.inc_series((name, tuple(sorted(labels.items()))), value)
+
+    def inc_series(self, key, value=1):
+        """``inc`` with a prebuilt ``(name, sorted label pairs)`` key, for hot paths"""
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        self.observe_series((name, tuple(sorted(labels.items()))), value)
+
+    def observe_series(self, key, value):
+        buckets = self._meta[key[0]][2]
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), then sum and count
+                series = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(s[0]), s[1], s[2]) for key, s in self._histograms.items()}
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._meta.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (series_name, labels), value in sorted(counters.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            for (series_name, labels), (counts, total, count) in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    return value if isinstance(value, str) else repr(float(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+registry.counter("http_requests_total", "HTTP requests by route, method and status")
+registry.histogram("http_request_duration_seconds", "Time to handle a request (sampled)")
+registry.histogram("http_request_size_bytes", "Request body size (sampled)", SIZE_BUCKETS)
+registry.histogram("http_response_size_bytes", "Response body size, unstreamed responses only (sampled)",
+                   SIZE_BUCKETS)
+registry.histogram("storage_load_seconds", "Time to load a collection from its snapshot and log")
+registry.histogram("storage_write_seconds", "Time to write one group commit (JSON) or commit a transaction (SQLite)")
+registry.histogram("storage_compact_seconds", "Time to fold a change log into its snapshot")
+registry.histogram("gemini_request_seconds", "Time spent in Gemini generate_content calls")
+
+
+def instrument_app(app, sample_rate=1.0):
+    """Count and (for a ``sample_rate`` fraction of requests) time every request to ``app``"""
+    # The hooks touch the request proxy once and build series keys directly; they run on every request
+    @app.before_request
+    def start_request_timer():
+        if sample_rate >= 1 or random.random() < sample_rate:
+            request.environ["metrics.started"] = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        req = request._get_current_object()
+        route = req.url_rule.rule if req.url_rule is not None else "unmatched"
+        registry.inc_series(("http_requests_total",
+                             (("method", req.method), ("route", route), ("status", response.status_code))))
+        started = req.environ.pop("metrics.started", None)
+        if started is not None:
+            labels = (("route", route),)
+            registry.observe_series(("http_request_duration_seconds", labels), time.perf_counter() - started)
+            registry.observe_series(("http_request_size_bytes", labels), req.content_length or 0)
+            if not response.is_streamed:
+                registry.observe_series(("http_response_size_bytes", labels), response.content_length or 0)
+        return response
+
+
+def metrics_response():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
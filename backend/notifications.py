@@ -0,0 +1,160 @@
+"""Background delivery of notification messages.
+
+Handlers hand the worker a builder function instead of writing the message
+themselves. The worker builds and stores messages on its own thread, in
+batches, so the request returns without waiting on the messages collection.
+
+- The queue is bounded; when it is full the notification is delivered inline
+  on the request thread rather than dropped.
+- Failed writes are retried with exponential backoff. Message ids are fixed
+  when the message is built, so a retry never creates a duplicate.
+- ``stop`` drains the queue before returning and is registered to run at exit.
+- ``stats`` reports queue depth and delivery lag for monitoring.
+- ``on_delivered``, if given, is called with each batch of messages inside
+  the transaction that stores it, once per batch even if the write is
+  retried, so counters it keeps change in the same order as the stored
+  messages (e.g. unread counts, pushes to open streams).
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class NotificationWorker:
+    def __init__(self, messages, transaction, maxsize=10000, batch_size=100,
+                 batch_wait=0.05, max_retries=3, retry_delay=0.1, on_delivered=None):
+        self.messages = messages
+        self.transaction = transaction
+        self.on_delivered = on_delivered
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._counts = {"enqueued": 0, "delivered": 0, "failed": 0, "retries": 0, "overflow": 0}
+        self._last_lag = 0.0
+
+    def submit(self, build):
+        """Queue ``build`` (a callable returning a message dict or None) for delivery"""
+        self._ensure_started()
+        item = (time.monotonic(), build)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Backpressure: deliver on the request thread instead of losing the notification
+            self._count("overflow")
+            self._deliver([item])
+            return
+        self._count("enqueued")
+
+    def _ensure_started(self):
+        # Started lazily so that forked server workers each get their own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        built = []
+        for enqueued_at, build in batch:
+            try:
+                message = build()
+            except Exception:
+                logger.exception("Failed to build notification")
+                self._count("failed")
+                continue
+            if message:
+                built.append(message)
+
+        notified = False
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.transaction():
+                    for message in built:
+                        self.messages.insert(message)
+                    if self.on_delivered is not None and built and not notified:
+                        notified = True
+                        try:
+                            self.on_delivered(built)
+                        except Exception:
+                            logger.exception("on_delivered callback failed")
+                self._count("delivered", len(built))
+                break
+            except Exception:
+                if attempt == self.max_retries:
+                    logger.exception("Dropping %d notifications after %d attempts", len(built), attempt + 1)
+                    self._count("failed", len(built))
+                    break
+                self._count("retries")
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+        with self._stats_lock:
+            self._last_lag = time.monotonic() - min(enqueued_at for enqueued_at, _ in batch)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._counts[name] += amount
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been delivered (or ``timeout`` passes)"""
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stop(self, timeout=10):
+        """Deliver everything still queued, then stop the worker thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "lag_seconds": round(self._last_lag, 6),
+                **self._counts
+            }
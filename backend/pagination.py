@@ -0,0 +1,84 @@
+"""Cursor pagination and field projection for the list endpoints.
+
+List endpoints accept:
+
+- ``limit``: page size (1 to ``MAX_LIMIT``). Without ``limit`` or ``cursor`` the
+  whole list is returned, as before.
+- ``cursor``: opaque token from the previous page's ``X-Next-Cursor`` header.
+- ``fields``: comma-separated top-level fields to include in each record.
+
+The body stays a JSON array so existing clients keep working; the cursor for
+the next page is sent in ``X-Next-Cursor`` and a ``Link: <...>; rel="next"``
+header.
+"""
+import base64
+import json
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PageError(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        key = json.loads(raw)
+    except ValueError:
+        raise PageError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != 2 or not all(isinstance(k, str) for k in key):
+        raise PageError("Invalid cursor")
+    return tuple(key)
+
+
+def parse_page_args(args):
+    """Return ``(after, limit, fields)`` from the query string"""
+    cursor = args.get("cursor")
+    limit = args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PageError("limit must be an integer")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise PageError(f"limit must be between 1 and {MAX_LIMIT}")
+    elif cursor:
+        limit = DEFAULT_LIMIT
+    after = decode_cursor(cursor) if cursor else None
+    fields = [f for f in args.get("fields", "").split(",") if f] or None
+    return after, limit, fields
+
+
+def project(record, fields):
+    if not fields:
+        return record
+    return {k: record[k] for k in fields if k in record}
+
+
+def paginated(collection, where=()):
+    """Build the JSON response for one page of ``collection`` matching ``where``"""
+    try:
+        after, limit, fields = parse_page_args(request.args)
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
+    records = collection.page(where, after=after, limit=limit)
+    response = jsonify([project(r, fields) for r in records])
+    if limit is not None and len(records) == limit:
+        next_cursor = encode_cursor(collection.sort_key(records[-1]))
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        args["limit"] = str(limit)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
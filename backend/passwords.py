@@ -0,0 +1,195 @@
+"""Password hashing with a tunable key-derivation function.
+
+New hashes use scrypt (default) or PBKDF2-SHA256 and record their parameters:
+
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+Older records hold ``<salt>:<sha256(password + salt)>``. They still verify, and
+``needs_rehash`` reports them (and hashes made with outdated parameters) so
+that login can upgrade them.
+
+The KDF runs in a small bounded worker pool (``PASSWORD_WORKERS``; 0 runs it
+inline). hashlib's scrypt and PBKDF2 release the GIL, so the workers hash in
+parallel with request handling, and the pool size caps how many CPU- and
+memory-heavy derivations run at once. Successful verifications are
+remembered for ``PASSWORD_CACHE_TTL`` seconds under an HMAC of the stored
+hash and the password, never the password itself, so repeated logins skip
+the KDF.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+config = {
+    "scheme": os.getenv("PASSWORD_SCHEME", "scrypt"),
+    "scrypt_n": int(os.getenv("SCRYPT_N", str(2 ** 14))),
+    "scrypt_r": int(os.getenv("SCRYPT_R", "8")),
+    "scrypt_p": int(os.getenv("SCRYPT_P", "1")),
+    "pbkdf2_iterations": int(os.getenv("PBKDF2_ITERATIONS", "600000")),
+    "workers": int(os.getenv("PASSWORD_WORKERS", "2")),
+    "cache_ttl": float(os.getenv("PASSWORD_CACHE_TTL", "300")),
+    "cache_size": int(os.getenv("PASSWORD_CACHE_SIZE", "10000")),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_secret = secrets.token_bytes(32)
+_decoys = {}
+
+
+def configure(**options):
+    """Change hashing parameters at runtime (used by the login benchmark)"""
+    unknown = set(options) - set(config)
+    if unknown:
+        raise KeyError(f"Unknown password options: {', '.join(sorted(unknown))}")
+    config.update(options)
+    if "workers" in options:
+        shutdown()
+    clear_cache()
+
+
+def _derive(scheme, params, password, salt):
+    if scheme == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=32).hex()
+    if scheme == "pbkdf2_sha256":
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations).hex()
+    raise ValueError(f"Unknown password scheme: {scheme}")
+
+
+def _run(scheme, params, password, salt):
+    if config["workers"] <= 0:
+        return _derive(scheme, params, password, salt)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=config["workers"], thread_name_prefix="password")
+        pool = _pool
+    return pool.submit(_derive, scheme, params, password, salt).result()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _current_params():
+    if config["scheme"] == "scrypt":
+        return "scrypt", (config["scrypt_n"], config["scrypt_r"], config["scrypt_p"])
+    if config["scheme"] in ("pbkdf2", "pbkdf2_sha256"):
+        return "pbkdf2_sha256", (config["pbkdf2_iterations"],)
+    raise ValueError(f"Unknown PASSWORD_SCHEME: {config['scheme']}")
+
+
+def _parse(stored):
+    """Split a stored hash into (scheme, params, salt bytes, digest hex), or None if unreadable"""
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            return "scrypt", tuple(int(x) for x in parts[1:4]), bytes.fromhex(parts[4]), parts[5]
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            return "pbkdf2_sha256", (int(parts[1]),), bytes.fromhex(parts[2]), parts[3]
+    except ValueError:
+        return None
+    return None
+
+
+def hash_password(password, salt=None):
+    """Hash with the configured scheme; pass ``salt`` only for reproducible fixtures such as benchmark data"""
+    scheme, params = _current_params()
+    salt = salt if salt is not None else secrets.token_bytes(16)
+    digest = _run(scheme, params, password, salt)
+    return "$".join([scheme, *map(str, params), salt.hex(), digest])
+
+
+def verify_password(stored_password, provided_password):
+    if not stored_password or provided_password is None:
+        return False
+
+    # Legacy single-round SHA-256 records
+    if "$" not in stored_password:
+        if ":" not in stored_password:
+            return False
+        salt, hashed = stored_password.split(":", 1)
+        calculated_hash = hashlib.sha256((provided_password + salt).encode()).hexdigest()
+        return hmac.compare_digest(calculated_hash, hashed)
+
+    parsed = _parse(stored_password)
+    if parsed is None:
+        return False
+    key = _cache_key(stored_password, provided_password)
+    if _cache_hit(key):
+        return True
+    scheme, params, salt, digest = parsed
+    if not hmac.compare_digest(_run(scheme, params, provided_password, salt), digest):
+        return False
+    _cache_store(key)
+    return True
+
+
+def verify_missing(provided_password):
+    """Spend a real verification's KDF work for an unknown account, so login timing doesn't reveal which exist"""
+    scheme, params = _current_params()
+    stored = _decoys.get((scheme, params))
+    if stored is None:
+        stored = _decoys[(scheme, params)] = hash_password(secrets.token_hex(16))
+    verify_password(stored, provided_password or "")
+    return False
+
+
+def needs_rehash(stored_password):
+    """True for legacy hashes and for hashes made with other than the configured parameters"""
+    parsed = _parse(stored_password or "")
+    if parsed is None:
+        return True
+    scheme, params = _current_params()
+    return parsed[:2] != (scheme, params)
+
+
+# ----- Verified-credential cache -----
+
+def _cache_key(stored_password, provided_password):
+    message = stored_password.encode() + b"\0" + provided_password.encode()
+    return hmac.new(_cache_secret, message, hashlib.sha256).digest()
+
+
+def _cache_hit(key):
+    if config["cache_ttl"] <= 0:
+        return False
+    with _cache_lock:
+        expires = _cache.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _cache[key]
+            return False
+        _cache.move_to_end(key)
+        return True
+
+
+def _cache_store(key):
+    if config["cache_ttl"] <= 0:
+        return
+    with _cache_lock:
+        _cache[key] = time.monotonic() + config["cache_ttl"]
+        _cache.move_to_end(key)
+        while len(_cache) > config["cache_size"]:
+            _cache.popitem(last=False)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
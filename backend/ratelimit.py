@@ -0,0 +1,243 @@
+"""Rate limiting and load shedding for the Flask apps.
+
+``RateLimiter.limit`` decorates a view with one or more token-bucket rules.
+Each ``Rule`` names a scope (``"ip"``, ``"account"``, ``"sender"``...), a
+function returning the caller's key in that scope, and a budget of
+``count`` requests per ``period`` seconds (the bucket holds ``count`` tokens
+and refills continuously). A request that finds any bucket empty gets 429
+with ``Retry-After`` set to when a token will be available.
+
+Buckets live in memory (``MemoryBuckets``) or, to hold limits across
+several server processes, in a shared SQLite table (``SqliteBuckets``).
+
+``ConcurrencyLimiter`` caps the requests being handled at once. Requests
+beyond the cap wait briefly in a bounded queue; when the queue is full or
+the wait times out they get 503 with ``Retry-After`` instead of piling up
+behind busy workers.
+"""
+import functools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import jsonify
+
+from sqlitedb import ThreadConnections
+
+Rule = namedtuple("Rule", "scope key count period")
+
+
+def parse_budget(value):
+    """Parse ``"<count>/<seconds>"``, e.g. ``"5/60"`` for five requests a minute; ``"0"`` disables the rule"""
+    if value in ("0", "", None):
+        return None
+    try:
+        count, period = value.split("/")
+        count, period = int(count), float(period)
+    except ValueError:
+        raise ValueError(f"Invalid rate limit {value!r}, expected <count>/<seconds>")
+    if count <= 0 or period <= 0:
+        return None
+    return count, period
+
+
+def _refill(tokens, updated, now, count, period):
+    return min(float(count), tokens + (now - updated) * count / period)
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # Least recently updated first
+        self._buckets = OrderedDict()
+
+    def take(self, key, count, period):
+        """Take one token; returns ``(allowed, seconds until a token is available)``"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (float(count), now, period))
+            tokens = _refill(tokens, updated, now, count, period)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, period)
+            self._buckets.move_to_end(key)
+            self._evict(now)
+            return allowed, 0.0 if allowed else (1 - tokens) * period / count
+
+    def _evict(self, now):
+        # Only the oldest buckets are looked at, so each take costs O(1) amortized. One idle for a full period is
+        # full again and forgetting it changes nothing; past max_keys the least recently used go regardless
+        while self._buckets:
+            _, updated, period = next(iter(self._buckets.values()))
+            if now - updated < period and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+
+class SqliteBuckets:
+    def __init__(self, path, prune_every=1000):
+        self.path = path
+        self.prune_every = prune_every
+        self._connections = ThreadConnections(path)
+        self._takes = 0
+        self._longest_period = 0.0
+        self._count_lock = threading.Lock()
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def connection(self):
+        return self._connections.get()
+
+    def take(self, key, count, period):
+        # Wall-clock time, since the buckets are shared between processes
+        now = time.time()
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*(row or (float(count), now)), now, count, period)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._count_lock:
+            self._takes += 1
+            self._longest_period = max(self._longest_period, period)
+            prune = self._takes % self.prune_every == 0
+        if prune:
+            self.prune(self._longest_period)
+        return allowed, 0.0 if allowed else (1 - tokens) * period / count
+
+    def prune(self, older_than=3600):
+        """Delete buckets idle for ``older_than`` seconds; one idle for its whole period is full again anyway"""
+        self.connection().execute("DELETE FROM rate_buckets WHERE updated < ?", (time.time() - older_than,))
+
+
+def open_bucket_store():
+    if os.getenv("RATE_LIMIT_STORE", "memory").lower() == "sqlite":
+        data_dir = os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "data"))
+        os.makedirs(data_dir, exist_ok=True)
+        return SqliteBuckets(os.getenv("RATE_LIMIT_SQLITE_PATH", os.path.join(data_dir, "ratelimit.db")))
+    return MemoryBuckets()
+
+
+def too_many_requests(retry_after, message="Too many requests"):
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+class RateLimiter:
+    def __init__(self, store, enabled=True):
+        self.store = store
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counts = {"allowed": 0, "limited": 0}
+
+    def check(self, name, rules):
+        """Apply ``rules`` for the current request; returns a 429 response, or None if it may proceed"""
+        if not self.enabled:
+            return None
+        for rule in rules:
+            if rule is None:
+                continue
+            key = rule.key()
+            if not key:
+                continue
+            allowed, wait = self.store.take(f"{name}:{rule.scope}:{key}", rule.count, rule.period)
+            if not allowed:
+                with self._lock:
+                    self._counts["limited"] += 1
+                return too_many_requests(max(1, math.ceil(wait)))
+        with self._lock:
+            self._counts["allowed"] += 1
+        return None
+
+    def limit(self, *rules):
+        """Decorate a view with rate-limit ``rules``; ``None`` entries (disabled budgets) are skipped"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                limited = self.check(view.__name__, rules)
+                if limited is not None:
+                    return limited
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def rule(scope, key, budget):
+    """Build a Rule from a ``parse_budget`` result, or None when the budget is disabled"""
+    if budget is None:
+        return None
+    return Rule(scope, key, *budget)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_active=64, max_waiting=128, wait_timeout=2.0):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._shed = 0
+
+    def acquire(self):
+        """Take a slot, waiting up to ``wait_timeout``; returns False when the request should be shed"""
+        with self._cond:
+            if self._active < self.max_active:
+                self._active += 1
+                return True
+            if self._waiting >= self.max_waiting:
+                self._shed += 1
+                return False
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.wait_timeout
+                while self._active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._shed += 1
+                        return False
+                    self._cond.wait(remaining)
+                self._active += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "max_active": self.max_active,
+                "waiting": self._waiting,
+                "max_waiting": self.max_waiting,
+                "shed": self._shed
+            }
+
+
+def service_unavailable(retry_after=1):
+    response = jsonify({"error": "Server is busy, please retry shortly", "retry_after": retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(retry_after)
+    return response
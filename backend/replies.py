@@ -0,0 +1,147 @@
+"""Asynchronous reply delivery for the WhatsApp webhook.
+
+In async mode the webhook acknowledges Twilio straight away and queues the
+message here. A fixed pool of worker threads builds each reply and sends it
+through an outbound client, so a slow Gemini call no longer holds a web
+worker for its whole duration.
+
+- Messages from one sender are answered strictly in arrival order: a sender
+  is served by at most one worker at a time, and senders take turns so a
+  chatty one can't starve the rest.
+- Backpressure: ``submit`` refuses new messages once ``max_pending`` are
+  queued overall or ``max_per_sender`` for one sender, and the webhook tells
+  the user to try again instead of queueing without bound.
+- ``stop`` drains the queue before returning and is registered to run at exit.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TwilioSender:
+    """Outbound client sending messages through the Twilio REST API"""
+
+    def __init__(self, account_sid, auth_token):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+
+    def send(self, from_number, to_number, body):
+        self.client.messages.create(from_=from_number, to=to_number, body=body)
+
+
+class ReplyDispatcher:
+    def __init__(self, respond, sender, workers=4, max_pending=1000, max_per_sender=20):
+        self.respond = respond
+        self.sender = sender
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_sender = max_per_sender
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._ready = deque()
+        self._pending = 0
+        self._busy = 0
+        self._threads = []
+        self._stopping = False
+        self._counts = {"accepted": 0, "rejected": 0, "sent": 0, "failed": 0}
+        self._last_latency = 0.0
+
+    def submit(self, user_number, bot_number, body):
+        """Queue a message from ``user_number`` to ``bot_number`` for a reply; returns False if the queue is full"""
+        with self._cond:
+            queue = self._queues.get(user_number)
+            if (self._stopping or self._pending >= self.max_pending
+                    or (queue is not None and len(queue) >= self.max_per_sender)):
+                self._counts["rejected"] += 1
+                return False
+            if queue is None:
+                # An idle sender becomes ready; a busy one is re-queued by its worker when done
+                queue = self._queues[user_number] = deque()
+                self._ready.append(user_number)
+            queue.append((bot_number, body, time.monotonic()))
+            self._pending += 1
+            self._counts["accepted"] += 1
+            self._cond.notify_all()
+            self._start()
+        return True
+
+    def _start(self):
+        # Called with the lock held; also restarts workers in a forked server process
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"replies-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready and not (self._stopping and self._pending == 0):
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                user_number = self._ready.popleft()
+                bot_number, body, queued_at = self._queues[user_number][0]
+                self._busy += 1
+
+            self._deliver(user_number, bot_number, body, queued_at)
+
+            with self._cond:
+                queue = self._queues[user_number]
+                queue.popleft()
+                self._pending -= 1
+                self._busy -= 1
+                if queue:
+                    self._ready.append(user_number)
+                    self._cond.notify_all()
+                else:
+                    del self._queues[user_number]
+                    if self._pending == 0:
+                        self._cond.notify_all()
+
+    def _deliver(self, user_number, bot_number, body, queued_at):
+        try:
+            reply = self.respond(body, user_number)
+            self.sender.send(bot_number, user_number, reply)
+        except Exception:
+            logger.exception("Failed to reply to %s", user_number)
+            outcome = "failed"
+        else:
+            outcome = "sent"
+        with self._cond:
+            self._counts[outcome] += 1
+            self._last_latency = time.monotonic() - queued_at
+
+    def flush(self, timeout=None):
+        """Wait until every queued message has been answered"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "senders_waiting": len(self._queues),
+                "workers": self.workers,
+                "workers_busy": self._busy,
+                "last_latency_seconds": round(self._last_latency, 3),
+                **self._counts
+            }
@@ -0,0 +1,457 @@
+"""Storage backends behind a common collection interface.
+
+``open_repository()`` picks a backend from the environment:
+
+- ``STORAGE_BACKEND=json`` (default): records live in memory in
+  ``IndexedCollection``s and are persisted through the ``LogStore`` change log.
+- ``STORAGE_BACKEND=sqlite``: records live in a SQLite database
+  (``SQLITE_PATH``) in WAL mode, one connection per thread, so several
+  worker processes can share one dataset.
+
+Both hand out collections with the same methods (``get``, ``find``,
+``find_one``, ``exists``, ``page``, ``scan``, ``insert``, ``update``, ``all``) and a
+``transaction()`` context manager for multi-record updates.
+
+Run ``python repository.py import-json`` to copy the JSON data files into the
+SQLite database, and ``python repository.py convert-snapshots`` to rewrite the
+JSON snapshots as binary ``.snap`` files (``--format json`` converts back).
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from concurrency import ReadWriteLock
+from indexes import IndexedCollection, field_value, index_value
+from metrics import registry
+from sqlitedb import ThreadConnections
+from storage import LogStore, entry
+
+# Fields each collection is indexed on, beyond its primary key ``id``
+SCHEMA = {
+    "scholarships": (),
+    "users": ("address", "email", "type"),
+    "messages": ("recipient.id",),
+    "applications": ("scholarship_id", "applicant_id"),
+    "transactions": ("from_address", "to_address"),
+    "smart_contracts": (),
+    "payouts": ("contract_id", "applicant_id"),
+}
+
+# Field each collection is paged by (ties broken by id)
+ORDER_BY = {
+    "scholarships": "created_at",
+    "users": "created_at",
+    "messages": "timestamp",
+    "applications": "submitted_at",
+    "transactions": "timestamp",
+    "smart_contracts": "created_at",
+    "payouts": "settled_at",
+}
+
+# Further fields the SQLite backend keeps in columns, for the queries stores run in SQL (the inbox's unread counts)
+SQLITE_COLUMNS = {
+    "messages": ("read",),
+}
+
+# Further fields binary snapshots keep readable without decoding, for the aggregates built at startup
+SNAPSHOT_KEYS = {
+    "messages": ("read",),
+    "transactions": ("amount",),
+}
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def key_fields(name):
+    """Fields a collection is looked up and paged by, kept as key columns in binary snapshots"""
+    return ("id", ORDER_BY[name]) + SCHEMA[name] + SNAPSHOT_KEYS.get(name, ())
+
+
+# ----- JSON files + change log -----
+
+class JsonCollection(IndexedCollection):
+    def __init__(self, name, repository, records, indexes=(), order_by="id"):
+        super().__init__(records, indexes, order_by)
+        self.name = name
+        self.filename = f"{name}.json"
+        self.repository = repository
+
+    def __len__(self):
+        with self.repository.lock.read():
+            return super().__len__()
+
+    def all(self):
+        with self.repository.lock.read():
+            return super().all()
+
+    def scan_fields(self, fields):
+        with self.repository.lock.read():
+            return super().scan_fields(fields)
+
+    def get(self, record_id):
+        with self.repository.lock.read():
+            return super().get(record_id)
+
+    def find(self, field, value):
+        with self.repository.lock.read():
+            return super().find(field, value)
+
+    def find_one(self, field, value):
+        with self.repository.lock.read():
+            return super().find_one(field, value)
+
+    def exists(self, field, value):
+        with self.repository.lock.read():
+            return super().exists(field, value)
+
+    def page(self, where=(), after=None, limit=None):
+        with self.repository.lock.read():
+            return super().page(where, after, limit)
+
+    def insert(self, record):
+        with self.repository.transaction():
+            super().insert(record)
+            self.repository.log("put", self.filename, record)
+        return record
+
+    def update(self, record, changes):
+        with self.repository.transaction():
+            updated = super().update(record, changes)
+            self.repository.log("put", self.filename, updated)
+        return updated
+
+
+class JsonRepository:
+    # Data is held by one process; other processes can't write to it
+    shared = False
+
+    def __init__(self, data_dir, compact_after=1000, fsync=True, commit_window=0.0, snapshot_format="json"):
+        self.store = LogStore(data_dir, compact_after=compact_after, fsync=fsync,
+                              commit_window=commit_window, snapshot_format=snapshot_format)
+        self.lock = ReadWriteLock()
+        self._local = threading.local()
+
+    def collection(self, name, default=None):
+        # Records in a binary snapshot stay undecoded until read; only their key fields are loaded
+        records = self.store.load(f"{name}.json", default, key_fields=key_fields(name), lazy=True)
+        return JsonCollection(name, self, records, SCHEMA[name], ORDER_BY[name])
+
+    def log(self, op, filename, record):
+        self._local.pending.append(entry(op, filename, record))
+
+    @contextmanager
+    def transaction(self):
+        """Apply a block of changes under the write lock and commit its log entries as one group.
+
+        Reads take the shared side of the lock, so they run in parallel with each other but
+        never observe a transaction half-applied.
+
+        The group is queued before the lock is released, so the log keeps the order in which
+        changes were made, but the wait for the disk write happens outside the lock so that
+        concurrent transactions share one flush.
+        """
+        if getattr(self._local, "pending", None) is not None:
+            yield
+            return
+        self._local.pending = []
+        try:
+            with self.lock.write():
+                try:
+                    yield
+                finally:
+                    # Memory has no rollback, so log whatever was applied to keep the files in step
+                    ticket = self.store.enqueue(self._local.pending)
+        finally:
+            self._local.pending = None
+        ticket.wait()
+
+    def close(self):
+        self.store.close()
+
+
+# ----- SQLite -----
+
+def column_name(field):
+    return "id" if field == "id" else field.replace(".", "_")
+
+
+def table_fields(name):
+    """Fields stored in their own columns: the lookup indexes, the paging order and any SQL-only columns"""
+    fields = list(SCHEMA[name])
+    for field in (ORDER_BY[name], *SQLITE_COLUMNS.get(name, ())):
+        if field not in ("id", *fields):
+            fields.append(field)
+    return tuple(fields)
+
+
+class SqliteCollection:
+    def __init__(self, repository, name, fields=(), order_by="id"):
+        self.repository = repository
+        self.name = name
+        self.fields = fields
+        self.order_by = order_by
+
+    @property
+    def _conn(self):
+        return self.repository.connection()
+
+    def _rows(self, sql, params=()):
+        for (data,) in self._conn.execute(sql, params):
+            yield json.loads(data)
+
+    def __iter__(self):
+        return self._rows(f"SELECT data FROM {self.name} ORDER BY rowid")
+
+    def __len__(self):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+
+    def all(self):
+        return list(self)
+
+    def get(self, record_id):
+        return next(self._rows(f"SELECT data FROM {self.name} WHERE id = ?", (record_id,)), None)
+
+    def find(self, field, value):
+        column = column_name(field)
+        return list(self._rows(
+            f"SELECT data FROM {self.name} WHERE {column} = ? ORDER BY rowid", (index_value(value),)))
+
+    def find_one(self, field, value):
+        column = column_name(field)
+        return next(self._rows(
+            f"SELECT data FROM {self.name} WHERE {column} = ? ORDER BY rowid LIMIT 1", (index_value(value),)), None)
+
+    def exists(self, field, value):
+        return self.find_one(field, value) is not None
+
+    def sort_key(self, record):
+        return (field_value(record, self.order_by) or "", record["id"])
+
+    def page(self, where=(), after=None, limit=None):
+        """Return up to ``limit`` records in ``(order_by, id)`` order after the ``after`` key.
+
+        ``where`` is a list of ``(field, value)`` pairs; a record matches if any pair does.
+        """
+        order = column_name(self.order_by)
+        order_expr = f"COALESCE({order}, '')" if order != "id" else "id"
+        clauses, params = [], []
+        if where:
+            clauses.append("(" + " OR ".join(f"{column_name(f)} = ?" for f, _ in where) + ")")
+            params.extend(value for _, value in where)
+        if after is not None:
+            clauses.append(f"({order_expr}, id) > (?, ?)")
+            params.extend(after)
+        sql = f"SELECT data FROM {self.name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order_expr}, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return list(self._rows(sql, params))
+
+    def scan_fields(self, fields):
+        return self.scan()
+
+    def scan(self, where=(), start=None, end=None, batch_size=1000):
+        """Yield matching records in order whose ``order_by`` value is in ``[start, end)``"""
+        # Keyset batches keep memory flat and avoid holding a read transaction open for the whole scan
+        after = (start, "") if start is not None else None
+        while True:
+            batch = self.page(where, after=after, limit=batch_size)
+            for record in batch:
+                if end is not None and self.sort_key(record)[0] >= end:
+                    return
+                yield record
+            if len(batch) < batch_size:
+                return
+            after = self.sort_key(batch[-1])
+
+    def _values(self, record):
+        values = [index_value(field_value(record, field)) for field in self.fields]
+        return [record["id"], *values, json.dumps(record)]
+
+    def insert(self, record):
+        columns = ["id", *map(column_name, self.fields), "data"]
+        placeholders = ", ".join("?" for _ in columns)
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self.name} ({', '.join(columns)}) VALUES ({placeholders})",
+            self._values(record))
+        return record
+
+    def update(self, record, changes):
+        """Apply ``changes`` to the stored record and return it.
+
+        The caller's copy may be stale, so the row is re-read under the write
+        lock and only ``changes`` are merged into it, as the JSON backend does.
+        """
+        assignments = ", ".join(f"{column_name(f)} = ?" for f in self.fields)
+        with self.repository.transaction():
+            current = self.get(record["id"]) or record
+            updated = {**current, **changes}
+            values = self._values(updated)
+            self._conn.execute(
+                f"UPDATE {self.name} SET {assignments + ', ' if assignments else ''}data = ? WHERE id = ?",
+                [*values[1:], updated["id"]])
+        return updated
+
+
+class SqliteRepository:
+    # Several server processes may write to the same database
+    shared = True
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        # FULL syncs the WAL on every commit; NORMAL only at checkpoints, so a power loss can drop recent commits
+        self._connections = ThreadConnections(path, synchronous="FULL" if fsync else "NORMAL")
+        self._local = threading.local()
+
+    def connection(self):
+        return self._connections.get()
+
+    def _create_table(self, name):
+        conn = self.connection()
+        fields = table_fields(name)
+        columns = ", ".join(f"{column_name(f)} TEXT" for f in fields)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} "
+            f"(id TEXT PRIMARY KEY, {columns + ', ' if columns else ''}data TEXT NOT NULL)")
+        # Add lookup columns introduced after the table was first created
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+        for field in fields:
+            column = column_name(field)
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {name} ADD COLUMN {column} TEXT")
+                for record_id, data in conn.execute(f"SELECT id, data FROM {name}").fetchall():
+                    conn.execute(f"UPDATE {name} SET {column} = ? WHERE id = ?",
+                                 (field_value(json.loads(data), field), record_id))
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{column} ON {name} ({column})")
+        order = column_name(ORDER_BY[name])
+        if order != "id":
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_order ON {name} (COALESCE({order}, ''), id)")
+
+    def collection(self, name, default=None):
+        self._create_table(name)
+        collection = SqliteCollection(self, name, table_fields(name), ORDER_BY[name])
+        if default and not len(collection):
+            with self.transaction():
+                for record in default:
+                    collection.insert(record)
+        return collection
+
+    @contextmanager
+    def transaction(self):
+        """Run a block atomically; BEGIN IMMEDIATE serializes writers across processes"""
+        conn = self.connection()
+        if getattr(self._local, "depth", 0):
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            with registry.timer("storage_write_seconds", backend="sqlite"):
+                conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def close(self):
+        self._connections.close()
+
+
+def open_repository():
+    backend = os.getenv("STORAGE_BACKEND", "json").lower()
+    data_dir = os.getenv("DATA_DIR", DEFAULT_DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    if backend == "sqlite":
+        return SqliteRepository(os.getenv("SQLITE_PATH", os.path.join(data_dir, "metamind.db")),
+                                fsync=os.getenv("STORAGE_FSYNC", "true").lower() == "true")
+    if backend == "json":
+        return JsonRepository(
+            data_dir,
+            compact_after=int(os.getenv("STORAGE_COMPACT_AFTER", "1000")),
+            fsync=os.getenv("STORAGE_FSYNC", "true").lower() == "true",
+            commit_window=float(os.getenv("STORAGE_COMMIT_WINDOW_MS", "0")) / 1000,
+            snapshot_format=os.getenv("STORAGE_SNAPSHOT_FORMAT", "json").lower()
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def read_collection(name):
+    """Read a collection's current records fresh from storage, without opening it for writing.
+
+    For a separate process that only reads data the API writes (the WhatsApp bot).
+    """
+    data_dir = os.getenv("DATA_DIR", DEFAULT_DATA_DIR)
+    if os.getenv("STORAGE_BACKEND", "json").lower() == "sqlite":
+        repository = SqliteRepository(os.getenv("SQLITE_PATH", os.path.join(data_dir, "metamind.db")))
+        try:
+            return list(SqliteCollection(repository, name, table_fields(name), ORDER_BY[name]).scan())
+        except sqlite3.OperationalError:
+            return []  # the API hasn't created the table yet
+        finally:
+            repository.close()
+    return LogStore(data_dir).load(f"{name}.json")
+
+
+def import_json(data_dir, sqlite_path):
+    """Copy every collection from the JSON files (plus change logs) into SQLite"""
+    source = LogStore(data_dir)
+    target = SqliteRepository(sqlite_path)
+    counts = {}
+    for name in SCHEMA:
+        records = source.load(f"{name}.json")
+        collection = target.collection(name)
+        with target.transaction():
+            for record in records:
+                collection.insert(record)
+        counts[name] = len(records)
+    target.close()
+    return counts
+
+
+def convert_snapshots(data_dir, snapshot_format="binary"):
+    """Fold each collection's change log into a fresh snapshot written in ``snapshot_format``"""
+    store = LogStore(data_dir, snapshot_format=snapshot_format)
+    counts = {}
+    for name in SCHEMA:
+        filename = f"{name}.json"
+        if not os.path.exists(os.path.join(data_dir, filename)) and not os.path.exists(store._snap_path(filename)):
+            continue
+        counts[name] = len(store.load(filename, key_fields=key_fields(name), lazy=True))
+        store.compact(filename)
+    store.close()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MetaMind storage tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    importer = subcommands.add_parser("import-json", help="Import the JSON data files into SQLite")
+    importer.add_argument("--data-dir", default=os.getenv("DATA_DIR", DEFAULT_DATA_DIR))
+    importer.add_argument("--sqlite-path", default=None)
+    converter = subcommands.add_parser("convert-snapshots",
+                                       help="Rewrite the JSON data files as binary snapshots (or back)")
+    converter.add_argument("--data-dir", default=os.getenv("DATA_DIR", DEFAULT_DATA_DIR))
+    converter.add_argument("--format", choices=["binary", "json"], default="binary")
+    args = parser.parse_args()
+
+    if args.command == "convert-snapshots":
+        counts = convert_snapshots(args.data_dir, args.format)
+    else:
+        sqlite_path = args.sqlite_path or os.getenv("SQLITE_PATH", os.path.join(args.data_dir, "metamind.db"))
+        counts = import_json(args.data_dir, sqlite_path)
+    for name, count in counts.items():
+        print(f"{name}: {count} records")
@@ -0,0 +1,141 @@
+"""Server-side cache of serialized GET responses.
+
+A cached view's body is stored as bytes together with a strong ETag (a hash
+of the body), keyed by path and query string, so a hit skips both the lookup
+and ``jsonify``. Clients and CDNs that send ``If-None-Match`` get a 304.
+
+Every entry carries one or more tags (``"scholarships"``,
+``"scholarship:<id>"``...). Write paths call ``invalidate`` with the tags
+they affect, which drops exactly those entries. A per-tag generation counter
+keeps a response that was being built during the invalidation from being
+stored afterwards.
+
+The cache is an LRU bounded by both entry count and total body size. It is
+per process: with several server processes, ``ttl`` bounds how long another
+process's write can go unseen.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, make_response, request
+
+# Headers that belong to the cached body (pagination links) and are replayed on hits
+KEPT_HEADERS = ("Content-Type", "X-Next-Cursor", "Link")
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1000, max_bytes=32 * 1024 * 1024, ttl=60.0, max_age=0, shared_max_age=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache_control = f"public, max-age={max_age}, s-maxage={shared_max_age}"
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tagged = {}
+        self._generations = {}
+        self._bytes = 0
+        self._counts = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0, "invalidations": 0}
+
+    def cached(self, *tags):
+        """Decorate a GET view; ``tags`` may use ``{name}`` placeholders filled from the URL arguments"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                entry_tags = tuple(tag.format(**kwargs) for tag in tags)
+                key = (request.path, request.query_string)
+                entry = self._get(key)
+                if entry is None:
+                    generations = self._generation(entry_tags)
+                    response = make_response(view(**kwargs))
+                    # Errors and non-JSON responses are served as-is and never cached
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.sha256(body).hexdigest()[:32]
+                    headers = {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers}
+                    entry = (body, etag, headers)
+                    self._put(key, entry_tags, generations, entry)
+                body, etag, headers = entry
+                response = Response(body, headers=headers)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = self.cache_control
+                response.make_conditional(request)
+                if response.status_code == 304:
+                    self._count("not_modified")
+                return response
+            return wrapper
+        return decorator
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _generation(self, tags):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def _get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or (self.ttl > 0 and item[0] < time.monotonic()):
+                if item is not None:
+                    self._drop(key)
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return item[2]
+
+    def _put(self, key, tags, generations, entry):
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # Skip if any tag was invalidated while the response was being built
+            if tuple(self._generations.get(tag, 0) for tag in tags) != generations:
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tags, entry)
+            self._bytes += size
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counts["evictions"] += 1
+
+    def _drop(self, key):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        _, tags, entry = item
+        self._bytes -= len(entry[0])
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of ``tags``"""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tagged.get(tag, ())):
+                    self._drop(key)
+            self._counts["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counts["hits"] / lookups, 4) if lookups else 0.0,
+                **self._counts
+            }
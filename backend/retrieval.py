@@ -0,0 +1,184 @@
+"""Local retrieval over the scholarships catalogue for the WhatsApp bot.
+
+Each scholarship is embedded as a hashed TF-IDF vector: its words (weighted
+by field as in ``search``) are hashed into ``dim`` signed buckets, so no
+vocabulary or network model is needed and every vector has the same small
+size. The raw term-frequency rows live in one NumPy matrix; IDF weighting and
+L2 normalization are applied lazily and cached until the catalogue changes,
+and a question is answered with a single matrix-vector product.
+
+``refresh`` takes the current records and re-embeds only those whose text,
+status, amount or deadline changed, dropping records that disappeared.
+``ScholarshipRetriever`` calls it at most every ``refresh_interval`` seconds
+from a loader function, so the bot follows the live catalogue.
+"""
+import logging
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from search import FIELD_WEIGHTS, tokenize
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FIELDS = tuple(FIELD_WEIGHTS) + ("status", "amount", "deadline")
+
+
+def _fingerprint(record):
+    return tuple(str(record.get(field)) for field in FINGERPRINT_FIELDS)
+
+
+class HashedTfidfIndex:
+    def __init__(self, dim=1024):
+        if dim & (dim - 1):
+            raise ValueError("dim must be a power of two")
+        self.dim = dim
+        self._tf = np.zeros((16, dim), dtype=np.float32)
+        self._df = np.zeros(dim, dtype=np.int32)
+        self._rows = {}
+        self._ids = []
+        self._records = []
+        self._fingerprints = {}
+        self._normalized = None
+        self._idf = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def embed_terms(self, weighted_terms):
+        """Hash ``(term, weight)`` pairs into one sublinear term-frequency vector"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term, weight in weighted_terms:
+            h = zlib.crc32(term.encode())
+            vector[h & (self.dim - 1)] += weight if h & 0x80000000 else -weight
+        nonzero = vector != 0
+        vector[nonzero] = np.sign(vector[nonzero]) * (1 + np.log(np.abs(vector[nonzero])))
+        return vector
+
+    def _embed_record(self, record):
+        return self.embed_terms(
+            (term, weight) for field, weight in FIELD_WEIGHTS.items() for term in tokenize(record.get(field)))
+
+    def refresh(self, records):
+        """Bring the index in line with ``records``; returns the number of rows re-embedded or removed"""
+        seen = set()
+        changed = 0
+        for record in records:
+            seen.add(record["id"])
+            fingerprint = _fingerprint(record)
+            if self._fingerprints.get(record["id"]) != fingerprint:
+                self._put(record, fingerprint)
+                changed += 1
+        for record_id in [i for i in self._ids if i not in seen]:
+            self._remove(record_id)
+            changed += 1
+        if changed:
+            self._normalized = None
+        return changed
+
+    def _put(self, record, fingerprint):
+        row = self._rows.get(record["id"])
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._tf):
+                self._tf = np.concatenate([self._tf, np.zeros_like(self._tf)])
+            self._rows[record["id"]] = row
+            self._ids.append(record["id"])
+            self._records.append(record)
+        else:
+            self._df -= self._tf[row] != 0
+            self._records[row] = record
+        self._tf[row] = self._embed_record(record)
+        self._df += self._tf[row] != 0
+        self._fingerprints[record["id"]] = fingerprint
+
+    def _remove(self, record_id):
+        # Move the last row into the hole so the matrix stays dense
+        row = self._rows.pop(record_id)
+        self._df -= self._tf[row] != 0
+        last = len(self._ids) - 1
+        if row != last:
+            self._tf[row] = self._tf[last]
+            self._ids[row] = self._ids[last]
+            self._records[row] = self._records[last]
+            self._rows[self._ids[row]] = row
+        self._tf[last] = 0
+        self._ids.pop()
+        self._records.pop()
+        del self._fingerprints[record_id]
+
+    def _weights(self):
+        if self._normalized is None:
+            count = len(self._ids)
+            self._idf = (np.log((1 + count) / (1 + self._df)) + 1).astype(np.float32)
+            weighted = self._tf[:count] * self._idf
+            norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            self._normalized = weighted / norms
+        return self._normalized, self._idf
+
+    def query(self, text, k=3, accept=None):
+        """Return up to ``k`` ``(cosine score, record)`` pairs for ``text``, best first"""
+        if not self._ids:
+            return []
+        matrix, idf = self._weights()
+        vector = self.embed_terms((term, 1.0) for term in tokenize(text)) * idf
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return []
+        scores = matrix @ (vector / norm)
+        if accept is not None:
+            mask = np.fromiter((accept(r) for r in self._records), dtype=bool, count=len(self._records))
+            scores = np.where(mask, scores, -1.0)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._records[i]) for i in top if scores[i] > 0]
+
+
+class ScholarshipRetriever:
+    def __init__(self, load, refresh_interval=30.0, dim=1024):
+        self.load = load
+        self.refresh_interval = refresh_interval
+        self.index = HashedTfidfIndex(dim)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+
+    def refresh(self):
+        records = self.load()
+        with self._lock:
+            changed = self.index.refresh(records)
+            self._refreshed_at = time.monotonic()
+        return changed
+
+    def _maybe_refresh(self):
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        # One caller reloads; the rest keep answering from the current index (the first load everyone waits for)
+        if self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            try:
+                if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                    self.refresh()
+            except Exception:
+                # Keep answering from the previous index; the next query tries again
+                logger.exception("Could not refresh the scholarships index")
+            finally:
+                self._refresh_lock.release()
+
+    def search(self, text, k=3):
+        """Top ``k`` open scholarships for ``text`` as ``(score, record)`` pairs"""
+        self._maybe_refresh()
+        with self._lock:
+            return self.index.query(text, k, accept=lambda r: r.get("status", "open") == "open")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scholarships": len(self.index),
+                "dim": self.index.dim,
+                "seconds_since_refresh": (round(time.monotonic() - self._refreshed_at, 1)
+                                          if self._refreshed_at is not None else None)
+            }
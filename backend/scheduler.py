@@ -0,0 +1,147 @@
+"""Deadline-ordered scheduler.
+
+Items (a kind such as ``"scholarship"`` plus a record id) are kept in a binary
+heap keyed on their deadline. One background thread sleeps until the earliest
+deadline, pops everything that is due and hands it to the ``on_due`` callback,
+so scheduling costs O(log n) per item and nothing is ever rescanned.
+
+Rescheduling or cancelling an item leaves its old heap entry in place but
+marks it stale; stale entries are skipped when they reach the top. ``sync``
+schedules a full listing of items (including records written by another
+server process), pushing only those not already scheduled for that deadline.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def parse_deadline(value):
+    """Return a deadline as a POSIX timestamp, or None if it is missing or unreadable"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+class DeadlineScheduler:
+    def __init__(self, on_due):
+        self.on_due = on_due
+        self._heap = []
+        # (kind, record_id) -> (seq, due) of the item's current heap entry
+        self._live = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._live)
+
+    def schedule(self, kind, record_id, deadline):
+        """Schedule (or reschedule) an item; returns False if the deadline can't be read"""
+        due = parse_deadline(deadline)
+        if due is None:
+            self.cancel(kind, record_id)
+            return False
+        self._push(kind, record_id, due)
+        return True
+
+    def _push(self, kind, record_id, due):
+        with self._cond:
+            seq = next(self._seq)
+            self._live[(kind, record_id)] = (seq, due)
+            heapq.heappush(self._heap, (due, seq, kind, record_id))
+            if self._heap[0][1] == seq:
+                # New earliest deadline: wake the worker so it can shorten its sleep
+                self._cond.notify()
+        self.start()
+
+    def cancel(self, kind, record_id):
+        with self._cond:
+            self._live.pop((kind, record_id), None)
+
+    def sync(self, kind, items):
+        """Schedule ``(record_id, deadline)`` pairs of ``kind``, skipping those already scheduled for that deadline"""
+        wanted = {}
+        for record_id, deadline in items:
+            due = parse_deadline(deadline)
+            if due is not None:
+                wanted[record_id] = due
+        with self._cond:
+            changed = [(record_id, due) for record_id, due in wanted.items()
+                       if self._live.get((kind, record_id), (None, None))[1] != due]
+        for record_id, due in changed:
+            self._push(kind, record_id, due)
+
+    def _is_live(self, entry):
+        _, seq, kind, record_id = entry
+        return self._live.get((kind, record_id), (None,))[0] == seq
+
+    def start(self):
+        # Cheap when already running; also restarts the thread in a forked server worker
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="deadlines", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    while self._heap and not self._is_live(self._heap[0]):
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                _, _, kind, record_id = heapq.heappop(self._heap)
+                del self._live[(kind, record_id)]
+            try:
+                self.on_due(kind, record_id)
+            except Exception:
+                logger.exception("Deadline handler failed for %s %s", kind, record_id)
+
+    def upcoming(self, kind, within, limit):
+        """Return ``(due timestamp, record_id)`` pairs of ``kind`` due in the next ``within`` seconds.
+
+        Walks the heap in deadline order from the root, expanding only the
+        children of entries already taken, so the cost depends on ``limit``
+        rather than on the number of scheduled items.
+        """
+        with self._cond:
+            horizon = time.time() + within
+            results = []
+            frontier = [(self._heap[0], 0)] if self._heap else []
+            while frontier and len(results) < limit:
+                entry, index = heapq.heappop(frontier)
+                if entry[0] > horizon:
+                    break
+                if entry[2] == kind and self._is_live(entry):
+                    results.append((entry[0], entry[3]))
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(self._heap):
+                        heapq.heappush(frontier, (self._heap[child], child))
+            return results
@@ -0,0 +1,157 @@
+"""Full-text search over scholarships.
+
+An inverted index maps each term to the scholarships containing it, with a
+per-field weighted term frequency (title counts most, then sponsor, then
+description and requirements). Queries only touch the postings of their own
+terms and are ranked with BM25. Records are added or replaced one at a time,
+so creating a scholarship updates the index incrementally; ``sync`` catches up
+with changes made elsewhere (another server process) from the full catalogue.
+"""
+import heapq
+import math
+import re
+import threading
+
+FIELD_WEIGHTS = {"title": 3.0, "sponsor": 2.0, "description": 1.0, "requirements": 1.0}
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the to with".split()
+)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(str(text or "").lower()) if t not in STOP_WORDS]
+
+
+def _amount(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _deadline(record):
+    # Compared as strings, like the collections' sort keys, so a client-supplied number can't break the filters
+    deadline = record.get("deadline")
+    return deadline if deadline.__class__ is str else "" if deadline is None else str(deadline)
+
+
+class SearchIndex:
+    def __init__(self, records=(), k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._lengths = {}
+        self._total_length = 0.0
+        self._records = {}
+        self._norms = None
+        for record in records:
+            self.add(record)
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record):
+        """Index ``record``, replacing any earlier version with the same id"""
+        frequencies = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(record.get(field)):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        length = sum(frequencies.values())
+        with self._lock:
+            self._remove(record["id"])
+            for term, frequency in frequencies.items():
+                self._postings.setdefault(term, {})[record["id"]] = frequency
+            self._lengths[record["id"]] = length
+            self._total_length += length
+            self._records[record["id"]] = record
+            self._norms = None
+
+    def sync(self, records):
+        """Re-index the records of the full catalogue ``records`` that changed, and drop any no longer in it"""
+        seen = set()
+        for record in records:
+            seen.add(record["id"])
+            with self._lock:
+                unchanged = self._records.get(record["id"]) == record
+            if not unchanged:
+                self.add(record)
+        with self._lock:
+            for record_id in [i for i in self._records if i not in seen]:
+                self._remove(record_id)
+
+    def remove(self, record_id):
+        with self._lock:
+            self._remove(record_id)
+
+    def _remove(self, record_id):
+        record = self._records.pop(record_id, None)
+        if record is None:
+            return
+        for term in set(t for field in FIELD_WEIGHTS for t in tokenize(record.get(field))):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(record_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(record_id, 0.0)
+        self._norms = None
+
+    def _length_norms(self):
+        # BM25 length normalization per record; recomputed only after the index changes
+        if self._norms is None:
+            average_length = self._total_length / len(self._records) if self._records else 0.0
+            self._norms = {
+                record_id: self.k1 * (1 - self.b + self.b * length / (average_length or 1))
+                for record_id, length in self._lengths.items()
+            }
+        return self._norms
+
+    def search(self, query="", status=None, min_amount=None, max_amount=None,
+               deadline_after=None, deadline_before=None, limit=20):
+        """Return up to ``limit`` ``(score, record)`` pairs, best first.
+
+        Without query terms, every record passing the filters matches with score 0,
+        ordered by deadline.
+        """
+        terms = tokenize(query)
+
+        def accept(record):
+            if status is not None and record.get("status") != status:
+                return False
+            amount = _amount(record.get("amount"))
+            if min_amount is not None and (amount is None or amount < min_amount):
+                return False
+            if max_amount is not None and (amount is None or amount > max_amount):
+                return False
+            deadline = _deadline(record)
+            if deadline_after is not None and deadline < deadline_after:
+                return False
+            if deadline_before is not None and deadline >= deadline_before:
+                return False
+            return True
+
+        with self._lock:
+            if not terms:
+                matches = [r for r in self._records.values() if accept(r)]
+                matches.sort(key=_deadline)
+                return [(0.0, r) for r in matches[:limit]]
+
+            count = len(self._records)
+            norms = self._length_norms()
+            boost = self.k1 + 1
+            scores = {}
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for record_id, frequency in postings.items():
+                    scores[record_id] = scores.get(record_id, 0.0) + idf * frequency * boost / (frequency + norms[record_id])
+
+            ranked = ((score, self._records[record_id]) for record_id, score in scores.items())
+            ranked = (pair for pair in ranked if accept(pair[1]))
+            return heapq.nlargest(limit, ranked, key=lambda pair: pair[0])
@@ -0,0 +1,182 @@
+"""Per-sender conversation history for the WhatsApp bot.
+
+Each sender (the Twilio ``From`` number) keeps a ring buffer of their last
+``max_turns`` turns, so a follow-up question can be answered with the
+conversation so far. Conversations idle for ``ttl`` seconds are forgotten.
+
+- ``MemorySessionStore`` keeps the buffers in an LRU-ordered dict, evicting
+  idle senders first and then the least recently active ones once the
+  estimated size passes ``max_bytes``.
+- ``SqliteSessionStore`` keeps turns in a SQLite table, so history survives
+  restarts and is shared between server processes.
+
+``open_session_store`` picks one from the ``SESSION_*`` environment
+variables.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlitedb import ThreadConnections
+
+# Rough per-object overheads (CPython, 64-bit) used for the memory cap
+SENDER_OVERHEAD = 900
+TURN_OVERHEAD = 120
+
+ROLE_NAMES = {"user": "Student", "bot": "Advisor"}
+
+
+def context_window(turns, max_chars=1200):
+    """Format recent turns as a compact transcript, dropping the oldest turns past ``max_chars``"""
+    lines = []
+    used = 0
+    for role, text in reversed(turns):
+        line = f"{ROLE_NAMES.get(role, role)}: {' '.join(text.split())}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(reversed(lines))
+
+
+class MemorySessionStore:
+    def __init__(self, max_turns=6, ttl=1800, max_bytes=64 * 1024 * 1024, max_chars=500):
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        # sender -> [last active, estimated bytes, deque of (role, text)], least recently active first
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def history(self, sender):
+        """Return the sender's recent turns, oldest first"""
+        with self._lock:
+            session = self._sessions.get(sender)
+            if session is None or session[0] < time.time() - self.ttl:
+                return []
+            return list(session[2])
+
+    def append(self, sender, role, text):
+        text = text[:self.max_chars]
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(sender)
+            if session is None:
+                session = self._sessions[sender] = [now, SENDER_OVERHEAD, deque(maxlen=self.max_turns)]
+                self._bytes += SENDER_OVERHEAD
+            else:
+                self._sessions.move_to_end(sender)
+                if session[0] < now - self.ttl:
+                    self._bytes -= session[1] - SENDER_OVERHEAD
+                    session[1] = SENDER_OVERHEAD
+                    session[2].clear()
+            turns = session[2]
+            if len(turns) == turns.maxlen:
+                dropped = TURN_OVERHEAD + len(turns[0][1])
+                session[1] -= dropped
+                self._bytes -= dropped
+            turns.append((role, text))
+            added = TURN_OVERHEAD + len(text)
+            session[0] = now
+            session[1] += added
+            self._bytes += added
+            self._evict(now)
+
+    def _evict(self, now):
+        # The dict is ordered by last activity, so expired and least recently active senders are at the front
+        while self._sessions:
+            sender, session = next(iter(self._sessions.items()))
+            if session[0] >= now - self.ttl and self._bytes <= self.max_bytes:
+                break
+            del self._sessions[sender]
+            self._bytes -= session[1]
+            self._evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "senders": len(self._sessions),
+                "estimated_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evicted": self._evicted
+            }
+
+
+class SqliteSessionStore:
+    def __init__(self, path, max_turns=6, ttl=1800, max_chars=500, prune_every=1000):
+        self.path = path
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self.prune_every = prune_every
+        self._connections = ThreadConnections(path)
+        self._appends = 0
+        self._count_lock = threading.Lock()
+        conn = self.connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_turns "
+            "(seq INTEGER PRIMARY KEY AUTOINCREMENT, sender TEXT NOT NULL, role TEXT NOT NULL, "
+            "text TEXT NOT NULL, at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_turns_sender ON session_turns (sender, seq)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_turns_at ON session_turns (at)")
+
+    def connection(self):
+        return self._connections.get()
+
+    def __len__(self):
+        cutoff = time.time() - self.ttl
+        return self.connection().execute(
+            "SELECT COUNT(DISTINCT sender) FROM session_turns WHERE at >= ?", (cutoff,)).fetchone()[0]
+
+    def history(self, sender):
+        rows = self.connection().execute(
+            "SELECT role, text FROM session_turns WHERE sender = ? AND at >= ? ORDER BY seq DESC LIMIT ?",
+            (sender, time.time() - self.ttl, self.max_turns)).fetchall()
+        return [(role, text) for role, text in reversed(rows)]
+
+    def append(self, sender, role, text):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO session_turns (sender, role, text, at) VALUES (?, ?, ?, ?)",
+                         (sender, role, text[:self.max_chars], time.time()))
+            # Keep only the newest max_turns rows for this sender
+            conn.execute(
+                "DELETE FROM session_turns WHERE sender = ? AND seq <= "
+                "(SELECT seq FROM session_turns WHERE sender = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (sender, sender, self.max_turns))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._count_lock:
+            self._appends += 1
+            prune = self._appends % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete turns older than the TTL"""
+        self.connection().execute("DELETE FROM session_turns WHERE at < ?", (time.time() - self.ttl,))
+
+    def stats(self):
+        return {"backend": "sqlite", "senders": len(self), "path": self.path}
+
+
+def open_session_store():
+    max_turns = int(os.getenv("SESSION_TURNS", "6"))
+    ttl = float(os.getenv("SESSION_TTL", "1800"))
+    if os.getenv("SESSION_STORE", "memory").lower() == "sqlite":
+        data_dir = os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "data"))
+        path = os.getenv("SESSION_SQLITE_PATH", os.path.join(data_dir, "sessions.db"))
+        return SqliteSessionStore(path, max_turns=max_turns, ttl=ttl)
+    return MemorySessionStore(max_turns=max_turns, ttl=ttl,
+                              max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))))
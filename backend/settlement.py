@@ -0,0 +1,136 @@
+"""Milestone payouts from smart contracts.
+
+A contract's ``terms.milestones`` split each award into percentage tranches.
+The award per awardee is ``terms.award_amount`` (ETH) when the contract sets
+one, and otherwise the contract's ``total_funds``. A completion names a
+contract, an applicant and a milestone (an index into ``terms.milestones``);
+it pays the tranche if the applicant's GPA meets ``terms.minimum_gpa`` and
+the milestone was completed by ``terms.deadline``.
+
+Tranches are computed in integer wei for a whole batch at once with NumPy.
+Each tranche is the difference of the award's cumulative shares at the
+milestone's two boundaries, so an awardee's tranches add up to exactly their
+share of the award; nothing is rounded away or created.
+
+Every payout has an idempotency key derived from its contract, applicant and
+milestone (``payout_key``), so a milestone is paid at most once however many
+times a batch is retried.
+"""
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+
+from ledger import to_wei
+
+BASIS_POINTS = 10000
+
+# Awards are split as high * SPLIT + low to keep the products inside int64; SPLIT is a multiple of BASIS_POINTS
+SPLIT = 10 ** 9
+MAX_HIGH = (2 ** 63 - 1) // BASIS_POINTS
+
+PAYOUT_NAMESPACE = uuid.UUID("6f1c8f0e-3d3b-4b6e-9a57-2f4f1f6c2a10")
+
+
+class SettlementError(ValueError):
+    pass
+
+
+def payout_key(contract_id, applicant_id, milestone):
+    """Idempotency key of the payout for one applicant's milestone"""
+    return str(uuid.uuid5(PAYOUT_NAMESPACE, f"{contract_id}:{applicant_id}:{milestone}"))
+
+
+def milestone_bounds(terms):
+    """Cumulative basis points at each milestone boundary: ``[0, m1, m1 + m2, ...]``"""
+    bounds = [0]
+    for milestone in (terms or {}).get("milestones") or []:
+        try:
+            share = Decimal(str(milestone.get("percentage"))) * 100
+        except (AttributeError, InvalidOperation):
+            raise SettlementError("Milestone percentages must be numbers")
+        if not share.is_finite() or share < 0 or share != share.to_integral_value():
+            raise SettlementError("Milestone percentages must be non-negative with at most two decimal places")
+        bounds.append(bounds[-1] + int(share))
+    if bounds[-1] > BASIS_POINTS:
+        raise SettlementError("Milestone percentages add up to more than 100")
+    return bounds
+
+
+def _funds_wei(amount, name):
+    try:
+        wei = to_wei(amount or 0, exact=False)
+    except ValueError:
+        raise SettlementError(f"Contract {name} is not a valid amount")
+    if wei < 0:
+        raise SettlementError(f"Contract {name} must not be negative")
+    return wei
+
+
+def award_wei(contract):
+    terms = contract.get("terms") or {}
+    return _funds_wei(terms.get("award_amount") or contract.get("total_funds"), "award")
+
+
+def remaining_wei(contract):
+    return _funds_wei(contract.get("remaining_funds"), "remaining_funds")
+
+
+def _datetime(value):
+    # Naive local time, like the timestamps the API writes
+    moment = datetime.fromisoformat(str(value))
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def check_completion(contract, data, now):
+    """Check one completion against its contract's terms; returns ``(milestone, gpa, completed_at)``"""
+    if contract.get("status") == "expired":
+        raise ValueError("Contract has expired")
+    terms = contract.get("terms") or {}
+    milestones = terms.get("milestones") or []
+    milestone = data.get("milestone")
+    if isinstance(milestone, bool) or not isinstance(milestone, int) or not 0 <= milestone < len(milestones):
+        raise ValueError(f"milestone must be an index into the contract's {len(milestones)} milestones")
+
+    try:
+        gpa = float(data.get("gpa"))
+    except (TypeError, ValueError):
+        raise ValueError("gpa must be a number")
+    minimum_gpa = terms.get("minimum_gpa")
+    if minimum_gpa is not None and gpa < float(minimum_gpa):
+        raise ValueError(f"GPA {gpa} is below the contract minimum of {minimum_gpa}")
+
+    try:
+        completed_at = _datetime(data["completedAt"]) if data.get("completedAt") else now
+    except ValueError:
+        raise ValueError("completedAt must be an ISO 8601 date")
+    if completed_at > now:
+        raise ValueError("completedAt is in the future")
+    deadline = terms.get("deadline")
+    if deadline and completed_at > _datetime(deadline):
+        raise ValueError("Milestone was completed after the contract deadline")
+    return milestone, gpa, completed_at
+
+
+def tranche_amounts(awards, award_index, starts, ends):
+    """Wei paid for each completion, as a list of ints.
+
+    ``awards`` are the distinct awards in wei and ``award_index`` picks one per
+    completion; ``starts`` and ``ends`` are the completion's milestone
+    boundaries in cumulative basis points. Each amount is
+    ``floor(award * end / 10^4) - floor(award * start / 10^4)``.
+    """
+    high, low = zip(*(divmod(award, SPLIT) for award in awards)) if awards else ((), ())
+    if any(h > MAX_HIGH for h in high):
+        raise SettlementError("Award is too large to settle")
+    index = np.asarray(award_index, dtype=np.intp)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    high = np.asarray(high, dtype=np.int64)[index]
+    low = np.asarray(low, dtype=np.int64)[index]
+    # high * SPLIT * share / BASIS_POINTS is exact, so only the low part needs flooring
+    coarse = high * (ends - starts)
+    fine = low * ends // BASIS_POINTS - low * starts // BASIS_POINTS
+    scale = SPLIT // BASIS_POINTS
+    return [c * scale + f for c, f in zip(coarse.tolist(), fine.tolist())]
@@ -0,0 +1,134 @@
+"""Compact binary snapshots, memory-mapped and decoded one record at a time.
+
+A ``.snap`` file holds the same records as a collection's JSON snapshot, laid
+out so that opening it costs almost nothing:
+
+    header   magic, record count, index offset, keys offset
+    records  per record: u32 length, then the record as compact UTF-8 JSON
+    index    u64 offset of each record, in order
+    keys     JSON columns of the fields the collection looks records up and
+             sorts by (``id``, its ``order_by`` field, its indexed fields)
+
+All integers are little-endian. ``Snapshot`` maps the file and decodes only
+the key columns up front; each record is a ``LazyRecord`` placeholder until
+something reads it. Pages of the file are shared by every process that maps
+it, so forked server workers don't each hold a parsed copy of the data.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from indexes import field_value
+
+MAGIC = b"MMSNAP01"
+HEADER = struct.Struct("<8sQQQ")
+LENGTH = struct.Struct("<I")
+
+
+class LazyRecord:
+    """A record still in its snapshot; ``key`` reads the indexed fields without decoding it"""
+
+    __slots__ = ("snapshot", "position")
+
+    def __init__(self, snapshot, position):
+        self.snapshot = snapshot
+        self.position = position
+
+    def key(self, path):
+        # Inlined column lookup: this runs for every indexed field of every record at startup
+        column = self.snapshot.columns.get(path)
+        if column is None:
+            return self.snapshot.key(self.position, path)
+        return column[self.position]
+
+    def raw(self):
+        return self.snapshot.raw(self.position)
+
+    def load(self):
+        return self.snapshot.record(self.position)
+
+
+def loaded(record):
+    """The record itself, decoding it first if it is still a ``LazyRecord``"""
+    return record.load() if record.__class__ is LazyRecord else record
+
+
+def record_key(record, path):
+    return record.key(path) if record.__class__ is LazyRecord else field_value(record, path)
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, index_offset, keys_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        index = memoryview(self._map)[index_offset:keys_offset]
+        if sys.byteorder == "little":
+            self._offsets = index.cast("Q")
+        else:
+            self._offsets = array("Q", index)
+            self._offsets.byteswap()
+        keys = json.loads(self._map[keys_offset:])
+        self.columns = dict(zip(keys["fields"], keys["columns"]))
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, position):
+        offset = self._offsets[position]
+        (length,) = LENGTH.unpack_from(self._map, offset)
+        start = offset + LENGTH.size
+        return self._map[start:start + length]
+
+    def record(self, position):
+        return json.loads(self.raw(position))
+
+    def key(self, position, path):
+        column = self.columns.get(path)
+        if column is None:
+            # Not stored as a key column (the schema changed since the file was written)
+            return field_value(self.record(position), path)
+        return column[position]
+
+    def records(self):
+        return [LazyRecord(self, position) for position in range(self.count)]
+
+
+def write_snapshot(path, records, key_fields=("id",)):
+    """Write ``records`` (dicts or ``LazyRecord``s) to ``path`` via a temp file and rename"""
+    key_fields = list(dict.fromkeys(("id",) + tuple(key_fields)))
+    offsets = array("Q")
+    columns = [[] for _ in key_fields]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0, 0))
+        position = HEADER.size
+        for record in records:
+            # A record still in the old snapshot is copied across without being decoded
+            if record.__class__ is LazyRecord:
+                data = record.raw()
+            else:
+                data = json.dumps(record, separators=(",", ":")).encode()
+            for column, field in zip(columns, key_fields):
+                column.append(record_key(record, field))
+            offsets.append(position)
+            f.write(LENGTH.pack(len(data)))
+            f.write(data)
+            position += LENGTH.size + len(data)
+        index_offset = position
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+        keys_offset = index_offset + len(offsets) * offsets.itemsize
+        f.write(json.dumps({"fields": key_fields, "columns": columns}, separators=(",", ":")).encode())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(offsets), index_offset, keys_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,32 @@
+"""Per-thread SQLite connections for the SQLite-backed stores.
+
+sqlite3 connections must not be shared across threads, so each thread opens
+its own on first use. Connections are in autocommit mode (stores issue
+``BEGIN IMMEDIATE`` themselves) with WAL journaling, so readers don't block
+the writer and several server processes can share one file.
+"""
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    def __init__(self, path, synchronous="NORMAL"):
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
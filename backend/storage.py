@@ -0,0 +1,295 @@
+"""Append-only change log for the JSON data files.
+
+Every collection keeps a pretty-printed JSON snapshot (``users.json``) and a
+sibling log (``users.json.log``) holding one compact JSON entry per line:
+
+    {"op": "put", "record": {...}}
+    {"op": "delete", "id": "..."}
+
+Writes only append to the log, so their cost depends on the size of the
+changed record rather than the size of the collection. ``load`` replays the
+log on top of the snapshot. Once a log grows past ``compact_after`` entries it
+is rotated to ``<name>.log.compacting`` and folded into a fresh snapshot on a
+background thread, while new writes keep going to an empty log.
+
+Writes are group-committed: a single flusher thread drains every group queued
+by concurrent requests (optionally waiting ``commit_window`` seconds to collect
+more), writes them with one append and one fsync per file, then acknowledges
+the waiting requests, so a write is on disk before its request gets a
+response. Sharing one fsync between every request queued meanwhile is what
+keeps that affordable; ``fsync=False`` acknowledges once the data reaches the
+OS buffers instead, which survives a process crash but not a power loss. Snapshots are written to a temp file and renamed into
+place. A crash mid-append can leave a torn line at the end of a log: replay
+skips it, and the next append starts on a fresh line so later writes stay
+readable.
+
+With ``snapshot_format="binary"`` snapshots are written as compact ``.snap``
+files instead (see ``snapshot``), which load by memory-mapping rather than
+parsing. ``load`` reads whichever snapshot of a collection was written last,
+so switching formats never loses data.
+"""
+import json
+import os
+import threading
+import time
+
+from metrics import registry
+from snapshot import Snapshot, loaded, record_key, write_snapshot
+
+
+def entry(op, filename, record):
+    """Serialize one log entry now, so later in-memory changes to ``record`` can't leak into it"""
+    if op == "put":
+        line = json.dumps({"op": "put", "record": record}, separators=(",", ":"))
+    else:
+        line = json.dumps({"op": "delete", "id": record["id"]}, separators=(",", ":"))
+    return (filename, record["id"], line + "\n")
+
+
+class Ticket:
+    """Acknowledgement for a queued group of log entries"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+    def wait(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class LogStore:
+    def __init__(self, data_dir, compact_after=1000, fsync=True, commit_window=0.0, snapshot_format="json"):
+        if snapshot_format not in ("json", "binary"):
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+        self.data_dir = data_dir
+        self.compact_after = compact_after
+        self.fsync = fsync
+        self.commit_window = commit_window
+        self.snapshot_format = snapshot_format
+        self._key_fields = {}
+        self._lock = threading.Lock()
+        self._logs = {}
+        self._pending = {}
+        self._compacting = set()
+        self._queue = []
+        self._queue_cond = threading.Condition()
+        self._flusher = None
+        self._closed = False
+
+    def _path(self, filename, suffix=""):
+        return os.path.join(self.data_dir, filename + suffix)
+
+    def _snap_path(self, filename):
+        return os.path.join(self.data_dir, os.path.splitext(filename)[0] + ".snap")
+
+    # ----- Reading -----
+
+    def load(self, filename, default=None, key_fields=("id",), lazy=False):
+        """Return the records of a collection: snapshot plus replayed log.
+
+        ``key_fields`` are the fields a binary snapshot keeps readable without
+        decoding records. With ``lazy``, records still in a binary snapshot are
+        returned as ``LazyRecord`` placeholders instead of being decoded.
+        """
+        started = time.perf_counter()
+        self._key_fields[filename] = tuple(key_fields)
+        records = self._read_snapshot(filename)
+        if records is None:
+            records = default if default is not None else []
+            if default is not None:
+                self._write_snapshot(filename, records)
+        replayed = self._replay(records, self._path(filename, ".log.compacting"))
+        replayed += self._replay(records, self._path(filename, ".log"))
+        with self._lock:
+            self._pending[filename] = replayed
+        if not lazy:
+            records = [loaded(r) for r in records]
+        registry.observe("storage_load_seconds", time.perf_counter() - started, backend="json", collection=filename)
+        return records
+
+    def _read_snapshot(self, filename):
+        path = self._path(filename)
+        snap_path = self._snap_path(filename)
+        json_mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        snap_mtime = os.stat(snap_path).st_mtime_ns if os.path.exists(snap_path) else None
+        if snap_mtime is not None and (json_mtime is None or snap_mtime >= json_mtime):
+            return Snapshot(snap_path).records()
+        if json_mtime is None:
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _replay(records, log_path):
+        if not os.path.exists(log_path):
+            return 0
+        positions = {record_key(r, "id"): i for i, r in enumerate(records)}
+        deleted = False
+        count = 0
+        with open(log_path, 'r') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    # A torn line from a crash mid-append; it was never acknowledged, but what follows it was
+                    continue
+                count += 1
+                if change["op"] == "put":
+                    record = change["record"]
+                    index = positions.get(record["id"])
+                    if index is None:
+                        positions[record["id"]] = len(records)
+                        records.append(record)
+                    else:
+                        records[index] = record
+                elif change["op"] == "delete":
+                    index = positions.pop(change["id"], None)
+                    if index is not None:
+                        records[index] = None
+                        deleted = True
+        if deleted:
+            records[:] = [r for r in records if r is not None]
+        return count
+
+    # ----- Writing -----
+
+    def put(self, filename, record):
+        """Insert or replace a record (matched by ``id``) and wait until it is written"""
+        self.enqueue([entry("put", filename, record)]).wait()
+
+    def delete(self, filename, record_id):
+        self.enqueue([entry("delete", filename, {"id": record_id})]).wait()
+
+    def enqueue(self, entries):
+        """Queue a group of entries (see ``entry``) for the next commit and return its ticket.
+
+        Groups are written in the order they are queued; call ``ticket.wait()`` to block
+        until the group is on disk.
+        """
+        ticket = Ticket()
+        if not entries:
+            ticket.event.set()
+            return ticket
+        with self._queue_cond:
+            if self._closed:
+                raise RuntimeError("LogStore is closed")
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+            self._queue.append((entries, ticket))
+            self._queue_cond.notify()
+        return ticket
+
+    def _flush_loop(self):
+        # Group commit: everything queued while the previous flush (or the commit window)
+        # was in progress is merged per collection and written with one write and fsync per file
+        while True:
+            with self._queue_cond:
+                while not self._queue and not self._closed:
+                    self._queue_cond.wait()
+                if not self._queue:
+                    return
+            if self.commit_window:
+                time.sleep(self.commit_window)
+            with self._queue_cond:
+                groups, self._queue = self._queue, []
+
+            # Later entries for the same record supersede earlier ones in the same flush
+            merged = {}
+            for entries, _ in groups:
+                for filename, record_id, line in entries:
+                    merged.setdefault(filename, {})[record_id] = line
+            error = None
+            try:
+                with registry.timer("storage_write_seconds", backend="json"):
+                    for filename, lines in merged.items():
+                        self._write_lines(filename, list(lines.values()))
+            except Exception as e:
+                error = e
+            for _, ticket in groups:
+                ticket.error = error
+                ticket.event.set()
+
+    def _write_lines(self, filename, lines):
+        with self._lock:
+            log = self._logs.get(filename)
+            if log is None:
+                log = self._logs[filename] = self._open_log(self._path(filename, ".log"))
+            log.write("".join(lines))
+            log.flush()
+            if self.fsync:
+                os.fsync(log.fileno())
+            self._pending[filename] = self._pending.get(filename, 0) + len(lines)
+            should_compact = (self._pending[filename] >= self.compact_after
+                              and filename not in self._compacting)
+        if should_compact:
+            threading.Thread(target=self.compact, args=(filename,), daemon=True).start()
+
+    @staticmethod
+    def _open_log(path):
+        log = open(path, 'a')
+        if log.tell():
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            if torn:
+                # Don't glue the first new entry onto a line torn by a crash
+                log.write("\n")
+        return log
+
+    def _write_snapshot(self, filename, records):
+        if self.snapshot_format == "binary":
+            write_snapshot(self._snap_path(filename), records, self._key_fields.get(filename, ("id",)))
+            return
+        # Write to a temp file and rename so readers never see a truncated snapshot
+        path = self._path(filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump([loaded(r) for r in records], f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    # ----- Compaction -----
+
+    def compact(self, filename):
+        """Fold the current log into the snapshot without blocking writers"""
+        log_path = self._path(filename, ".log")
+        rotated_path = self._path(filename, ".log.compacting")
+        with self._lock:
+            if filename in self._compacting:
+                return
+            self._compacting.add(filename)
+            # A leftover rotated log means an earlier compaction died; fold that one first
+            if not os.path.exists(rotated_path):
+                log = self._logs.pop(filename, None)
+                if log is not None:
+                    log.close()
+                if os.path.exists(log_path):
+                    os.replace(log_path, rotated_path)
+                self._pending[filename] = 0
+        try:
+            started = time.perf_counter()
+            records = self._read_snapshot(filename) or []
+            self._replay(records, rotated_path)
+            self._write_snapshot(filename, records)
+            registry.observe("storage_compact_seconds", time.perf_counter() - started, collection=filename)
+            if os.path.exists(rotated_path):
+                os.remove(rotated_path)
+        finally:
+            with self._lock:
+                self._compacting.discard(filename)
+
+    def close(self):
+        """Flush queued writes, stop the committer and close the logs"""
+        with self._queue_cond:
+            self._closed = True
+            self._queue_cond.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            for log in self._logs.values():
+                log.close()
+            self._logs.clear()
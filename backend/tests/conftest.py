@@ -0,0 +1,33 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# The backend modules are imported by name, as the servers do when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """The API module, on a JSON data directory of its own and with rate limiting off"""
+    os.environ["DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["STORAGE_FSYNC"] = "false"
+    import app
+    return app
+
+
+@pytest.fixture
+def api_client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture
+def make_user(api_client):
+    def make(**fields):
+        fields.setdefault("address", f"0x{uuid.uuid4().hex}")
+        response = api_client.post("/api/users", json=fields)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return make
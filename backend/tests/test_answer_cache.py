@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+import whatsapp
+from answer_cache import AnswerCache
+
+
+class FakeModel:
+    """Stands in for the Gemini model; counts calls and can hold them until released"""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, parts):
+        with self._lock:
+            self.prompts.append(parts[-1])
+            count = len(self.prompts)
+        if self.gate is not None:
+            self.gate.wait(5)
+
+        class Response:
+            text = f"answer {count} to {parts[-1]}"
+        return Response()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(whatsapp, "model", fake)
+    return fake
+
+
+def ask(cache, question):
+    return cache.get_or_generate(question, lambda: whatsapp.get_gemini_response(question))
+
+
+def test_normalized_questions_share_an_answer(model):
+    cache = AnswerCache()
+    first = ask(cache, "What grants are there?")
+    assert ask(cache, "  what GRANTS are there") == first
+    assert ask(cache, "what_grants, are there!") == first
+    assert len(model.prompts) == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_entries_expire_after_ttl(model):
+    cache = AnswerCache(ttl=0.05)
+    first = ask(cache, "deadlines for pell grants")
+    time.sleep(0.1)
+    assert ask(cache, "deadlines for pell grants") != first
+    assert len(model.prompts) == 2
+
+
+def test_least_recently_used_entry_is_evicted(model):
+    cache = AnswerCache(max_entries=2)
+    ask(cache, "a")
+    ask(cache, "b")
+    ask(cache, "a")
+    ask(cache, "c")
+    assert len(model.prompts) == 3
+    ask(cache, "a")
+    assert len(model.prompts) == 3
+    ask(cache, "b")
+    assert len(model.prompts) == 4
+    assert cache.stats()["evictions"] == 2
+
+
+def test_failed_generations_are_not_cached(model):
+    cache = AnswerCache()
+    assert cache.get_or_generate("q", lambda: None) is None
+    ask(cache, "q")
+    assert len(model.prompts) == 1
+    assert cache.stats()["failures"] == 1
+
+
+def test_answers_reload_from_the_file(model, tmp_path):
+    path = str(tmp_path / "answers.jsonl")
+    cache = AnswerCache(path=path)
+    first = ask(cache, "Graduate fellowships?")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "torn')
+
+    reloaded = AnswerCache(path=path)
+    assert ask(reloaded, "graduate fellowships") == first
+    assert len(model.prompts) == 1
+
+
+def test_expired_answers_are_not_reloaded(model, tmp_path):
+    path = str(tmp_path / "answers.jsonl")
+    ask(AnswerCache(ttl=0.05, path=path), "q")
+    time.sleep(0.1)
+    assert AnswerCache(path=path).stats()["entries"] == 0
+
+
+def test_concurrent_misses_call_the_model_once(monkeypatch):
+    gate = threading.Event()
+    fake = FakeModel(gate)
+    monkeypatch.setattr(whatsapp, "model", fake)
+    cache = AnswerCache()
+    threads = 8
+    results = []
+
+    def worker():
+        results.append(ask(cache, "How do I apply?"))
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    # Hold the model until every other caller is waiting on the first one's answer
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < threads - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for thread in pool:
+        thread.join(5)
+
+    assert len(fake.prompts) == 1
+    assert len(results) == threads and len(set(results)) == 1
+    assert cache.stats()["coalesced"] == threads - 1
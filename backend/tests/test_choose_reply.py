@@ -0,0 +1,61 @@
+import pytest
+
+import whatsapp
+from answer_cache import AnswerCache
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, parts):
+        self.prompts.append(parts[-1])
+
+        class Response:
+            text = f"answer {len(self.prompts)}"
+        return Response()
+
+
+class NoMatches:
+    def search(self, query, k):
+        return []
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(whatsapp, "model", fake)
+    monkeypatch.setattr(whatsapp, "answer_cache", AnswerCache())
+    monkeypatch.setattr(whatsapp, "retriever", NoMatches())
+    return fake
+
+
+HISTORY = [("user", "tell me about the nursing excellence grant"), ("bot", "It funds nursing students.")]
+
+
+def test_follow_up_naming_a_canned_topic_is_answered_in_context(model):
+    reply = whatsapp.choose_reply("what about deadlines for that one?", HISTORY)
+    assert reply == "answer 1"
+    assert "Conversation so far" in model.prompts[0]
+    assert "nursing excellence grant" in model.prompts[0]
+
+
+def test_canned_replies_without_a_reference(model):
+    assert whatsapp.choose_reply("what about deadlines?", HISTORY) == whatsapp.INTENT_REPLIES["deadline"]
+    assert whatsapp.choose_reply("what about deadlines for that one?", []) == whatsapp.INTENT_REPLIES["deadline"]
+    assert whatsapp.choose_reply("help me with this", HISTORY) == whatsapp.INTENT_REPLIES["help"]
+    assert model.prompts == []
+
+
+def test_small_talk_does_not_call_the_model(model):
+    assert whatsapp.choose_reply("ok thanks", HISTORY) == whatsapp.DEFAULT_REPLY
+    assert whatsapp.choose_reply("what is the weather", HISTORY) == whatsapp.DEFAULT_REPLY
+    assert model.prompts == []
+
+
+def test_standalone_questions_share_an_answer_across_senders(model):
+    first = whatsapp.choose_reply("any scholarships for nurses?", [("user", "hi"), ("bot", "Welcome")])
+    second = whatsapp.choose_reply("Any scholarships for nurses", [("user", "hello"), ("bot", "Welcome")])
+    assert first == second
+    assert len(model.prompts) == 1
+    assert "Conversation so far" not in model.prompts[0]
@@ -0,0 +1,38 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+def wait_for_messages(api, user_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        found = api.messages.find("recipient.id", user_id)
+        if found:
+            return found
+        time.sleep(0.02)
+    return []
+
+
+def expired_scholarship(api_client, sponsor):
+    response = api_client.post("/api/scholarships", json={
+        "title": f"Expired Grant {uuid.uuid4().hex[:6]}", "sponsor": sponsor,
+        "deadline": (datetime.now() - timedelta(minutes=1)).isoformat()})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_closing_notice_goes_to_the_scholarships_own_sponsor(api, api_client, make_user):
+    sponsor = make_user(name=f"Closing Fund {uuid.uuid4().hex[:6]}", type="sponsor")
+    scholarship = expired_scholarship(api_client, sponsor["name"])
+
+    notices = wait_for_messages(api, sponsor["id"])
+    assert [notice["content"] for notice in notices] == \
+        [f"{scholarship['title']} has passed its deadline and is now closed to applications."]
+    assert api.scholarships.get(scholarship["id"])["status"] == "closed"
+
+
+def test_no_sponsor_is_chosen_for_an_unknown_name(api):
+    assert api.deadline_sponsor({"sponsor": "Nobody We Know"}) is None
+    assert api.deadline_sponsor({"sponsor": None}) is None
+    assert api.deadline_sponsor({"sponsor_address": "0xnobody", "sponsor": "Tech Foundation"}) is None
+    assert api.deadline_sponsor({"sponsor": "Tech Foundation"})["type"] == "sponsor"
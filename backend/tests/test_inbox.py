@@ -0,0 +1,62 @@
+import uuid
+
+import pytest
+
+from inbox import Inbox, SqliteInbox, sse_stream
+from repository import SqliteRepository
+
+
+def message(user_id, read=False):
+    return {"id": str(uuid.uuid4()), "recipient": {"id": user_id}, "content": "hi",
+            "timestamp": "2030-01-01T00:00:00", "read": read}
+
+
+def test_counts_follow_inserts_and_reads():
+    inbox = Inbox([message("u1"), message("u1", read=True), message("u2")])
+    assert inbox.unread("u1") == 1
+    inbox.added([message("u1"), message("u1")])
+    inbox.marked_read("u1", 2)
+    assert inbox.unread("u1") == 1
+    assert inbox.unread("nobody") == 0
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two repositories on one database file, as two server processes would open it"""
+    path = str(tmp_path / "shared.db")
+    repositories = [SqliteRepository(path, fsync=False) for _ in range(2)]
+    yield [(repository, repository.collection("messages")) for repository in repositories]
+    for repository in repositories:
+        repository.close()
+
+
+def test_shared_counts_include_other_workers_messages(workers):
+    (repo_a, messages_a), (repo_b, messages_b) = workers
+    inbox_a = SqliteInbox(repo_a)
+    stored = message("u1")
+    messages_b.insert(stored)
+    messages_b.insert(message("u1", read=True))
+    messages_b.insert(message("u2"))
+    assert inbox_a.unread("u1") == 1
+
+    messages_b.update(stored, {"read": True})
+    assert inbox_a.unread("u1") == 0
+
+
+def test_shared_stream_sees_other_workers_messages_and_reads(workers):
+    (repo_a, _), (repo_b, messages_b) = workers
+    inbox_a = SqliteInbox(repo_a, poll_interval=0.01)
+    stream = sse_stream(inbox_a, inbox_a.subscribe("u1"), heartbeat=5, max_duration=5)
+    assert next(stream).startswith("retry:")
+    assert next(stream) == 'event: unread\ndata: {"unread":0}\n\n'
+
+    stored = message("u1")
+    messages_b.insert(message("u2"))
+    messages_b.insert(stored)
+    assert next(stream).startswith(f"id: {stored['id']}\nevent: message\n")
+    assert next(stream) == 'event: unread\ndata: {"unread":1}\n\n'
+
+    messages_b.update(stored, {"read": True})
+    assert next(stream) == 'event: unread\ndata: {"unread":0}\n\n'
+    stream.close()
+    assert inbox_a.stats()["streams"] == 0
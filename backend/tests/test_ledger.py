@@ -0,0 +1,105 @@
+import random
+import threading
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from ledger import Ledger, SqliteLedger, from_wei, to_wei
+from repository import SqliteRepository
+
+
+@pytest.mark.parametrize("amount", ["0", "0.1", "1", "10.2", "0.000000000000000001", "123456789.123456789123456789",
+                                    "-0.5", "1e-3", 7, 2.5])
+def test_wei_round_trips(amount):
+    wei = to_wei(amount)
+    assert isinstance(wei, int)
+    assert Decimal(from_wei(wei)) == Decimal(str(amount))
+    assert to_wei(from_wei(wei)) == wei
+
+
+def test_wei_sums_are_exact():
+    assert sum(to_wei("0.1") for _ in range(3)) == to_wei("0.3")
+    assert from_wei(to_wei("10.2") - to_wei("0.1") * 102) == "0.0"
+
+
+def test_bad_amounts_are_rejected():
+    for amount in ("abc", "nan", "inf", "", None):
+        with pytest.raises(ValueError):
+            to_wei(amount)
+    with pytest.raises(ValueError):
+        to_wei("0.0000000000000000001")
+    assert to_wei("0.0000000000000000006", exact=False) == 1
+
+
+def transfers(count, addresses, seed=7):
+    rng = random.Random(seed)
+    for n in range(count):
+        sender, recipient = rng.sample(addresses, 2)
+        yield {"from_address": sender, "to_address": recipient, "amount": f"0.{rng.randrange(1, 10 ** 6):06d}"}
+
+
+def test_running_totals_match_a_rebuild():
+    history = list(transfers(200, ["a", "b", "c"]))
+    ledger = Ledger(history[:100])
+    for transaction in history[100:]:
+        ledger.apply(transaction)
+    assert ledger.verify(history) == []
+    summary = ledger.summary()
+    assert summary["transaction_count"] == 200
+    assert sum(Decimal(account["net"]) for account in summary["accounts"]) == 0
+
+
+def test_shared_totals_agree_across_processes(tmp_path):
+    path = str(tmp_path / "shared.db")
+    repositories = [SqliteRepository(path, fsync=False) for _ in range(2)]
+    collections = [repository.collection("transactions") for repository in repositories]
+    ledgers = [SqliteLedger(repository, collection) for repository, collection in zip(repositories, collections)]
+    history = list(transfers(100, ["a", "b", "c", "d"]))
+
+    def worker(n):
+        repository, collection, ledger = repositories[n % 2], collections[n % 2], ledgers[n % 2]
+        for transaction in history[n::4]:
+            with repository.transaction():
+                collection.insert({"id": str(uuid.uuid4()), **transaction})
+                ledger.apply(transaction)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert ledgers[0].summary() == ledgers[1].summary()
+    assert ledgers[1].summary()["transaction_count"] == 100
+    assert ledgers[0].verify(collections[1].scan()) == []
+    for repository in repositories:
+        repository.close()
+
+
+def test_concurrent_transfers_conserve_balances(api, api_client, make_user):
+    users = [make_user(balance="100.0") for _ in range(4)]
+    addresses = [user["address"] for user in users]
+    errors = []
+
+    def worker(seed):
+        client = api.app.test_client()
+        for transaction in transfers(25, addresses, seed):
+            response = client.post("/api/transactions", json={
+                "fromAddress": transaction["from_address"], "toAddress": transaction["to_address"],
+                "amount": transaction["amount"]})
+            if response.status_code != 201:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    balances = [to_wei(api.users.get(user["id"])["balance"]) for user in users]
+    assert sum(balances) == to_wei("400")
+    nets = [to_wei(api.ledger.account(address)["net"]) for address in addresses]
+    assert [balance - to_wei("100") for balance in balances] == nets
+    assert api_client.get("/api/balances/verify").get_json() == {"ok": True, "mismatches": []}
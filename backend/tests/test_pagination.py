@@ -0,0 +1,25 @@
+SEED_TITLES = ["STEM Innovation Grant", "Arts and Humanities Fellowship", "Community Leadership Scholarship",
+               "Environmental Research Grant"]
+
+
+def test_scholarships_are_listed_in_the_order_they_were_added(api_client):
+    created = [api_client.post("/api/scholarships", json={"title": f"Grant {n}", "deadline": "2031-01-01"})
+               for n in range(3)]
+    assert all(response.status_code == 201 for response in created)
+
+    titles = [s["title"] for s in api_client.get("/api/scholarships").get_json()]
+    assert titles[:4] == SEED_TITLES
+    assert titles[-3:] == ["Grant 0", "Grant 1", "Grant 2"]
+
+
+def test_pages_follow_the_same_order(api_client):
+    everything = [s["id"] for s in api_client.get("/api/scholarships").get_json()]
+    paged = []
+    response = api_client.get("/api/scholarships?limit=2&fields=id")
+    while True:
+        paged += [s["id"] for s in response.get_json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = api_client.get(f"/api/scholarships?limit=2&fields=id&cursor={cursor}")
+    assert paged == everything
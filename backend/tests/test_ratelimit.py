@@ -0,0 +1,33 @@
+import time
+
+from ratelimit import MemoryBuckets
+
+
+def test_budget_is_enforced_and_refills():
+    buckets = MemoryBuckets()
+    assert [buckets.take("ip:1", 2, 0.1)[0] for _ in range(3)] == [True, True, False]
+    allowed, retry_after = buckets.take("ip:1", 2, 0.1)
+    assert not allowed and 0 < retry_after <= 0.05
+    time.sleep(0.06)
+    assert buckets.take("ip:1", 2, 0.1)[0]
+
+
+def test_idle_buckets_are_forgotten():
+    buckets = MemoryBuckets()
+    buckets.take("idle", 1, 0.05)
+    time.sleep(0.06)
+    buckets.take("active", 1, 60)
+    assert list(buckets._buckets) == ["active"]
+
+
+def test_a_flood_of_new_keys_stays_bounded_and_evicts_least_recent():
+    buckets = MemoryBuckets(max_keys=100)
+    buckets.take("regular", 1, 60)
+    for n in range(1000):
+        buckets.take(f"flood:{n}", 5, 60)
+        if n % 50 == 0:
+            # Still in use, so kept while the flood's one-off keys are evicted
+            buckets.take("regular", 1, 60)
+    assert len(buckets._buckets) == 100
+    assert "regular" in buckets._buckets
+    assert not buckets.take("regular", 1, 60)[0]
@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+
+import pytest
+
+import whatsapp
+from replies import ReplyDispatcher
+
+
+class StubSender:
+    """Records outbound messages instead of calling Twilio"""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, from_number, to_number, body):
+        with self._lock:
+            self.sent.append((to_number, body))
+
+
+def make_dispatcher(respond, **options):
+    dispatcher = ReplyDispatcher(respond, None, **options)
+    dispatcher.sender = StubSender()
+    return dispatcher
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(whatsapp.limiter, "enabled", False)
+    return whatsapp.app.test_client()
+
+
+def post(client, sender, body):
+    return client.post("/webhook", data={"From": sender, "To": "whatsapp:+10000000000", "Body": body})
+
+
+def test_webhook_acknowledges_before_the_reply_is_ready(client, monkeypatch):
+    release = threading.Event()
+
+    def respond(body, user_number):
+        release.wait(5)
+        return f"re: {body}"
+
+    replies = make_dispatcher(respond, workers=2)
+    monkeypatch.setattr(whatsapp, "replies", replies)
+    monkeypatch.setattr(whatsapp, "ACK_MESSAGE", "Looking that up...")
+    try:
+        started = time.monotonic()
+        response = post(client, "whatsapp:+1555", "graduate scholarships")
+        assert time.monotonic() - started < 1
+        assert response.status_code == 200
+        assert "<Message>Looking that up...</Message>" in response.get_data(as_text=True)
+        assert replies.sender.sent == []
+
+        release.set()
+        assert replies.flush(5)
+        assert replies.sender.sent == [("whatsapp:+1555", "re: graduate scholarships")]
+    finally:
+        release.set()
+        replies.stop()
+
+
+def test_each_sender_is_answered_in_order_one_at_a_time():
+    active = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def respond(body, user_number):
+        with lock:
+            if user_number in active:
+                overlaps.append(user_number)
+            active.add(user_number)
+        time.sleep(random.uniform(0, 0.005))
+        with lock:
+            active.discard(user_number)
+        return body
+
+    replies = make_dispatcher(respond, workers=4)
+    senders = [f"whatsapp:+1{n}" for n in range(6)]
+    try:
+        for i in range(15):
+            for sender in senders:
+                assert replies.submit(sender, "bot", str(i))
+        assert replies.flush(10)
+    finally:
+        replies.stop()
+
+    assert overlaps == []
+    for sender in senders:
+        assert [body for to, body in replies.sender.sent if to == sender] == [str(i) for i in range(15)]
+    assert replies.stats()["sent"] == 90
+
+
+def test_full_queues_are_refused(client, monkeypatch):
+    release = threading.Event()
+    replies = make_dispatcher(lambda body, user_number: release.wait(5) and body,
+                              workers=1, max_pending=3, max_per_sender=2)
+    monkeypatch.setattr(whatsapp, "replies", replies)
+    try:
+        assert replies.submit("a", "bot", "1")
+        assert replies.submit("a", "bot", "2")
+        # The sender's own queue is full, though there is room overall
+        assert not replies.submit("a", "bot", "3")
+        assert replies.submit("b", "bot", "1")
+        # Now the queue is full for everyone
+        assert not replies.submit("c", "bot", "1")
+
+        response = post(client, "c", "hello")
+        assert whatsapp.BUSY_MESSAGE in response.get_data(as_text=True)
+        assert replies.stats()["rejected"] == 3
+    finally:
+        release.set()
+        replies.stop()
+    assert len(replies.sender.sent) == 3
+
+
+def test_stop_drains_the_queue():
+    def respond(body, user_number):
+        time.sleep(0.002)
+        return body
+
+    replies = make_dispatcher(respond, workers=2)
+    for i in range(40):
+        assert replies.submit(f"sender-{i % 5}", "bot", str(i))
+    replies.stop()
+
+    assert len(replies.sender.sent) == 40
+    assert replies.stats()["pending"] == 0
+    assert not replies.submit("sender-0", "bot", "late")
@@ -0,0 +1,52 @@
+import threading
+from datetime import datetime, timedelta
+
+from scheduler import DeadlineScheduler
+
+
+def at(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).isoformat()
+
+
+def test_items_fire_in_deadline_order():
+    fired = []
+    done = threading.Event()
+
+    def on_due(kind, record_id):
+        fired.append(record_id)
+        if len(fired) == 3:
+            done.set()
+
+    scheduler = DeadlineScheduler(on_due)
+    scheduler.schedule("scholarship", "late", at(0.2))
+    scheduler.schedule("scholarship", "early", at(0.05))
+    scheduler.schedule("scholarship", "past", at(-60))
+    scheduler.schedule("scholarship", "cancelled", at(0.1))
+    scheduler.cancel("scholarship", "cancelled")
+    assert not scheduler.schedule("scholarship", "unreadable", "soon")
+    assert done.wait(5)
+    scheduler.stop()
+    assert fired == ["past", "early", "late"]
+
+
+def test_upcoming_lists_one_kind_earliest_first():
+    scheduler = DeadlineScheduler(lambda kind, record_id: None)
+    for n, days in enumerate([3, 1, 10, 2]):
+        scheduler.schedule("scholarship", f"s{n}", at(days * 86400))
+    scheduler.schedule("contract", "c", at(86400 / 2))
+    assert [record_id for _, record_id in scheduler.upcoming("scholarship", 5 * 86400, 10)] == ["s1", "s3", "s0"]
+    assert len(scheduler.upcoming("scholarship", 5 * 86400, 2)) == 2
+    scheduler.stop()
+
+
+def test_sync_only_pushes_new_or_moved_deadlines():
+    scheduler = DeadlineScheduler(lambda kind, record_id: None)
+    listing = [("a", at(3600)), ("b", at(7200))]
+    scheduler.sync("scholarship", listing)
+    heap_size = len(scheduler._heap)
+    scheduler.sync("scholarship", listing)
+    assert len(scheduler._heap) == heap_size
+
+    scheduler.sync("scholarship", [("a", at(60)), ("b", listing[1][1]), ("c", at(120))])
+    assert [record_id for _, record_id in scheduler.upcoming("scholarship", 3600 * 3, 10)] == ["a", "c", "b"]
+    scheduler.stop()
@@ -0,0 +1,34 @@
+from search import SearchIndex
+
+
+def scholarship(id, title, deadline, **fields):
+    return {"id": id, "title": title, "deadline": deadline, "status": "open", **fields}
+
+
+def test_ranks_title_matches_first():
+    index = SearchIndex([
+        scholarship("1", "Nursing Excellence Grant", "2030-01-01", description="For students"),
+        scholarship("2", "STEM Award", "2030-01-01", description="Open to nursing and STEM students"),
+        scholarship("3", "Arts Fellowship", "2030-01-01"),
+    ])
+    assert [record["id"] for _, record in index.search("nursing")] == ["1", "2"]
+
+
+def test_deadlines_of_any_type_filter_and_sort():
+    index = SearchIndex([
+        scholarship("text", "Grant", "2030-06-01"),
+        scholarship("number", "Grant", 2030),
+        scholarship("missing", "Grant", None),
+    ])
+    assert [record["id"] for _, record in index.search()] == ["missing", "number", "text"]
+    assert [record["id"] for _, record in index.search(deadline_after="2030-01-01")] == ["text"]
+    assert {record["id"] for _, record in index.search("grant", deadline_before="2030-01-01")} == {"missing", "number"}
+
+
+def test_sync_picks_up_changes_made_elsewhere():
+    index = SearchIndex([scholarship("1", "Old Title", "2030-01-01")])
+    index.sync([scholarship("1", "New Title", "2030-01-01"), scholarship("2", "Another Grant", "2030-01-01")])
+    assert [record["id"] for _, record in index.search("old")] == []
+    assert [record["id"] for _, record in index.search("new")] == ["1"]
+    index.sync([scholarship("2", "Another Grant", "2030-01-01")])
+    assert len(index) == 1
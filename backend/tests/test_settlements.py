@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+
+MILESTONES = [{"description": "Proposal", "percentage": 40}, {"description": "Final report", "percentage": 60}]
+
+
+def make_contract(api_client, **fields):
+    contract = {
+        "title": "Research Fund",
+        "contract_address": None,
+        "total_funds": "10.0",
+        "remaining_funds": "10.0",
+        "terms": {"milestones": MILESTONES, "minimum_gpa": 3.0,
+                  "deadline": (datetime.now() + timedelta(days=30)).isoformat()},
+        **fields
+    }
+    response = api_client.post("/api/contracts", json=contract)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def settle(api_client, *items):
+    return api_client.post("/api/contracts/settlements", json=list(items))
+
+
+def balance(api, user):
+    return api.users.get(user["id"])["balance"]
+
+
+def test_settlement_pays_each_tranche_once(api, api_client, make_user):
+    student = make_user(balance="1.0")
+    contract = make_contract(api_client)
+    items = [{"contractId": contract["id"], "applicantId": student["id"], "milestone": m, "gpa": 3.5}
+             for m in (0, 1)]
+
+    first = settle(api_client, *items)
+    assert first.status_code == 201
+    assert first.get_json()["applied"] == 2
+    assert balance(api, student) == "11.0"
+    assert api.smart_contracts.get(contract["id"])["remaining_funds"] == "0.0"
+
+    # A retried batch, even with the items repeated, pays nothing more
+    retry = settle(api_client, *items, *items)
+    assert retry.status_code == 200
+    body = retry.get_json()
+    assert body["applied"] == 0 and body["duplicates"] == 4
+    assert all(result["duplicate"] for result in body["results"])
+    assert balance(api, student) == "11.0"
+    assert api.smart_contracts.get(contract["id"])["remaining_funds"] == "0.0"
+    assert len(api.payouts.find("contract_id", contract["id"])) == 2
+
+
+def test_bad_item_rejects_the_whole_batch(api, api_client, make_user):
+    student = make_user(balance="1.0")
+    good = make_contract(api_client)
+    unreadable = make_contract(api_client, total_funds="abc")
+    negative = make_contract(api_client, total_funds="-5", remaining_funds="-5")
+
+    response = settle(
+        api_client,
+        {"contractId": good["id"], "applicantId": student["id"], "milestone": 0, "gpa": 3.5},
+        {"contractId": unreadable["id"], "applicantId": student["id"], "milestone": 0, "gpa": 3.5},
+        {"contractId": negative["id"], "applicantId": student["id"], "milestone": 0, "gpa": 3.5})
+    assert response.status_code == 400
+    results = response.get_json()["results"]
+    assert [result["ok"] for result in results] == [True, False, False]
+    assert "not a valid amount" in results[1]["error"]
+    assert "must not be negative" in results[2]["error"]
+
+    assert balance(api, student) == "1.0"
+    assert api.smart_contracts.get(good["id"])["remaining_funds"] == "10.0"
+    assert api.payouts.find("contract_id", good["id"]) == []
+
+
+def test_underfunded_contract_applies_nothing(api, api_client, make_user):
+    student = make_user(balance="1.0")
+    funded = make_contract(api_client)
+    underfunded = make_contract(api_client, remaining_funds="1.0")
+
+    response = settle(
+        api_client,
+        {"contractId": funded["id"], "applicantId": student["id"], "milestone": 1, "gpa": 3.5},
+        {"contractId": underfunded["id"], "applicantId": student["id"], "milestone": 1, "gpa": 3.5})
+    assert response.status_code == 409
+    assert response.get_json()["contracts"][0]["contractId"] == underfunded["id"]
+
+    assert balance(api, student) == "1.0"
+    assert api.smart_contracts.get(funded["id"])["remaining_funds"] == "10.0"
+    assert api.payouts.find("contract_id", funded["id"]) == []
+
+    # Once funded, the same batch settles in full
+    api.smart_contracts.update(api.smart_contracts.get(underfunded["id"]), {"remaining_funds": "10.0"})
+    assert settle(api_client,
+                  {"contractId": funded["id"], "applicantId": student["id"], "milestone": 1, "gpa": 3.5},
+                  {"contractId": underfunded["id"], "applicantId": student["id"], "milestone": 1,
+                   "gpa": 3.5}).status_code == 201
+    assert balance(api, student) == "13.0"
@@ -0,0 +1,44 @@
+def transfer(sender, recipient, amount):
+    return {"fromAddress": sender["address"], "toAddress": recipient["address"], "amount": amount}
+
+
+def test_unreadable_balance_rejects_the_whole_batch(api, api_client, make_user):
+    payer = make_user(balance="10.0")
+    first = make_user(balance="0.0")
+    broken = make_user(balance="0.0")
+    # Written before balances were checked on the way in
+    api.users.update(api.users.get(broken["id"]), {"balance": "lots"})
+    before = len(api.transactions.find("from_address", payer["address"]))
+
+    response = api_client.post("/api/transactions/bulk", json=[
+        transfer(payer, first, "1.0"), transfer(payer, first, "1.0"), transfer(payer, broken, "1.0")])
+    assert response.status_code == 400
+    results = response.get_json()["results"]
+    assert [result["ok"] for result in results] == [True, True, False]
+
+    assert api.users.get(payer["id"])["balance"] == "10.0"
+    assert api.users.get(first["id"])["balance"] == "0.0"
+    assert api.users.get(broken["id"])["balance"] == "lots"
+    assert len(api.transactions.find("from_address", payer["address"])) == before
+
+    single = api_client.post("/api/transactions", json=transfer(payer, broken, "1.0"))
+    assert single.status_code == 400
+    assert api.users.get(payer["id"])["balance"] == "10.0"
+
+
+def test_valid_batch_applies_every_transfer(api, api_client, make_user):
+    payer = make_user(balance="10.0")
+    payees = [make_user() for _ in range(3)]
+
+    response = api_client.post("/api/transactions/bulk",
+                               json=[transfer(payer, payee, "0.1") for payee in payees])
+    assert response.status_code == 201
+    assert api.users.get(payer["id"])["balance"] == "9.7"
+    assert [api.users.get(payee["id"])["balance"] for payee in payees] == ["0.1"] * 3
+
+
+def test_balances_must_be_numbers(api_client, make_user):
+    assert api_client.post("/api/users", json={"address": "0xlots", "balance": "lots"}).status_code == 400
+    user = make_user()
+    assert api_client.put(f"/api/users/{user['address']}", json={"balance": "lots"}).status_code == 400
+    assert api_client.put(f"/api/users/{user['address']}", json={"balance": "2.5"}).get_json()["balance"] == "2.5"
@@ -1,18 +1,51 @@
-from flask import Flask, request
+from flask import Flask, request, jsonify, g
 from twilio.twiml.messaging_response import MessagingResponse
 import os
+import atexit
 from dotenv import load_dotenv
 import google.generativeai as genai
 import requests
 
+from answer_cache import AnswerCache
+from replies import ReplyDispatcher, TwilioSender
+from intents import IntentMatcher, words
+from sessions import context_window, open_session_store
+from retrieval import ScholarshipRetriever
+from repository import read_collection
+from metrics import instrument_app, metrics_response, registry
+from ratelimit import (ConcurrencyLimiter, RateLimiter, open_bucket_store, parse_budget, rule,
+                       service_unavailable)
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Configure Gemini API
+# Anything with a generate_content() returning an object with .text can stand in for the model (e.g. a fake offline)
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 model = genai.GenerativeModel('gemini-pro')
 
+# Gemini answers keyed by the normalized question, so repeated questions skip the API call
+answer_cache = AnswerCache(
+    ttl=float(os.getenv('GEMINI_CACHE_TTL', str(24 * 3600))),
+    max_entries=int(os.getenv('GEMINI_CACHE_SIZE', '5000')),
+    path=os.getenv('GEMINI_CACHE_PATH') or None
+)
+
+# Recent turns per sender (Twilio From number), so follow-up questions keep their context
+sessions = open_session_store()
+
+# Vector index over the live scholarships catalogue (the API's data), reloaded incrementally
+retriever = ScholarshipRetriever(
+    lambda: read_collection("scholarships"),
+    refresh_interval=float(os.getenv('RETRIEVAL_REFRESH_SECONDS', '30'))
+)
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '3'))
+# Matches this close answer the question without Gemini; weaker ones above the minimum ground its prompt
+RETRIEVAL_ANSWER_SCORE = float(os.getenv('RETRIEVAL_ANSWER_SCORE', '0.2'))
+RETRIEVAL_MIN_SCORE = float(os.getenv('RETRIEVAL_MIN_SCORE', '0.1'))
+
 app = Flask(__name__)
+instrument_app(app, sample_rate=float(os.getenv('METRICS_SAMPLE_RATE', '1.0')))
 
 # Scholarship and grants information database (simplified)
 scholarship_info = {
@@ -51,89 +84,183 @@ def get_gemini_response(prompt):
         funding and under 200 words. Always be encouraging and professional."""
         
         # Generate response
-        response = model.generate_content(
-            [system_prompt, prompt]
-        )
+        with registry.timer("gemini_request_seconds"):
+            response = model.generate_content(
+                [system_prompt, prompt]
+            )
         
         return response.text
     except Exception as e:
         print(f"Error with Gemini API: {e}")
         return None
 
-def get_response(user_message):
-    """Generate a response based on the user's message"""
-    user_message = user_message.lower()
-    
-    # Welcome message
-    if any(word in user_message for word in ["hello", "hi", "hey", "start"]):
-        return ("👋 Welcome to the Scholarship Bot! I can help you find scholarships and grants. "
-                "Try asking about:\n\n"
-                "• Undergraduate scholarships\n"
-                "• Graduate scholarships\n"
-                "• International scholarships\n"
-                "• Scholarships for minorities\n"
-                "• How to apply for scholarships\n"
-                "• Scholarship deadlines\n"
-                "\nOr type 'help' to see this menu again.")
-    
-    # Help command
-    elif "help" in user_message:
-        return ("I can provide information about:\n\n"
-                "• Undergraduate scholarships\n"
-                "• Graduate scholarships\n"
-                "• International scholarships\n"
-                "• Scholarships for minorities\n"
-                "• Application processes\n"
-                "• Deadlines\n"
-                "\nJust ask me a question!")
-    
-    # Category specific responses
-    elif "undergraduate" in user_message:
-        return "Here are some undergraduate scholarships and grants:\n\n• " + "\n• ".join(scholarship_info["undergraduate"])
-    
-    elif "graduate" in user_message:
-        return "Here are some graduate scholarships and grants:\n\n• " + "\n• ".join(scholarship_info["graduate"])
-    
-    elif "international" in user_message:
-        return "Here are some scholarships for international students:\n\n• " + "\n• ".join(scholarship_info["international"])
-    
-    elif "minorities" in user_message or "minority" in user_message:
-        return "Here are some scholarships for minority students:\n\n• " + "\n• ".join(scholarship_info["minorities"])
-    
-    # Application advice
-    elif "apply" in user_message or "application" in user_message:
-        return ("General application tips for scholarships:\n\n"
-                "1. Start early and note all deadlines\n"
-                "2. Prepare required documents (transcripts, letters of recommendation)\n"
-                "3. Write a compelling personal statement\n"
-                "4. Highlight your achievements and community service\n"
-                "5. Apply to multiple scholarships to increase your chances")
+# Intents in precedence order: (name, keywords, reply). Keywords match whole words only.
+# A reply of None sends the question to Gemini.
+INTENTS = [
+    ("welcome", ["hello", "hi", "hey", "start"],
+     "👋 Welcome to the Scholarship Bot! I can help you find scholarships and grants. "
+     "Try asking about:\n\n"
+     "• Undergraduate scholarships\n"
+     "• Graduate scholarships\n"
+     "• International scholarships\n"
+     "• Scholarships for minorities\n"
+     "• How to apply for scholarships\n"
+     "• Scholarship deadlines\n"
+     "\nOr type 'help' to see this menu again."),
+    ("help", ["help"],
+     "I can provide information about:\n\n"
+     "• Undergraduate scholarships\n"
+     "• Graduate scholarships\n"
+     "• International scholarships\n"
+     "• Scholarships for minorities\n"
+     "• Application processes\n"
+     "• Deadlines\n"
+     "\nJust ask me a question!"),
+    ("undergraduate", ["undergraduate", "undergraduates", "undergrad"],
+     "Here are some undergraduate scholarships and grants:\n\n• " + "\n• ".join(scholarship_info["undergraduate"])),
+    ("graduate", ["graduate", "graduates", "postgraduate", "masters", "phd"],
+     "Here are some graduate scholarships and grants:\n\n• " + "\n• ".join(scholarship_info["graduate"])),
+    ("international", ["international", "abroad"],
+     "Here are some scholarships for international students:\n\n• " + "\n• ".join(scholarship_info["international"])),
+    ("minorities", ["minorities", "minority"],
+     "Here are some scholarships for minority students:\n\n• " + "\n• ".join(scholarship_info["minorities"])),
+    ("apply", ["apply", "applying", "application", "applications"],
+     "General application tips for scholarships:\n\n"
+     "1. Start early and note all deadlines\n"
+     "2. Prepare required documents (transcripts, letters of recommendation)\n"
+     "3. Write a compelling personal statement\n"
+     "4. Highlight your achievements and community service\n"
+     "5. Apply to multiple scholarships to increase your chances"),
+    ("deadline", ["deadline", "deadlines"],
+     "Most scholarship deadlines fall into these periods:\n\n"
+     "• Fall scholarships: July - September\n"
+     "• Spring scholarships: October - December\n"
+     "• Summer scholarships: January - March\n\n"
+     "Always check the specific deadlines for each scholarship you're interested in!"),
+    # Other scholarship-related questions go to Gemini
+    ("ask_gemini", ["scholarship", "scholarships", "grant", "grants", "financial aid", "funding", "money",
+                    "education", "college", "colleges", "university", "universities", "student", "students",
+                    "loan", "loans"],
+     None),
+]
+
+INTENT_REPLIES = {name: reply for name, _, reply in INTENTS}
+
+# Compiled once; matching costs one lookup per word of the message
+intent_matcher = IntentMatcher([(name, keywords) for name, keywords, _ in INTENTS])
+
+# Words that point back at something said earlier ("what about deadlines for that one?")
+REFERENCE_WORDS = {"that", "it", "this", "these", "those", "them", "its", "one", "same"}
+# Menu intents answer the same whatever came before, so they never give way to a follow-up
+MENU_INTENTS = {"welcome", "help"}
+
+DEFAULT_REPLY = ("I'm not sure I understand your question about scholarships. "
+                 "Try asking about undergraduate, graduate, or international scholarships, "
+                 "or type 'help' to see what I can assist with.")
+
+def describe_scholarship(scholarship):
+    amount = scholarship.get("amount")
+    amount = f"${amount:,}" if isinstance(amount, (int, float)) else amount
+    details = ", ".join(str(d) for d in (amount, f"deadline {str(scholarship.get('deadline') or '')[:10]}") if d)
+    return f"{scholarship.get('title')} ({scholarship.get('sponsor')}): {details}"
+
+def get_response(user_message, sender=None):
+    """Generate a response based on the user's message and, given a sender, their recent conversation"""
+    history = sessions.history(sender) if sender else []
+    reply = choose_reply(user_message.lower(), history)
+    if sender:
+        sessions.append(sender, "user", user_message)
+        sessions.append(sender, "bot", reply)
+    return reply
+
+def choose_reply(user_message, history):
+    intent = intent_matcher.match(user_message)
+    # Only a message referring back to the conversation is a follow-up; it is answered in context even if it
+    # names a topic with a canned reply, and anything else is answered on its own
+    follow_up = (bool(history) and intent not in MENU_INTENTS
+                 and not REFERENCE_WORDS.isdisjoint(words(user_message)))
     
-    # Deadlines information
-    elif "deadline" in user_message:
-        return ("Most scholarship deadlines fall into these periods:\n\n"
-                "• Fall scholarships: July - September\n"
-                "• Spring scholarships: October - December\n"
-                "• Summer scholarships: January - March\n\n"
-                "Always check the specific deadlines for each scholarship you're interested in!")
+    if INTENT_REPLIES.get(intent) and not follow_up:
+        return INTENT_REPLIES[intent]
     
-    # Use Gemini API for other scholarship-related questions
-    else:
-        # First, check if the message is related to scholarships or grants
-        if any(word in user_message for word in ["scholarship", "grant", "financial aid", "funding", "money", "education", "college", "university", "student", "loan"]):
-            prompt = f"The user has asked about scholarships or grants with this message: '{user_message}'. Provide a helpful response about relevant scholarship or grant opportunities."
-            gemini_response = get_gemini_response(prompt)
-            
-            # If Gemini response is available, use it
-            if gemini_response:
-                return gemini_response
+    # Other scholarship-related questions, and follow-ups in an ongoing conversation
+    if intent == "ask_gemini" or follow_up:
+        # A follow-up rarely names the scholarship, so search with the student's previous question too
+        query = user_message
+        if follow_up:
+            query = " ".join([text for role, text in history if role == "user"][-1:] + [user_message])
+        matches = retriever.search(query, RETRIEVAL_TOP_K)
+        # Drop weak matches, and ones far behind the best (usually only sharing a generic word like "scholarship")
+        cutoff = max(RETRIEVAL_MIN_SCORE, matches[0][0] / 2) if matches else 0
+        matches = [(score, s) for score, s in matches if score >= cutoff]
+        
+        # Close matches from our own catalogue answer the question without an LLM call
+        if matches and matches[0][0] >= RETRIEVAL_ANSWER_SCORE:
+            return "Here are scholarships from our catalogue that match your question:\n\n• " + \
+                "\n• ".join(describe_scholarship(s) for _, s in matches)
+        
+        # Use Gemini API, grounded in whatever partial matches we have
+        prompt = f"The user has asked about scholarships or grants with this message: '{user_message}'. Provide a helpful response about relevant scholarship or grant opportunities."
+        if matches:
+            catalogue = "\n".join(f"- {describe_scholarship(s)}: {s.get('description') or ''}" for _, s in matches)
+            prompt = f"Scholarships in our catalogue that may be relevant:\n{catalogue}\n\n{prompt}"
+        # Standalone questions leave the conversation out, so their answers are shared between senders
+        context = context_window(history) if follow_up else ""
+        if context:
+            prompt = f"Conversation so far:\n{context}\n\n{prompt}"
+        # The context and grounding are part of the cache key, so an answer is only reused for the same prompt
+        grounding = " ".join(s["id"] for _, s in matches)
+        gemini_response = answer_cache.get_or_generate(f"{context}\n{grounding}\n{user_message}",
+                                                       lambda: get_gemini_response(prompt))
         
-        # Default response if not scholarship related or Gemini fails
-        return ("I'm not sure I understand your question about scholarships. "
-                "Try asking about undergraduate, graduate, or international scholarships, "
-                "or type 'help' to see what I can assist with.")
+        # If Gemini response is available, use it
+        if gemini_response:
+            return gemini_response
+    
+    # Default response if not scholarship related or Gemini fails
+    return DEFAULT_REPLY
+
+# Async mode: acknowledge the webhook at once and send the reply through the REST API from a worker pool
+# Replace `replies.sender` with anything that has send(from_number, to_number, body) to run without Twilio
+ASYNC_REPLIES = os.getenv('WHATSAPP_ASYNC', 'false').lower() == 'true'
+ACK_MESSAGE = os.getenv('WHATSAPP_ACK_MESSAGE', '')
+BUSY_MESSAGE = "We're getting a lot of questions right now. Please try again in a minute."
+
+replies = None
+if ASYNC_REPLIES:
+    replies = ReplyDispatcher(
+        get_response,
+        TwilioSender(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN')),
+        workers=int(os.getenv('WHATSAPP_WORKERS', '4')),
+        max_pending=int(os.getenv('WHATSAPP_MAX_PENDING', '1000')),
+        max_per_sender=int(os.getenv('WHATSAPP_MAX_PER_SENDER', '20'))
+    )
+    atexit.register(replies.stop)
+
+# Every webhook comes from Twilio's addresses, so budgets are per WhatsApp sender rather than per IP
+limiter = RateLimiter(open_bucket_store(), enabled=os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true')
+SENDER_LIMIT = rule("sender", lambda: request.values.get('From'), parse_budget(os.getenv('RATE_LIMIT_SENDER', '10/60')))
+
+# Webhooks handled at once (in sync mode each may be waiting on Gemini); the rest are shed with 503
+concurrency = ConcurrencyLimiter(
+    max_active=int(os.getenv('MAX_CONCURRENT_REQUESTS', '32')),
+    max_waiting=int(os.getenv('MAX_WAITING_REQUESTS', '64')),
+    wait_timeout=float(os.getenv('REQUEST_QUEUE_TIMEOUT', '2'))
+)
+
+@app.before_request
+def limit_concurrency():
+    if not concurrency.acquire():
+        return service_unavailable()
+    g.concurrency_slot = True
+
+@app.teardown_request
+def release_concurrency_slot(exc):
+    if g.pop('concurrency_slot', False):
+        concurrency.release()
 
 @app.route('/webhook', methods=['POST'])
+@limiter.limit(SENDER_LIMIT)
 def webhook():
     # Get the incoming message
     incoming_msg = request.values.get('Body', '').strip()
@@ -141,11 +268,45 @@ def webhook():
     # Create Twilio response
     resp = MessagingResponse()
     
+    if replies is not None:
+        # The answer follows as a separate message; only the optional acknowledgement goes in the TwiML
+        if not replies.submit(request.values.get('From', ''), request.values.get('To', ''), incoming_msg):
+            resp.message(BUSY_MESSAGE)
+        elif ACK_MESSAGE:
+            resp.message(ACK_MESSAGE)
+        return str(resp)
+    
     # Add the response message
-    resp.message(get_response(incoming_msg))
+    resp.message(get_response(incoming_msg, request.values.get('From') or None))
     
     return str(resp)
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return metrics_response()
+
+@app.route('/metrics/limits', methods=['GET'])
+def limit_metrics():
+    return jsonify({"rate_limits": limiter.stats(), "concurrency": concurrency.stats()})
+
+@app.route('/metrics/retrieval', methods=['GET'])
+def retrieval_metrics():
+    return jsonify(retriever.stats())
+
+@app.route('/metrics/sessions', methods=['GET'])
+def session_metrics():
+    return jsonify(sessions.stats())
+
+@app.route('/metrics/replies', methods=['GET'])
+def reply_metrics():
+    if replies is None:
+        return jsonify({"async": False})
+    return jsonify({"async": True, **replies.stats()})
+
+@app.route('/metrics/gemini-cache', methods=['GET'])
+def gemini_cache_metrics():
+    return jsonify(answer_cache.stats())
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)